@@ -6,17 +6,39 @@ this is the file that is executed. This file works as traffic cop that directs t
 application to the correct entry point.  It allows you to launch the GUI, or to do 
 something simple from the command line.
 
+The subcommand batch (as in 'imager batch --ops invert in/*.png -o out/') applies 
+actions to many files without the GUI. It has its own options (see a6batch).
+
 Author: Walker M. White (wmw2)
 Date:   October 29, 2019
 """
 # To handle command line options
 import argparse
+import sys
 
 # This is necessary to prevent conflicting command line arguments
 import os
 os.environ["KIVY_NO_ARGS"] = "1"
 
 
+def positive(text):
+    """
+    Returns: the command line value text as a positive int
+    
+    This function is an argparse type, so an invalid value is reported as a usage error.
+    
+    Parameter text: The command line value
+    Precondition: text is a string
+    """
+    try:
+        value = int(text)
+    except ValueError:
+        value = 0
+    if value <= 0:
+        raise argparse.ArgumentTypeError(repr(text)+' is not a positive int')
+    return value
+
+
 def parse():
     """
     Returns: the command line arguments
@@ -24,13 +46,35 @@ def parse():
     This function uses argparse to handle the command line arguments.  The benefit of
     argparse is the built-in error checking and help menu.
     """
-    parser = argparse.ArgumentParser(prog='imager',description='Application to process an image file.')
-    parser.add_argument('image', type=str, nargs='?', help='the image file to process')
+    parser = argparse.ArgumentParser(prog='imager',description='Application to process an image file.',
+                                     epilog="run 'imager batch -h' to process many files without the GUI")
+    parser.add_argument('image', type=str, nargs='?', help='the image (or .ims session) file to process')
     parser.add_argument('-t','--test',   action='store_true',  help='run a unit test on Image and Editor')
     parser.add_argument('-g','--grade',   action='store_true', help='grade the assignment')
+    parser.add_argument('-b','--bench',   action='store_true', help='benchmark Image and Filter on large images')
+    parser.add_argument('-r','--release', action='store_true', help='skip the per-pixel precondition checks in Image')
+    parser.add_argument('-m','--budget', type=float, metavar='MB', help='limit the memory of the undo history')
+    parser.add_argument('-c','--convert', type=str, metavar='OUTPUT', help='convert the image to a raw (.imr) file')
+    parser.add_argument('-w','--workers', type=positive, metavar='N', help='run the filters in N worker processes')
+    parser.add_argument('--threads', action='store_true', help='make the workers threads (one per core without --workers)')
     return parser.parse_args()
 
 
+def parallel(workers, threads):
+    """
+    Runs the whole-image filters of the application in a pool of workers
+    
+    Parameter workers: The number of workers (or None for one per core)
+    Precondition: workers is an int > 0 or None
+    
+    Parameter threads: Whether the workers are threads (instead of processes)
+    Precondition: threads is a bool
+    """
+    import a6filter
+    import a6parallel
+    a6filter.Filter.EXECUTOR = a6parallel.Executor(workers,threads)
+
+
 def launch(image):
     """
     Launches the gui application with the given image and output (if specified)
@@ -53,6 +97,39 @@ def unittest():
     test_all()
 
 
+def benchmark():
+    """
+    Runs the benchmarks on the Image and Filter classes
+    """
+    from a6bench import bench_all
+    bench_all()
+
+
+def convert(image, output):
+    """
+    Converts an image file to the raw (memory-mapped) format
+    
+    Parameter image: The image file to convert
+    Precondition: image is a filename string
+    
+    Parameter output: The raw file to write
+    Precondition: output is a filename string
+    """
+    from a6raw import convert
+    convert(image,output)
+
+
+def batch(argv):
+    """
+    Processes image files without the GUI, and exits with the status of the batch
+    
+    Parameter argv: The command line arguments after 'batch'
+    Precondition: argv is a list of strings
+    """
+    from a6batch import main
+    sys.exit(main(argv))
+
+
 def grade(image):
     """
     Grades the assignment.
@@ -71,17 +148,30 @@ def execute():
     """
     Executes the application, according to the command line arguments specified.
     """
+    if sys.argv[1:2] == ['batch']:
+        batch(sys.argv[2:])
     args = parse()
     
     image = args.image
+    if args.release:
+        os.environ["IMAGER_RELEASE"] = "1"
+    if args.budget:
+        os.environ["IMAGER_BUDGET"] = str(args.budget)
+    if args.workers or args.threads:
+        parallel(args.workers,args.threads)
     
     # Switch on the options
     if args.test:
         unittest()
     elif args.grade:
         grade(image)
+    elif args.bench:
+        benchmark()
+    elif args.convert:
+        convert(image,args.convert)
     else:
         launch(image)
 
-# Do it
-execute()
\ No newline at end of file
+# Do it (but not in a worker process that imports this file)
+if __name__ == '__main__':
+    execute()
\ No newline at end of file
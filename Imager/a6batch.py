@@ -0,0 +1,321 @@
+"""
+Headless batch processing for the imager application.
+
+The application applies filters one image at a time, through the GUI. This
+module applies the same actions to many image files from the command line,
+without the GUI (it never imports Kivy):
+
+    python imager batch --ops "monochromify:sepia,vignette" in/*.png -o out/
+
+The actions are a comma-separated list (see parse). Each file is decoded,
+edited in place by an Encoder without an edit history (using chain, so the
+color and geometric actions are fused), and written to the output folder
+with the same name. Files in the raw format (see a6raw) are read and
+written as raw files; any other file is read and written with PIL, in the
+format of its extension.
+
+The files are processed by a pool of worker processes, one file per worker
+at a time. Only a few files more than the number of workers are queued, so
+the pixels of at most that many images are in memory at once. The function
+main reports the time of each file as it finishes, and the total throughput
+at the end.
+
+Author: Yan Zhu yz2477  Aroma Dong jd778
+Date:   10/18/2026
+"""
+import a6encode
+import a6image
+import a6raw
+import argparse
+import concurrent.futures
+import os
+import time
+
+
+# The types of a number argument
+NUMBER = (int, float)
+
+# The actions that a batch can apply (the methods of Encoder), with the types of their arguments
+ACTIONS = {'invert' : (), 'transpose' : (), 'reflectHori' : (), 'reflectVert' : (),
+           'rotateLeft' : (), 'rotateRight' : (), 'monochromify' : ((bool,),), 'jail' : (),
+           'vignette' : (), 'pixellate' : ((int,),), 'blur' : ((int,),), 'gaussian' : (NUMBER,),
+           'sharpen' : (), 'edges' : (), 'curve' : ((str,),), 'encode' : ((str,),)}
+
+# The tone curves of the action curve, with the types of their arguments (see a6engine.CURVES)
+CURVES = {'invert' : (), 'gamma' : (NUMBER,), 'levels' : ((int,),(int,)), 'contrast' : (NUMBER,)}
+
+# The words that stand for bools in the arguments of an action
+WORDS = {'sepia' : True, 'true' : True, 'grey' : False, 'gray' : False, 'false' : False}
+
+# The number of files queued for each worker
+QUEUE = 2
+
+
+def _value(text):
+    """
+    Returns the argument of an action written as text.
+
+    The text is a bool if it is in WORDS, an int or a float if it is a
+    number, and a string otherwise.
+
+    Parameter text: The written argument
+    Precondition: text is a string
+    """
+    if text.lower() in WORDS:
+        return WORDS[text.lower()]
+    for kind in (int, float):
+        try:
+            return kind(text)
+        except ValueError:
+            pass
+    return text
+
+
+def parse(ops):
+    """
+    Returns the list of actions written in the string ops.
+
+    The actions are separated by commas. Each action is a name in ACTIONS,
+    followed by its arguments, each after a colon (such as 'pixellate:8' or
+    'curve:gamma:2.2'). The message of encode is the rest of the action, so
+    it may contain colons. The result is a list of [name, args] lists, as in
+    Editor.getRecipe.
+
+    This function raises a ValueError if an action is not in ACTIONS (or a
+    curve not in CURVES), or if it has the wrong number or types of
+    arguments. It does not check their values (such as a step of 0).
+
+    Parameter ops: The actions
+    Precondition: ops is a string
+    """
+    assert type(ops) == str, repr(ops)+' is not a string'
+    result = []
+    for op in ops.split(','):
+        op = op.strip()
+        # The message of encode may contain colons
+        name, *parts = op.split(':',1 if op.startswith('encode:') else -1)
+        if not name in ACTIONS:
+            raise ValueError(repr(name)+' is not a batch action')
+        kinds = ACTIONS[name]
+        if name == 'curve' and parts:
+            if not parts[0] in CURVES:
+                raise ValueError(repr(parts[0])+' is not a tone curve')
+            kinds = kinds+CURVES[parts[0]]
+        if len(parts) != len(kinds):
+            raise ValueError(repr(op)+' needs '+str(len(kinds))+' argument'+('' if len(kinds) == 1 else 's'))
+        args = [part if kind == (str,) else _value(part) for (part, kind) in zip(parts,kinds)]
+        for (arg, kind) in zip(args,kinds):
+            if not type(arg) in kind:
+                raise ValueError(repr(op)+' has an invalid argument '+repr(arg))
+        result.append([name,args])
+    return result
+
+
+def read(filename):
+    """
+    Returns the image in the given file, as a packed image.
+
+    This function raises an OSError if the file cannot be read or decoded.
+
+    Parameter filename: The image file
+    Precondition: filename is a string
+    """
+    if a6raw.is_raw(filename):
+        return a6raw.load(filename)
+    from PIL import Image as CoreImage
+    with CoreImage.open(filename) as image:
+        return a6image.Image.fromPIL(image)
+
+
+def write(image, filename):
+    """
+    Writes the image to the given file, replacing any existing file.
+
+    This function raises an OSError if the file cannot be written, and a
+    ValueError if PIL does not know its format.
+
+    Parameter image: The image to write
+    Precondition: image is an Image object
+
+    Parameter filename: The image file
+    Precondition: filename is a string
+    """
+    if a6raw.is_raw(filename):
+        a6raw.save(image,filename)
+    else:
+        image.toPIL().save(filename)
+
+
+def process(source, target, actions):
+    """
+    Applies the actions to the image in source, and writes the result to target.
+
+    The result is a tuple (pixels, seconds) with the size of the image and
+    the time it took to read, edit and write it. This function raises an
+    OSError or ValueError if a file cannot be read or written, if target is
+    source, or if the message of an encode action does not fit in the image.
+
+    Parameter source: The image file to read
+    Precondition: source is a string
+
+    Parameter target: The image file to write
+    Precondition: target is a string
+
+    Parameter actions: The actions to apply
+    Precondition: actions is a list of [name, args] lists (see parse)
+    """
+    if os.path.abspath(source) == os.path.abspath(target):
+        raise ValueError('the output would replace the original')
+    start  = time.perf_counter()
+    # No edit history, so the image is edited in place without any copies
+    editor = a6encode.Encoder.scratch(read(source))
+    # Chain the actions between the encodes, as encode reports failure
+    pending = []
+    for (name, args) in actions:
+        if name != 'encode':
+            pending.append([name,args])
+            continue
+        editor.chain(pending)
+        pending = []
+        if not editor.encode(*args):
+            raise ValueError('the message does not fit in the image')
+    editor.chain(pending)
+    image = editor.getCurrent()
+    write(image,target)
+    return (len(image), time.perf_counter()-start)
+
+
+def _task(source, target, actions):
+    """
+    Returns the tuple (source, target, pixels, seconds, error) of a file in a worker.
+
+    This is process, except that any failure (including an action with
+    invalid arguments) is returned as the message error (with pixels and
+    seconds 0) instead of raised, so that it does not stop the batch. On
+    success, error is None.
+
+    Parameter source: The image file to read
+    Precondition: source is a string
+
+    Parameter target: The image file to write
+    Precondition: target is a string
+
+    Parameter actions: The actions to apply
+    Precondition: actions is a list of [name, args] lists (see parse)
+    """
+    try:
+        return (source, target)+process(source,target,actions)+(None,)
+    except Exception as e:
+        return (source, target, 0, 0, str(e) or type(e).__name__)
+
+
+def target(source, output):
+    """
+    Returns the file for the result of source in the folder output.
+
+    This is the file of the same name in output. So two files of the same
+    name in different folders have the same target (see main).
+
+    Parameter source: The image file to read
+    Precondition: source is a string
+
+    Parameter output: The folder for the results
+    Precondition: output is a string
+    """
+    return os.path.join(output,os.path.basename(source))
+
+
+def run(files, actions, output, workers=None):
+    """
+    Returns a generator that processes the given files, one result per file.
+
+    Each result is the tuple (source, target, pixels, seconds, error) of a
+    file (see _task), where target is the file of the same name in the
+    folder output (see target). The results come in the order that the files finish.
+    The files are processed by the given number of worker processes, with
+    at most QUEUE files queued for each worker. With one worker, they are
+    processed in this process, in order.
+
+    Parameter files: The image files to process
+    Precondition: files is a list of strings
+
+    Parameter actions: The actions to apply
+    Precondition: actions is a list of [name, args] lists (see parse)
+
+    Parameter output: The folder for the results
+    Precondition: output is a string naming a folder
+
+    Parameter workers: The number of workers (or None for one per core)
+    Precondition: workers is an int > 0 or None
+    """
+    assert type(files) == list, repr(files)+' is not a list of files'
+    assert workers is None or (type(workers) == int and workers > 0), repr(workers)+' is not a valid number of workers'
+    workers = (os.cpu_count() or 1) if workers is None else workers
+    tasks = [(source,target(source,output),actions) for source in files]
+    if workers == 1:
+        for task in tasks:
+            yield _task(*task)
+        return
+
+    with concurrent.futures.ProcessPoolExecutor(workers) as pool:
+        pending = set()
+        for task in tasks:
+            if len(pending) >= QUEUE*workers:
+                done, pending = concurrent.futures.wait(pending,return_when=concurrent.futures.FIRST_COMPLETED)
+                for future in done:
+                    yield future.result()
+            pending.add(pool.submit(_task,*task))
+        for future in concurrent.futures.as_completed(pending):
+            yield future.result()
+
+
+def main(argv):
+    """
+    Runs a batch from the command line, and returns the exit status.
+
+    The status is 0 if every file was processed, 1 if any failed, and 2 if
+    the arguments are invalid (including two files with the same name, as
+    their results would replace each other). Each file is reported when it
+    finishes.
+
+    Parameter argv: The command line arguments (after 'batch')
+    Precondition: argv is a list of strings
+    """
+    parser = argparse.ArgumentParser(prog='imager batch',description='Apply actions to image files without the GUI.')
+    parser.add_argument('files', type=str, nargs='+', help='the image files to process')
+    parser.add_argument('--ops', type=str, required=True, help='the actions, such as "monochromify:sepia,vignette"')
+    parser.add_argument('-o','--output', type=str, required=True, help='the folder for the results')
+    parser.add_argument('-w','--workers', type=int, metavar='N', help='process N files at a time (default one per core)')
+    args = parser.parse_args(argv)
+    try:
+        actions = parse(args.ops)
+    except ValueError as e:
+        parser.error(str(e))
+    if not args.workers is None and args.workers <= 0:
+        parser.error('the number of workers must be positive')
+    seen = {}
+    for source in args.files:
+        result = os.path.abspath(target(source,args.output))
+        if result in seen:
+            parser.error(repr(seen[result])+' and '+repr(source)+' have the same output '+repr(target(source,args.output)))
+        seen[result] = source
+    os.makedirs(args.output,exist_ok=True)
+
+    start  = time.perf_counter()
+    count  = 0
+    pixels = 0
+    failed = 0
+    for (source, _, size, seconds, error) in run(args.files,actions,args.output,args.workers):
+        if error is None:
+            count  += 1
+            pixels += size
+            print('%-40s %8.2f MP %8.3f s' % (source,size/1e6,seconds))
+        else:
+            failed += 1
+            print('%-40s failed: %s' % (source,error))
+    total = time.perf_counter()-start
+    print('%d files (%.1f MP) in %.3f s: %.2f files/s, %.2f MP/s' %
+          (count,pixels/1e6,total,count/total if total else 0,pixels/1e6/total if total else 0))
+    if failed:
+        print('%d files failed' % failed)
+    return 1 if failed else 0
@@ -0,0 +1,1128 @@
+"""
+Benchmark script for the imager application.
+
+The test script a6test checks that Image, Filter and Encoder are correct on
+small images. This script measures how they behave on large ones. Each
+benchmark builds synthetic images of the requested size and prints a short
+report of the time or memory it took. Nothing is compared against expected
+output, so these functions are safe to run on any machine.
+
+Run all of the benchmarks with
+
+    python imager --bench
+
+Author: Yan Zhu yz2477  Aroma Dong jd778
+Date:   10/18/2026
+"""
+import a6batch
+import a6image
+import a6engine
+import a6filter
+import a6parallel
+import a6raw
+import a6session
+import math
+import os
+import random
+import tempfile
+import time
+import tracemalloc
+
+
+# Helpers to build synthetic images
+
+def make_buffer(size, seed=0):
+    """
+    Returns a pixel buffer of size random pixels.
+
+    The random generator is seeded, so the same arguments always produce the
+    same pixels.
+
+    Parameter size: The number of pixels
+    Precondition: size is an int >= 0
+
+    Parameter seed: The random seed
+    Precondition: seed is an int
+    """
+    return bytearray(random.Random(seed).randbytes(3*size))
+
+
+def make_square(megapixels, packed=True, seed=0):
+    """
+    Returns a square Image of random pixels with about the given size.
+
+    The filters are all well-defined on square images (vignette is not
+    always defined on other shapes), so the benchmarks use these.
+
+    Parameter megapixels: The image size in millions of pixels
+    Precondition: megapixels is a number > 0
+    """
+    side = int(math.sqrt(megapixels*1e6))
+    return make_image(side,side,packed,seed)
+
+
+def make_image(width, height, packed=True, seed=0):
+    """
+    Returns a width x height Image of random pixels.
+
+    Parameter width: The image width
+    Precondition: width is an int > 0
+
+    Parameter height: The image height
+    Precondition: height is an int > 0
+
+    Parameter packed: Whether the image stores a pixel buffer
+    Precondition: packed is a bool
+
+    Parameter seed: The random seed
+    Precondition: seed is an int
+    """
+    image = a6image.Image(make_buffer(width*height,seed),width)
+    return image if packed else image.copy(packed=False)
+
+
+def make_smooth(megapixels):
+    """
+    Returns a square packed Image with a smooth gradient.
+
+    Random pixels cannot be compressed, but photos can. This image (an orange
+    square with vignetting) is a stand-in for a photo.
+
+    Parameter megapixels: The image size in millions of pixels
+    Precondition: megapixels is a number > 0
+    """
+    side = int(math.sqrt(megapixels*1e6))
+    data = a6engine.vignette(bytes([230,150,60])*(side*side),side,side)
+    return a6image.Image(bytearray(data),side)
+
+
+def measure(action, *args):
+    """
+    Returns the pair (result, seconds) for calling action(*args).
+
+    Parameter action: The function to time
+    Precondition: action is callable
+    """
+    start  = time.perf_counter()
+    result = action(*args)
+    return (result, time.perf_counter()-start)
+
+
+def allocated(action, *args):
+    """
+    Returns the pair (result, bytes) for calling action(*args).
+
+    The value bytes is the memory still allocated (according to tracemalloc)
+    by the result once the call is complete.
+
+    Parameter action: The function to measure
+    Precondition: action is callable
+    """
+    tracemalloc.start()
+    try:
+        before = tracemalloc.get_traced_memory()[0]
+        result = action(*args)
+        after  = tracemalloc.get_traced_memory()[0]
+    finally:
+        tracemalloc.stop()
+    return (result, after-before)
+
+
+def report(label, *columns):
+    """
+    Prints a single row of a benchmark report.
+
+    Parameter label: The row label
+    Precondition: label is a string
+
+    Parameter columns: The values for the remaining columns
+    Precondition: columns are strings
+    """
+    print('  '+label.ljust(24)+''.join(str(col).rjust(14) for col in columns))
+
+
+# Benchmarks
+
+def bench_storage(sizes=(1,4)):
+    """
+    Compares the memory used by list and packed images.
+
+    Parameter sizes: The image sizes to measure, in megapixels
+    Precondition: sizes is a tuple of ints > 0
+    """
+    print('Memory use of image storage')
+    report('megapixels','list','packed','ratio')
+    for mp in sizes:
+        width  = 1000
+        height = 1000*mp
+        buffer = make_buffer(width*height)
+        # Only count the image itself, not the random data
+        values = iter(buffer)
+        listed, listsize = allocated(lambda : a6image.Image(list(zip(values,values,values)),width))
+        packed, packsize = allocated(lambda : a6image.Image(buffer.copy(),width))
+        report(str(mp),'%.1f MB' % (listsize/1e6),'%.1f MB' % (packsize/1e6),
+               '%.1fx' % (listsize/packsize))
+        report('  bytes per pixel','%.1f' % (listsize/len(listed)),
+               '%.1f' % (packsize/len(packed)))
+        del listed, packed
+
+
+# The filter actions measured by bench_filters
+FILTERS = [('invert',()), ('monochromify',(False,)), ('monochromify',(True,)),
+           ('vignette',()), ('reflectHori',()), ('reflectVert',()),
+           ('transpose',()), ('rotateLeft',()), ('rotateRight',()), ('jail',())]
+
+
+def time_filter(image, name, args, vectorize):
+    """
+    Returns the seconds taken by the given Filter action on image.
+
+    The image is not modified; the action runs on the Filter copy.
+
+    Parameter image: The image to filter
+    Precondition: image is an Image object
+
+    Parameter name: The name of the Filter method
+    Precondition: name is a string
+
+    Parameter args: The arguments to the method
+    Precondition: args is a tuple
+
+    Parameter vectorize: Whether to use the whole-image filters
+    Precondition: vectorize is a bool
+    """
+    editor = a6filter.Filter(image)
+    editor.VECTORIZE = vectorize
+    return measure(getattr(editor,name),*args)[1]
+
+
+def bench_filters(sizes=(1,12,48), sample=0.25):
+    """
+    Compares the pixel loops in Filter with the whole-image versions.
+
+    The pixel loops take minutes on large images, so they are only timed on
+    a sample image of the given size. Their time on larger images is
+    estimated from this, as the loops are linear in the number of pixels.
+
+    Parameter sizes: The image sizes to measure, in megapixels
+    Precondition: sizes is a tuple of numbers > 0
+
+    Parameter sample: The size of the image for timing the loops
+    Precondition: sample is a number > 0
+    """
+    print('Filter times (loop time is estimated from a '+str(sample)+' MP sample)')
+    image = make_square(sample)
+    loops = {}
+    for (name, args) in FILTERS:
+        loops[(name,args)] = time_filter(image,name,args,False)/len(image)
+    
+    for mp in sizes:
+        image = make_square(mp)
+        print('  '+str(mp)+' megapixels')
+        report('filter','loop','vectorized','speedup')
+        for (name, args) in FILTERS:
+            fast = time_filter(image,name,args,True)
+            slow = loops[(name,args)]*len(image)
+            label = name+('(sepia)' if args == (True,) else '')
+            report(label,'%.2f s' % slow,'%.3f s' % fast,'%.0fx' % (slow/fast))
+        del image
+
+
+def bench_reshape(sizes=(0.01,1,4), repeat=20000):
+    """
+    Checks that reshaping an image takes time independent of its size.
+
+    This is a regression benchmark. It reports the time per call of the
+    setters setWidth, setHeight and reshape and fails with an AssertionError
+    if the largest image is more than 3 times slower than the smallest.
+
+    Parameter sizes: The image sizes to measure, in megapixels
+    Precondition: sizes is a tuple of numbers > 0, smallest first
+
+    Parameter repeat: The number of calls to time
+    Precondition: repeat is an int > 0
+    """
+    print('Reshape cost')
+    report('megapixels','setWidth','setHeight','reshape')
+    times = []
+    for mp in sizes:
+        image  = make_square(mp)
+        side   = image.getWidth()
+        width  = measure(lambda : [image.setWidth(side) for _ in range(repeat)])[1]
+        height = measure(lambda : [image.setHeight(side) for _ in range(repeat)])[1]
+        both   = measure(lambda : [image.reshape(side,side) for _ in range(repeat)])[1]
+        report(str(mp),*('%.2f us' % (1e6*t/repeat) for t in (width,height,both)))
+        times.append(max(width,height,both))
+    assert times[-1] < 3*times[0], 'reshape cost grows with the image size'
+
+
+# The original pixel-by-pixel versions of the filters rewritten with rows
+
+def pixel_reflect_hori(image):
+    """
+    Reflects image around the horizontal middle, one pixel at a time.
+
+    Parameter image: The image to reflect
+    Precondition: image is an Image object
+    """
+    for h in range(image.getWidth()//2):
+        for row in range(image.getHeight()):
+            image.swapPixels(row,h,row,image.getWidth()-1-h)
+
+
+def pixel_reflect_vert(image):
+    """
+    Reflects image around the vertical middle, one pixel at a time.
+
+    Parameter image: The image to reflect
+    Precondition: image is an Image object
+    """
+    for h in range(image.getHeight()//2):
+        for col in range(image.getWidth()):
+            image.swapPixels(h,col,image.getHeight()-1-h,col)
+
+
+def pixel_jail(image):
+    """
+    Draws the jail bars of Filter.jail on image, one pixel at a time.
+
+    Parameter image: The image to draw on
+    Precondition: image is an Image object
+    """
+    width  = image.getWidth()
+    height = image.getHeight()
+    n = (width-8)//50
+    d = (width-8-(n*4))/(n+1)
+    for row in (0,height-3):
+        for pos in range(width*row,width*(row+3)):
+            image[pos] = (255,0,0)
+    for col in [0,width-4]+[int(round((i+1)*(4+d))) for i in range(n)]:
+        for row in range(height):
+            for pos in range(col,col+4):
+                image.setPixel(row,pos,(255,0,0))
+
+
+def bench_rows(width=4000, height=3000, sample=0.25):
+    """
+    Compares the bulk row and rectangle methods with pixel loops.
+
+    The filters reflectHori, reflectVert and jail are timed in the loop
+    version of Filter (VECTORIZE is False), which uses getRow, setRow and
+    fillRect. The original pixel loops are timed on a sample image and
+    scaled up, as they take minutes on a full size image.
+
+    Parameter width: The image width
+    Precondition: width is an int > 8
+
+    Parameter height: The image height
+    Precondition: height is an int > 3
+
+    Parameter sample: The size of the image for timing the pixel loops
+    Precondition: sample is a number > 0
+    """
+    print('Bulk row access on a '+str(width)+'x'+str(height)+' image')
+    report('filter','pixels','rows','speedup')
+    small = make_square(sample)
+    image = make_image(width,height)
+    for (name, loop) in [('reflectHori',pixel_reflect_hori),
+                         ('reflectVert',pixel_reflect_vert),('jail',pixel_jail)]:
+        slow = measure(loop,small.copy())[1]*len(image)/len(small)
+        fast = time_filter(image,name,(),False)
+        report(name,'%.2f s' % slow,'%.3f s' % fast,'%.0fx' % (slow/fast))
+
+
+def time_access(image, count):
+    """
+    Returns a tuple of the seconds taken by count calls of each accessor.
+
+    The accessors are, in order, __getitem__, __setitem__, getPixel and
+    setPixel. The positions wrap around the image.
+
+    Parameter image: The image to access
+    Precondition: image is an Image object
+
+    Parameter count: The number of calls to time
+    Precondition: count is an int > 0
+    """
+    size  = len(image)
+    width = image.getWidth()
+    positions = [pos % size for pos in range(count)]
+    cells = [(pos // width, pos % width) for pos in positions]
+    pixel = (1,2,3)
+    
+    def get():
+        for pos in positions:
+            image[pos]
+    def set():
+        for pos in positions:
+            image[pos] = pixel
+    def getPixel():
+        for (row,col) in cells:
+            image.getPixel(row,col)
+    def setPixel():
+        for (row,col) in cells:
+            image.setPixel(row,col,pixel)
+    return tuple(measure(action)[1] for action in (get,set,getPixel,setPixel))
+
+
+def bench_access(count=1000000):
+    """
+    Compares the per-pixel accessors of Image in debug and release mode.
+
+    The report shows the number of calls per second (in millions) for both
+    list and packed images. See a6image.setRelease.
+
+    Parameter count: The number of calls to time for each accessor
+    Precondition: count is an int > 0
+    """
+    print('Pixel access throughput (millions of calls per second)')
+    report('mode','[]','[]=','getPixel','setPixel')
+    release = a6image.isRelease()
+    try:
+        for packed in (False,True):
+            image = make_image(1000,1000,packed)
+            for flag in (False,True):
+                a6image.setRelease(flag)
+                label = ('packed' if packed else 'list')+(' release' if flag else ' debug')
+                report(label,*('%.2f' % (count/1e6/t) for t in time_access(image,count)))
+    finally:
+        a6image.setRelease(release)
+
+class SnapshotFilter(a6filter.Filter):
+    """
+    A Filter with the original edit history, which copies the whole image on
+    every edit. It is only used to compare memory use with Editor.
+    """
+    
+    def __init__(self, original):
+        """
+        Initializes an edit history for the given image.
+        """
+        self._original = original
+        self.clear()
+    
+    def getCurrent(self):
+        """
+        Returns the most recent edit
+        """
+        return self._history[-1]
+    
+    def clear(self):
+        """
+        Deletes the entire edit history, retoring the original image.
+        """
+        self._history = [self._original.copy()]
+    
+    def undo(self):
+        """
+        Returns True if the latest edit can be undone, False otherwise.
+        """
+        if len(self._history) > 1:
+            self._history.pop()
+            return True
+        return False
+    
+    def increment(self):
+        """
+        Adds a new copy of the image to the edit history.
+        """
+        self._history.append(self.getCurrent().copy())
+        if len(self._history) > self.MAX_HISTORY:
+            self._history.pop(0)
+
+
+def peak_memory(action, *args):
+    """
+    Returns the pair (result, bytes) for the peak memory use of action(*args).
+
+    The value bytes is the largest amount of memory (according to tracemalloc)
+    allocated at any time during the call.
+
+    Parameter action: The function to measure
+    Precondition: action is callable
+    """
+    tracemalloc.start()
+    try:
+        result = action(*args)
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return (result, peak)
+
+
+def edit_session(editor, actions, count):
+    """
+    Returns the editor after applying count actions, each with an increment.
+
+    The actions are used in order, repeating as necessary.
+
+    Parameter editor: The editor to modify
+    Precondition: editor is a Filter object
+
+    Parameter actions: The filter actions as (name, args) pairs
+    Precondition: actions is a non-empty list of pairs
+
+    Parameter count: The number of actions to apply
+    Precondition: count is an int >= 0
+    """
+    for pos in range(count):
+        name, args = actions[pos % len(actions)]
+        editor.increment()
+        getattr(editor,name)(*args)
+    return editor
+
+
+def bench_history(megapixels=4, count=20):
+    """
+    Compares the memory used by the edit history with full copies per edit.
+
+    Each row applies count filters to an image with an Editor (which shares
+    unchanged tiles between edits) and with the original history (which
+    stores a full copy of the image for every edit). The report shows the peak memory use during the
+    session and the memory still held by the history at the end.
+
+    Parameter megapixels: The image size, in megapixels
+    Precondition: megapixels is a number > 0
+
+    Parameter count: The number of filters to apply
+    Precondition: count is an int > 0
+    """
+    print('Edit history memory for '+str(count)+' filters on a '+str(megapixels)+' MP image')
+    report('filters','copies peak','tiles peak','copies held','tiles held')
+    image = make_square(megapixels)
+    sessions = [('all filters',FILTERS), ('jail and invert',[('jail',()),('invert',())]),
+                ('jail only',[('jail',())])]
+    for (label, actions) in sessions:
+        columns = []
+        held = []
+        for kind in (SnapshotFilter,a6filter.Filter):
+            editor, peak = peak_memory(lambda : edit_session(kind(image),actions,count))
+            columns.append('%.0f MB' % (peak/1e6))
+            held.append('%.0f MB' % (allocated(lambda : edit_session(kind(image),actions,count))[1]/1e6))
+            del editor
+        report(label,*(columns+held))
+
+
+def draw_border(editor):
+    """
+    Draws a red bar 3 pixels high at the top and bottom of the current image.
+
+    This is the border of Filter.jail, without the vertical bars.
+
+    Parameter editor: The editor to draw on
+    Precondition: editor is a Filter object
+    """
+    current = editor.getCurrent()
+    current.fillRect(0,0,3,current.getWidth(),(255,0,0))
+    current.fillRect(current.getHeight()-3,0,3,current.getWidth(),(255,0,0))
+
+
+def bench_increment(sizes=(1,4,16), repeat=10):
+    """
+    Compares the time of Editor.increment with copying the whole image.
+
+    Each increment follows an edit of the current image. The Editor only
+    copies the tiles that the edit wrote. A border only writes a few tiles,
+    but the vertical bars of a jail cross every tile, so the Editor has to
+    copy (and compare) all of them.
+
+    Parameter sizes: The image sizes to measure, in megapixels
+    Precondition: sizes is a tuple of numbers > 0
+
+    Parameter repeat: The number of increments to time
+    Precondition: repeat is an int > 0
+    """
+    print('Time of an increment after an edit')
+    report('edit','copies','tiles','speedup')
+    for mp in sizes:
+        image = make_square(mp)
+        for (label, edit) in [('border',draw_border),('jail',a6filter.Filter.jail)]:
+            times = []
+            for kind in (SnapshotFilter,a6filter.Filter):
+                editor = kind(image)
+                total  = 0
+                for _ in range(repeat):
+                    edit(editor)
+                    total += measure(editor.increment)[1]
+                times.append(total/repeat)
+            report(label+' ('+str(mp)+' MP)','%.2f ms' % (1e3*times[0]),
+                   '%.2f ms' % (1e3*times[1]),'%.0fx' % (times[0]/times[1]))
+        del image
+
+
+def bench_budget(megapixels=4, count=20, budgets=(None,200,60,20)):
+    """
+    Measures an edit history with a memory budget.
+
+    Each row applies count filters to a smooth image (see make_smooth) with
+    the given budget, then undoes all of them. The report shows the number of
+    images kept, the memory and disk used by the history at the end, and the
+    average time of increment and undo.
+
+    Parameter megapixels: The image size, in megapixels
+    Precondition: megapixels is a number > 0
+
+    Parameter count: The number of filters to apply
+    Precondition: count is an int > 0
+
+    Parameter budgets: The budgets in MB (None for no budget)
+    Precondition: budgets is a tuple of numbers > 0 or None
+    """
+    print('Edit history with a budget, '+str(count)+' filters on a '+str(megapixels)+' MP image')
+    report('budget','images','memory','disk','increment','undo')
+    image = make_smooth(megapixels)
+    for budget in budgets:
+        editor = a6filter.Filter(image,None if budget is None else int(budget*1e6))
+        total  = 0
+        for pos in range(count):
+            name, args = FILTERS[pos % len(FILTERS)]
+            getattr(editor,name)(*args)
+            total += measure(editor.increment)[1]
+        images = editor.getHistoryLength()
+        memory = editor.getMemoryUsage()
+        disk   = editor.getDiskUsage()
+        undo   = measure(lambda : [editor.undo() for _ in range(images-1)])[1]
+        report('none' if budget is None else str(budget)+' MB',str(images),
+               '%.0f MB' % (memory/1e6),'%.0f MB' % (disk/1e6),
+               '%.1f ms' % (1e3*total/count),'%.1f ms' % (1e3*undo/max(1,images-1)))
+
+
+def bench_branches(megapixels=4):
+    """
+    Compares switching between branches of the edit history with recomputing.
+
+    Three chains of filters start with the same prefix (vignette and sepia).
+    Without branches, comparing them means applying the prefix again for
+    every chain (and again every time we switch back). With branches, the
+    prefix is applied once, and switching is a goto. The report shows the
+    time to build all three chains, the time to switch between them, and
+    the memory used by the history for all of them.
+
+    Parameter megapixels: The image size, in megapixels
+    Precondition: megapixels is a number > 0
+    """
+    print('Comparing 3 filter chains on a '+str(megapixels)+' MP image')
+    report('method','build','switch','memory')
+    image  = make_smooth(megapixels)
+    prefix = [('vignette',()),('monochromify',(True,))]
+    chains = [[('jail',())],[('reflectVert',())],[('invert',()),('jail',())]]
+    
+    def apply(editor, actions):
+        for (name, args) in actions:
+            editor.increment()
+            getattr(editor,name)(*args)
+    
+    # Recompute the prefix for each chain, in separate editors
+    editors = []
+    start = time.perf_counter()
+    for chain in chains:
+        editors.append(a6filter.Filter(image))
+        apply(editors[-1],prefix+chain)
+    build = time.perf_counter()-start
+    start = time.perf_counter()
+    for chain in chains:
+        apply(a6filter.Filter(image),prefix+chain)
+    switch = (time.perf_counter()-start)/len(chains)
+    memory = sum(editor.getMemoryUsage() for editor in editors)
+    report('recompute','%.2f s' % build,'%.3f s' % switch,'%.0f MB' % (memory/1e6))
+    del editors
+    
+    # Branch from the prefix once
+    editor = a6filter.Filter(image)
+    start = time.perf_counter()
+    apply(editor,prefix)
+    common = editor.getPosition()
+    tips   = []
+    for chain in chains:
+        editor.goto(common)
+        apply(editor,chain)
+        tips.append(editor.getPosition())
+    build = time.perf_counter()-start
+    switch = measure(lambda : [editor.goto(tip) for tip in tips])[1]/len(tips)
+    memory = editor.getMemoryUsage()
+    report('branches','%.2f s' % build,'%.3f s' % switch,'%.0f MB' % (memory/1e6))
+
+
+def bench_oplog(megapixels=4, count=20, intervals=(None,10,5)):
+    """
+    Compares storing the images of the edit history with replaying actions.
+
+    Each row applies count filters with perform, using an Editor with the
+    given checkpoint interval (None keeps every image). The report shows the
+    memory held by the history, and the average time of an undo and a redo
+    when walking through the whole history.
+
+    Parameter megapixels: The image size, in megapixels
+    Precondition: megapixels is a number > 0
+
+    Parameter count: The number of filters to apply
+    Precondition: count is an int > 0
+
+    Parameter intervals: The checkpoint intervals to compare
+    Precondition: intervals is a tuple of ints > 0 or None
+    """
+    print('Replayed history for '+str(count)+' filters on a '+str(megapixels)+' MP image')
+    report('checkpoint','memory','undo','redo')
+    image = make_smooth(megapixels)
+    for interval in intervals:
+        editor = a6filter.Filter(image,checkpoint=interval)
+        for pos in range(count):
+            name, args = FILTERS[pos % len(FILTERS)]
+            editor.perform(name,*args)
+        memory = editor.getMemoryUsage()
+        undo = measure(lambda : [editor.undo() for _ in range(count)])[1]/count
+        redo = measure(lambda : [editor.redo() for _ in range(count)])[1]/count
+        report('none' if interval is None else str(interval),'%.0f MB' % (memory/1e6),
+               '%.3f s' % undo,'%.3f s' % redo)
+
+
+def bench_session(megapixels=20, count=10):
+    """
+    Compares opening a saved session with redoing its edits.
+
+    An editor applies count filters with perform, and is saved as a session.
+    Redoing the edits means loading the original (from a raw file, the
+    fastest format) and performing every filter again. The report shows the
+    time of each, the time to save, and the size of the files.
+
+    Parameter megapixels: The image size, in megapixels
+    Precondition: megapixels is a number > 0
+
+    Parameter count: The number of filters to apply
+    Precondition: count is an int > 0
+    """
+    print('Reopening '+str(count)+' filters on a '+str(megapixels)+' MP image')
+    report('method','save','open','file size')
+    folder  = tempfile.mkdtemp()
+    raw     = os.path.join(folder,'original'+a6raw.EXTENSION)
+    session = os.path.join(folder,'session'+a6session.EXTENSION)
+    a6raw.save(make_smooth(megapixels),raw)
+    actions = [FILTERS[pos % len(FILTERS)] for pos in range(count)]
+
+    def redo():
+        editor = a6filter.Filter(a6raw.load(raw))
+        for (name, args) in actions:
+            editor.perform(name,*args)
+        return editor
+
+    editor, seconds = measure(redo)
+    report('redo edits','','%.2f s' % seconds,'%.0f MB' % (os.path.getsize(raw)/1e6))
+    save = measure(a6session.save,editor,session)[1]
+    del editor
+    editor, seconds = measure(a6session.load,session,a6filter.Filter)
+    report('session','%.2f s' % save,'%.2f s' % seconds,'%.0f MB' % (os.path.getsize(session)/1e6))
+    del editor
+    os.remove(raw)
+    os.remove(session)
+    os.rmdir(folder)
+
+
+def bench_pipeline(megapixels=4, repeat=3):
+    """
+    Compares a chain of 5 filters applied one at a time with a fused pipeline.
+
+    The chain is reflectHori, invert, monochromify (sepia), rotateRight and
+    vignette. One at a time, each filter is an edit (with perform) and a
+    full pass over the image. The pipeline applies the chain as one edit, in
+    one pass. The report shows the best time of each, and the memory held
+    by the history afterwards.
+
+    Parameter megapixels: The image size, in megapixels
+    Precondition: megapixels is a number > 0
+
+    Parameter repeat: The number of times to time each method
+    Precondition: repeat is an int > 0
+    """
+    print('A chain of 5 filters on a '+str(megapixels)+' MP image')
+    report('method','time','history')
+    image = make_smooth(megapixels)
+    chain = [('reflectHori',()),('invert',()),('monochromify',(True,)),
+             ('rotateRight',()),('vignette',())]
+
+    def steps():
+        editor = a6filter.Filter(image)
+        for (name, args) in chain:
+            editor.perform(name,*args)
+        return editor
+
+    def fused():
+        editor = a6filter.Filter(image)
+        pipeline = editor.pipeline()
+        for (name, args) in chain:
+            getattr(pipeline,name)(*args)
+        pipeline.apply()
+        return editor
+
+    results = []
+    for (label, method) in (('one at a time',steps),('pipeline',fused)):
+        seconds = min(measure(method)[1] for _ in range(repeat))
+        editor  = method()
+        results.append(editor.getCurrent().getBytes())
+        report(label,'%.3f s' % seconds,'%.0f MB' % (editor.getMemoryUsage()/1e6))
+        del editor
+    assert results[0] == results[1], 'the pipeline does not match the filters'
+
+
+def bench_orientation(sizes=(1,4,16), count=1000000):
+    """
+    Compares moving the pixels for geometric filters with changing the orientation.
+
+    Each row applies transpose, rotateRight, reflectHori, rotateLeft and
+    reflectVert to an image, each as an edit. Moving the pixels (with the
+    whole-image functions of a6engine) takes a pass over the image for each
+    filter, and a full copy in the history. Changing the orientation of the
+    image takes constant time and shares every tile with the previous edit.
+    The report shows the time of the five edits, the memory held by the
+    history, and the time of count random getPixel calls afterwards (which
+    translate the position when the image has an orientation).
+
+    Parameter sizes: The image sizes, in megapixels
+    Precondition: sizes is a tuple of numbers > 0
+
+    Parameter count: The number of pixels to read
+    Precondition: count is an int > 0
+    """
+    print('Five geometric filters as edits')
+    report('size','method','edits','history','getPixel')
+    names = ['transpose','rotateRight','reflectHori','rotateLeft','reflectVert']
+
+    def moved(editor):
+        for name in names:
+            editor.increment()
+            current = editor.getCurrent()
+            width, height = current.getWidth(), current.getHeight()
+            current.setBytes(getattr(a6engine,name)(current.getBytes(),width,height))
+            if a6engine.GEOMETRY[name][0]:
+                current.reshape(height,width)
+        editor.increment()
+        return editor
+
+    def oriented(editor):
+        for name in names:
+            editor.increment()
+            getattr(editor,name)()
+        editor.increment()
+        return editor
+
+    for megapixels in sizes:
+        image = make_square(megapixels)
+        rand  = random.Random(0)
+        cells = [(rand.randrange(image.getHeight()),rand.randrange(image.getWidth()))
+                 for _ in range(count)]
+        for (label, method) in (('move pixels',moved),('orientation',oriented)):
+            editor, seconds = measure(method,a6filter.Filter(image))
+            current = editor.getCurrent()
+            access  = measure(lambda : [current.getPixel(row,col) for (row, col) in cells])[1]
+            report(str(megapixels)+' MP',label,'%.3f s' % seconds,
+                   '%.0f MB' % (editor.getMemoryUsage()/1e6),'%.2f s' % access)
+            del editor, current
+
+
+def bench_lookup(megapixels=12, repeat=3):
+    """
+    Compares computing tone curves per color value with looking them up in tables.
+
+    Each row applies a tone curve (see a6engine.curve) to an image, first by
+    evaluating its formula on every color value (with NumPy if it is
+    installed), then by translating the image with the table of the curve.
+    The report shows the best time of each.
+
+    Parameter megapixels: The image size, in megapixels
+    Precondition: megapixels is a number > 0
+
+    Parameter repeat: The number of times to time each method
+    Precondition: repeat is an int > 0
+    """
+    print('Tone curves on a '+str(megapixels)+' MP image')
+    report('curve','formula','table')
+    data = make_smooth(megapixels).getBytes()
+    curves = [('gamma 2.2',a6engine.gamma(2.2),lambda v: 255*(v/255)**(1/2.2)),
+              ('levels 20-200',a6engine.levels(20,200),lambda v: 255*(v-20)/180),
+              ('contrast 1.5',a6engine.contrast(1.5),lambda v: 127.5+1.5*(v-127.5))]
+
+    def formula(function):
+        if a6engine.numpy is None:
+            return bytes(min(255,max(0,round(function(v)))) for v in data)
+        values = a6engine.numpy.frombuffer(data,dtype=a6engine.numpy.uint8)
+        return a6engine.numpy.clip(a6engine.numpy.rint(function(values)),0,255).astype('uint8').tobytes()
+
+    for (label, table, function) in curves:
+        slow = min(measure(formula,function)[1] for _ in range(repeat))
+        fast = min(measure(a6engine.lookup,data,table)[1] for _ in range(repeat))
+        report(label,'%.3f s' % slow,'%.3f s' % fast)
+    tables = [a6engine.gamma(2.2),a6engine.levels(20,200),a6engine.contrast(1.5)]
+    fast = min(measure(a6engine.lookup,data,*tables)[1] for _ in range(repeat))
+    report('one per channel','','%.3f s' % fast)
+
+
+def bench_vignette(megapixels=4, frames=10):
+    """
+    Measures vignette on a batch of frames of the same size.
+
+    The darkening factors of vignette only depend on the size of the image,
+    and are cached (see a6engine._falloff). The first row clears the cache
+    before every frame, so it computes the factors each time. The second row
+    computes them for the first frame only. The report shows the time of
+    the whole batch.
+
+    Parameter megapixels: The size of each frame, in megapixels
+    Precondition: megapixels is a number > 0
+
+    Parameter frames: The number of frames in the batch
+    Precondition: frames is an int > 0
+    """
+    print('Vignette on '+str(frames)+' frames of '+str(megapixels)+' MP')
+    report('factors','batch','per frame')
+    image = make_smooth(megapixels)
+    data  = image.getBytes()
+    side  = image.getWidth()
+
+    def batch(cached):
+        a6engine._falloff.cache_clear()
+        for frame in range(frames):
+            if not cached:
+                a6engine._falloff.cache_clear()
+            a6engine.vignette(data,side,side)
+
+    for (label, cached) in (('every frame',False),('cached',True)):
+        seconds = measure(batch,cached)[1]
+        report(label,'%.3f s' % seconds,'%.3f s' % (seconds/frames))
+
+
+def bench_pixellate(megapixels=12, steps=(2,4,8,16,32,64)):
+    """
+    Measures pixellate for a range of block sizes.
+
+    The block averages come from summed-area tables (see a6engine.integral),
+    so each one costs the same however large the block is. The report shows
+    the time of each step, which should stay flat as step grows.
+
+    Parameter megapixels: The image size, in megapixels
+    Precondition: megapixels is a number > 0
+
+    Parameter steps: The block sizes
+    Precondition: steps is a tuple of ints > 0
+    """
+    print('Pixellate on a '+str(megapixels)+' MP image')
+    report('step','blocks','time')
+    image = make_square(megapixels)
+    for step in steps:
+        editor  = a6filter.Filter(image)
+        seconds = measure(editor.pixellate,step)[1]
+        blocks  = math.ceil(image.getWidth()/step)*math.ceil(image.getHeight()/step)
+        report(str(step),str(blocks),'%.3f s' % seconds)
+        del editor
+
+
+def bench_blur(megapixels=12, radii=(1,2,4,8,16,32,64)):
+    """
+    Measures the blurs for a range of radii.
+
+    Each row shows the time of a box blur with the given radius, a Gaussian
+    blur with that sigma, and (for small radii) a convolution with a square
+    kernel of that radius. The box sums come from summed-area tables, so the
+    blurs should take the same time for every radius, while the convolution
+    grows with the size of the kernel.
+
+    Parameter megapixels: The image size, in megapixels
+    Precondition: megapixels is a number > 0
+
+    Parameter radii: The radii to measure
+    Precondition: radii is a tuple of ints > 0
+    """
+    print('Blurs on a '+str(megapixels)+' MP image')
+    report('radius','blur','gaussian','convolve')
+    image = make_smooth(megapixels)
+    for radius in radii:
+        times = []
+        for (name, args) in (('blur',(radius,)),('gaussian',(radius,))):
+            editor = a6filter.Filter(image)
+            times.append('%.3f s' % measure(getattr(editor,name),*args)[1])
+            del editor
+        if radius <= 4:
+            side   = 2*radius+1
+            kernel = [[1/(side*side)]*side for _ in range(side)]
+            editor = a6filter.Filter(image)
+            times.append('%.3f s' % measure(editor.convolve,kernel)[1])
+            del editor
+        report(str(radius),*times)
+
+
+def bench_parallel(megapixels=48, workers=None, repeat=2):
+    """
+    Measures the scaling of the whole-image filters with the number of worker processes.
+
+    Each row applies vignette, blur (radius 8) and sharpen to an image, in
+    this process and then with an a6parallel.Executor of 1, 2, 4, ...
+    workers (up to one per core). The workers start before the timing. The
+    report shows the best time of each filter.
+
+    Parameter megapixels: The image size, in megapixels
+    Precondition: megapixels is a number > 0
+
+    Parameter workers: The largest number of workers (or None for one per core)
+    Precondition: workers is an int > 0 or None
+
+    Parameter repeat: The number of times to time each filter
+    Precondition: repeat is an int > 0
+    """
+    workers = workers or os.cpu_count() or 1
+    counts  = [1 << power for power in range(workers.bit_length()) if 1 << power < workers]+[workers]
+    print('Parallel filters on a '+str(megapixels)+' MP image ('+str(os.cpu_count())+' cores)')
+    report('workers','vignette','blur','sharpen')
+    image   = make_smooth(megapixels)
+    data    = image.getBytes()
+    width   = image.getWidth()
+    height  = image.getHeight()
+    filters = [('vignette',()),('blur',(8,)),('convolve',(a6engine.SHARPEN,))]
+
+    def run(executor, name, args):
+        if executor is None:
+            return a6parallel.compute(name,data,width,height,0,args)
+        return executor.run(name,data,width,height,args)
+
+    times = [min(measure(run,None,name,args)[1] for _ in range(repeat)) for (name, args) in filters]
+    report('serial',*['%.3f s' % seconds for seconds in times])
+    for count in counts:
+        with a6parallel.Executor(count) as executor:
+            executor.run('invert',data[:3*width],width,1,())   # Start the workers
+            times = [min(measure(run,executor,name,args)[1] for _ in range(repeat))
+                     for (name, args) in filters]
+        report(str(count),*['%.3f s' % seconds for seconds in times])
+
+
+def bench_threads(megapixels=48, workers=None, repeat=2):
+    """
+    Compares worker threads, worker processes and a single thread on the color filters.
+
+    Each row applies invert, monochromify (sepia) and vignette to an image,
+    in this thread, then with an a6parallel.Executor of threads, then with
+    one of processes (with one worker per core unless workers is given).
+    The workers start before the timing. The report shows the best time of
+    each filter.
+
+    Parameter megapixels: The image size, in megapixels
+    Precondition: megapixels is a number > 0
+
+    Parameter workers: The number of workers (or None for one per core)
+    Precondition: workers is an int > 0 or None
+
+    Parameter repeat: The number of times to time each filter
+    Precondition: repeat is an int > 0
+    """
+    workers = workers or os.cpu_count() or 1
+    print('Color filters on a '+str(megapixels)+' MP image ('+str(workers)+' workers, '+
+          str(os.cpu_count())+' cores)')
+    report('method','invert','monochromify','vignette')
+    image   = make_smooth(megapixels)
+    data    = image.getBytes()
+    width   = image.getWidth()
+    height  = image.getHeight()
+    filters = [('invert',()),('monochromify',(True,)),('vignette',())]
+    times = [min(measure(a6parallel.compute,name,data,width,height,0,args)[1] for _ in range(repeat))
+             for (name, args) in filters]
+    report('serial',*['%.3f s' % seconds for seconds in times])
+    for (label, threads) in (('threads',True),('processes',False)):
+        with a6parallel.Executor(workers,threads) as executor:
+            executor.run('invert',data[:3*width],width,1,())   # Start the workers
+            times = [min(measure(executor.run,name,data,width,height,args)[1] for _ in range(repeat))
+                     for (name, args) in filters]
+        report(label,*['%.3f s' % seconds for seconds in times])
+
+
+def bench_batch(megapixels=2, count=8, workers=None):
+    """
+    Measures the throughput of batch processing with the number of worker processes.
+
+    Each row processes count files with a6batch (applying sepia, vignette and
+    sharpen), once as raw files and once as PNG files, with 1, 2, 4, ...
+    workers (up to one per core). The report shows the megapixels processed
+    per second, including reading and writing the files.
+
+    Parameter megapixels: The size of each image, in megapixels
+    Precondition: megapixels is a number > 0
+
+    Parameter count: The number of files
+    Precondition: count is an int > 0
+
+    Parameter workers: The largest number of workers (or None for one per core)
+    Precondition: workers is an int > 0 or None
+    """
+    workers = workers or os.cpu_count() or 1
+    counts  = [1 << power for power in range(workers.bit_length()) if 1 << power < workers]+[workers]
+    print('Batch of '+str(count)+' files of '+str(megapixels)+' MP ('+str(os.cpu_count())+' cores)')
+    report('workers','raw','png')
+    folder  = tempfile.mkdtemp()
+    output  = os.path.join(folder,'out')
+    os.mkdir(output)
+    image   = make_smooth(megapixels)
+    actions = a6batch.parse('monochromify:sepia,vignette,sharpen')
+    files   = {}
+    for extension in (a6raw.EXTENSION, '.png'):
+        files[extension] = [os.path.join(folder,'image'+str(pos)+extension) for pos in range(count)]
+        for filename in files[extension]:
+            a6batch.write(image,filename)
+
+    def run(names, number):
+        return list(a6batch.run(names,actions,output,number))
+
+    for number in counts:
+        rates = []
+        for extension in (a6raw.EXTENSION, '.png'):
+            seconds = measure(run,files[extension],number)[1]
+            rates.append('%.1f MP/s' % (count*len(image)/1e6/seconds))
+        report(str(number),*rates)
+    for name in os.listdir(output):
+        os.remove(os.path.join(output,name))
+    os.rmdir(output)
+    for name in os.listdir(folder):
+        os.remove(os.path.join(folder,name))
+    os.rmdir(folder)
+
+
+def bench_all():
+    """
+    Executes all of the benchmarks.
+
+    This function is called by __main__.py
+    """
+    bench_storage()
+    print()
+    bench_reshape()
+    print()
+    bench_access()
+    print()
+    bench_filters()
+    print()
+    bench_rows()
+    print()
+    bench_history()
+    print()
+    bench_increment()
+    print()
+    bench_budget()
+    print()
+    bench_branches()
+    print()
+    bench_oplog()
+    print()
+    bench_session()
+    print()
+    bench_pipeline()
+    print()
+    bench_orientation()
+    print()
+    bench_lookup()
+    print()
+    bench_vignette()
+    print()
+    bench_pixellate()
+    print()
+    bench_blur()
+    print()
+    bench_parallel()
+    print()
+    bench_threads()
+    print()
+    bench_batch()
+    print()
@@ -12,8 +12,17 @@ Based on an original file by Dexter Kozen (dck10) and Walker White (wmw2)
 Author: Walker White (wmw2)
 Date:   October 29, 2019
 """
-# THIS FILE IS COMPLETE.  DO NOT MODIFY THIS FILE AT ALL
+import a6engine
 import a6image
+import json
+import lzma
+import tempfile
+import zlib
+
+
+# The compression methods for the history, as (compress, decompress) pairs
+COMPRESSORS = {'zlib' : (lambda data: zlib.compress(data,1), zlib.decompress),
+               'lzma' : (lzma.compress, lzma.decompress)}
 
 
 class Editor(object):
@@ -29,21 +38,94 @@ class Editor(object):
     If the number of edits exceeds MAX_HISTORY, the oldest edit will be
     deleted.  
     
+    The history does not keep a copy of the image for every edit. Every
+    image in the history is a tuple of tiles (see Image.getTiles), and an
+    image shares the tiles that an edit did not change with the image before
+    it. So increment only copies the tiles written since the last edit, and
+    undo and clear only write back the tiles that differ.
+    
+    Undo does not throw away the undone image, so redo can return to it.
+    And an edit after an undo does not throw away the undone edits either. It
+    starts a new branch, so the history is a tree of images (HistoryNode
+    objects). Use getPosition and goto to switch between the branches, for
+    example to compare two chains of filters from the same image. Branches
+    share the tiles they have in common, and nothing is recomputed. If the
+    tree has more than MAX_HISTORY images, the oldest image not on the path
+    from the original to the current image is deleted first.
+    
+    An edit made with perform (instead of increment followed by a call) is
+    also recorded as an action: a method name and its arguments. If the
+    editor has a checkpoint interval k, it only keeps the images of every
+    k-th edit and the current image. The other images are recomputed when
+    needed by replaying the actions from the nearest older image that was
+    kept. That works because the filters are deterministic. The actions
+    also form a recipe (see getRecipe), which can be saved and applied to
+    other images.
+    
+    Instead of a number of images, the history can be limited by a memory
+    budget (in bytes). Then MAX_HISTORY does not apply. Whenever the history
+    uses more memory than the budget, the tiles of older images are
+    compressed (with the method COMPRESSION, see COMPRESSORS) and then
+    moved to a temporary file, oldest first. Undo reads them back as needed.
+    Only if that is still not enough are images deleted. The tiles of the
+    current image are always kept as they are.
+    
     Attribute MAX_HISTORY: A CLASS ATTRIBUTE for the maximum number of edits
     Invariant: MAX_HISTORY is an int > 0
+    
+    Attribute COMPRESSION: A CLASS ATTRIBUTE for the compression method
+    Invariant: COMPRESSION is a key of COMPRESSORS
     """
     # IMMUTABLE ATTRIBUTES (Fixed after initialization)
     # Attribute _original: The original image 
     # Invariant: _original is an Image object
     #
-    # Attribute _history: The edit history
-    # Invariant: _history is a non-empty list of Image objects. In addition, 
-    #the length of _history should never be longer than MAX_HISTORY.
+    # Attribute _budget: The memory budget of the history
+    # Invariant: _budget is None (no budget) or an int > 0
+    #
+    # Attribute _checkpoint: The interval between kept images of actions
+    # Invariant: _checkpoint is None (keep every image) or an int > 0
+    #
+    # MUTABLE ATTRIBUTES
+    # Attribute _base: The tiles of the original image (for clear)
+    # Invariant: _base is a HistoryNode that is not in the tree
+    #
+    # Attribute _current: The most recent edit
+    # Invariant: _current is an Image object the same length as _original
+    #
+    # Attribute _tiles: The tiles of _current at the last snapshot
+    # Invariant: _tiles is the result of the last call to getTiles or
+    # setTiles on _current
+    #
+    # Attribute _root: The oldest image in the history
+    # Invariant: _root is a HistoryNode with no parent
+    #
+    # Attribute _node: The image in the history that _current belongs to
+    # Invariant: _node is a HistoryNode in the tree below _root. Its tiles
+    # are the tiles of _current, as of the last snapshot. The root also
+    # always has its tiles.
+    #
+    # Attribute _count: The number of images in the tree
+    # Invariant: _count is an int > 0. In addition, if there is no budget,
+    # _count is never larger than MAX_HISTORY after an increment.
+    #
+    # Attribute _clock: The number of images created so far
+    # Invariant: _clock is an int >= 0
+    #
+    # Attribute _spill: The file for the tiles that do not fit the budget
+    # Invariant: _spill is None or a SpillFile object with exactly the
+    # extents of the spilled tiles in the history
+    #
+    # An editor made by scratch has no history: its _tiles, _base, _root and
+    # _node are None, and its _count and _clock are 0.
     
     # The number of edits that we are allowed to keep track of.
     # (THIS GOES IN CLASS FOLDER)
     MAX_HISTORY = 20
     
+    # The compression method for images over the budget
+    COMPRESSION = 'zlib'
+    
     # GETTERS
     def getOriginal(self):
         """
@@ -55,10 +137,154 @@ class Editor(object):
         """
         Returns the most recent edit
         """
-        return self._history[-1]
+        return self._current
+    
+    def getHistoryLength(self):
+        """
+        Returns the number of images in the edit history up to the current one.
+        
+        This is 1 for a new (or cleared) edit history, and increases with
+        each edit (up to MAX_HISTORY if there is no budget). It is one more
+        than the number of times that undo will succeed.
+        """
+        return self._node._depth-self._root._depth+1
+    
+    def getTreeSize(self):
+        """
+        Returns the number of images in the edit history, in all branches.
+        """
+        return self._count
+    
+    def getBranchCount(self):
+        """
+        Returns the number of branches after the current image.
+        
+        This is the number of different edits made from the current image
+        (and not deleted). If it is 0, redo does nothing.
+        """
+        return len(self._node._children)
+    
+    def getPosition(self):
+        """
+        Returns the HistoryNode for the current image.
+        
+        Pass this to goto to return to the current image later, even after
+        undos and other edits.
+        """
+        return self._node
+    
+    def getBudget(self):
+        """
+        Returns the memory budget of the history in bytes, or None.
+        """
+        return self._budget
+    
+    def getCheckpoint(self):
+        """
+        Returns the interval between the images kept for actions, or None.
+        
+        See perform for details.
+        """
+        return self._checkpoint
+    
+    def getRecipe(self):
+        """
+        Returns the list of actions from the oldest image to the current one.
+        
+        Each action is a list [name, args] where args is the list of the
+        arguments given to perform. The recipe only has strings, numbers,
+        bools and lists, so it can be saved as JSON (see writeRecipe). The
+        oldest image is the original, unless older edits were deleted.
+        
+        If an edit on the way was not made with perform, this method returns
+        None instead.
+        """
+        result = []
+        node = self._node
+        while not node is self._root:
+            if node._action is None:
+                return None
+            result.append([node._action[0],list(node._action[1])])
+            node = node._parent
+        result.reverse()
+        return result
+    
+    def getMemoryUsage(self):
+        """
+        Returns the number of bytes of memory used by the history.
+        
+        This counts every tile of the original image and the images in the
+        history once (even if several images share it), at its compressed
+        size if it is compressed, plus 8 bytes per tile for the tables. Tiles
+        in the temporary file or in a session file (see fromSession) and the
+        current image itself are not counted.
+        """
+        return self._measure()[0]
+    
+    def getDiskUsage(self):
+        """
+        Returns the size of the temporary file in bytes.
+        
+        This is 0 if the history has never been over budget since it was
+        created or cleared. The space of deleted images is reused, and the
+        file is compacted if more than half of it is free.
+        """
+        if self._spill is None:
+            return 0
+        return self._spill.getSize()
+    
+    def toSession(self, interval):
+        """
+        Returns a generator for the images that a session saves (see a6session).
+        
+        Each item is a pair (entry, tiles). The first item is the original
+        image, and the rest are the images from the oldest image in the
+        history to the current one (branches off that path are left out). The
+        value entry is a dict with the keys 'action' (the action that made
+        the image, as a [name, args] list, or None), 'width' and 'orient' (as
+        in setOrientation, with the orientation as a list) and 'original'
+        (True if the image has the tiles of the original).
+        
+        The value tiles is the tuple of uncompressed tiles of the image, or
+        None if it does not need to be saved: if it is the original again, or
+        if it can be recomputed from its action and it is not one of every
+        interval images. The oldest and the current image always have their
+        tiles, and the current image is never marked as the original. The
+        images are uncompressed one at a time, as the generator is used, and
+        the history must not change until it is done.
+        
+        Parameter interval: The number of edits between saved images of actions
+        Precondition: interval is an int > 0
+        """
+        assert type(interval) == int and interval > 0, repr(interval)+' is not a valid interval'
+        self._snapshot()
+        base = self._base
+        yield ({'action' : None, 'width' : base._width, 'orient' : list(base._orient),
+                'original' : True}, self._thaw(base._tiles))
+        
+        path = []
+        node = self._node
+        while not node is None:
+            path.append(node)
+            node = node._parent
+        path.reverse()
+        for node in path:
+            entry = {'action' : None, 'width' : node._width, 'orient' : list(node._orient),
+                     'original' : False}
+            if not node._action is None:
+                entry['action'] = [node._action[0],list(node._action[1])]
+            tiles = None
+            if node is self._node:
+                tiles = self._thaw(node._tiles)
+            elif (node is path[0] and node._width == base._width and node._orient == base._orient and
+                  len(node._tiles) == len(base._tiles) and all(a is b for (a, b) in zip(node._tiles,base._tiles))):
+                entry['original'] = True
+            elif node is path[0] or node._action is None or (not node._tiles is None and node._depth % interval == 0):
+                tiles = self._thaw(node._tiles)
+            yield (entry, tiles)
     
     # INITIALIZER
-    def __init__(self,original):
+    def __init__(self,original,budget=None,checkpoint=None):
         """
         Initializes an edit history for the given image.
         
@@ -67,25 +293,223 @@ class Editor(object):
         
         Parameter original: The image to edit
         Precondition: original is an Image object
+        
+        Parameter budget: The memory budget of the history, in bytes
+        Precondition: budget is None or an int > 0
+        
+        Parameter checkpoint: The interval between kept images of actions
+        Precondition: checkpoint is None or an int > 0
         """
         assert isinstance(original,a6image.Image), repr(original)+' is not an image'
+        assert budget is None or (type(budget) == int and budget > 0), repr(budget)+' is not a valid budget'
+        assert checkpoint is None or (type(checkpoint) == int and checkpoint > 0), repr(checkpoint)+' is not a valid interval'
         self._original = original
-        self._history  = [original.copy()]
+        self._budget   = budget
+        self._checkpoint = checkpoint
+        self._spill    = None
+        self._current  = original.copy()
+        self._tiles    = self._current.getTiles()
+        self._base     = HistoryNode(original.getWidth(),self._tiles,None,0)
+        self._root     = HistoryNode(original.getWidth(),self._tiles,None,1)
+        self._node     = self._root
+        self._count    = 1
+        self._clock    = 1
+    
+    @classmethod
+    def fromSession(cls, original, base, current, path, budget=None, checkpoint=None):
+        """
+        Returns an edit history for original whose images are the given path.
+        
+        This is how a session (see a6session) restores an editor. Unlike the
+        initializer, it copies neither image. The editor edits current in
+        place, and the history has the tiles it is given. Those are usually
+        read-only views of a mapped file (see a6image.split_tiles), so an image
+        of the history is only read from the file when it is restored, and
+        only the tiles that an edit writes are ever copied into memory.
+        
+        The path is a list of pairs (entry, tiles), one for each image from
+        the oldest image in the history to the current one, as in toSession.
+        The value entry is a dict with the keys 'action', 'width' and 'orient'
+        and tiles is the tuple of tiles of the image, or None if the image is
+        recomputed from its action (see perform).
+        
+        Parameter original: The image to edit
+        Precondition: original is an Image object
+        
+        Parameter base: The tiles of original
+        Precondition: base is a tuple of tiles with the stored pixels of original
+        
+        Parameter current: The current image
+        Precondition: current is an Image object the same length as original,
+        and it is not original. Its stored pixels are the last tiles of path,
+        and it has not been written since it was created.
+        
+        Parameter path: The images of the history, oldest first
+        Precondition: path is a non-empty list of (entry, tiles) pairs, where
+        the tiles of the first and the last pair are not None
+        
+        Parameter budget: The memory budget of the history, in bytes
+        Precondition: budget is None or an int > 0
+        
+        Parameter checkpoint: The interval between kept images of actions
+        Precondition: checkpoint is None or an int > 0
+        """
+        assert isinstance(original,a6image.Image), repr(original)+' is not an image'
+        assert isinstance(current,a6image.Image), repr(current)+' is not an image'
+        assert not current is original and len(current) == len(original), 'current cannot be edited for original'
+        assert type(path) == list and path != [], repr(path)+' is not a path of images'
+        assert not path[0][1] is None and not path[-1][1] is None, 'the oldest or current image has no tiles'
+        assert budget is None or (type(budget) == int and budget > 0), repr(budget)+' is not a valid budget'
+        assert checkpoint is None or (type(checkpoint) == int and checkpoint > 0), repr(checkpoint)+' is not a valid interval'
+        editor = cls.__new__(cls)
+        editor._original = original
+        editor._budget   = budget
+        editor._checkpoint = checkpoint
+        editor._spill    = None
+        editor._current  = current
+        editor._base     = HistoryNode(original.getWidth(),base,None,0)
+        editor._root     = None
+        editor._count    = 0
+        editor._clock    = 1
+        
+        node = None
+        for (entry, tiles) in path:
+            child = HistoryNode(entry['width'],tiles,node,editor._clock)
+            child._orient = tuple(entry['orient'])
+            if not entry['action'] is None:
+                child._action = (entry['action'][0],tuple(entry['action'][1]))
+            if node is None:
+                editor._root = child
+            else:
+                node._children.append(child)
+                node._next = child
+            node = child
+            editor._count += 1
+            editor._clock += 1
+        
+        current.setOrientation(node._orient,node._width)
+        editor._tiles = current.getTiles(node._tiles)
+        editor._node  = node
+        node._tiles   = editor._tiles
+        if not budget is None:
+            editor._enforce()
+        return editor
+    
+    @classmethod
+    def scratch(cls, image):
+        """
+        Returns an editor that edits image in place, without an edit history.
+        
+        Only the actions (the methods that edit the current image, such as
+        the filters of a subclass) can be used on the result. It has no
+        history, so the methods that use one (such as increment, perform,
+        undo and clear) cannot. In return, nothing is copied: the current
+        image is image itself. This is for one-shot edits (see a6batch).
+        
+        Parameter image: The image to edit
+        Precondition: image is an Image object
+        """
+        assert isinstance(image,a6image.Image), repr(image)+' is not an image'
+        editor = cls.__new__(cls)
+        editor._original = image
+        editor._budget   = None
+        editor._checkpoint = None
+        editor._spill    = None
+        editor._current  = image
+        editor._tiles    = None
+        editor._base     = None
+        editor._root     = None
+        editor._node     = None
+        editor._count    = 0
+        editor._clock    = 0
+        return editor
     
     # EDIT METHODS
     def undo(self):
         """
         Returns True if the latest edit can be undone, False otherwise.
         
-        This method attempts to undo the latest element by removing the last 
-        element of the edit history.  However, the edit history can never
-        be empty.  If this method is called on an edit history of one element,
-        this method returns False instead.
+        This method attempts to undo the latest element by moving back to the
+        previous image in the edit history. The undone image is kept, so redo
+        can return to it. However, the edit history can never be empty. If
+        this method is called on the oldest image, this method returns False
+        instead.
+        """
+        parent = self._node._parent
+        if parent is None:
+            return False
+        self._snapshot()
+        node = self._node
+        parent._next = node
+        self._move(parent)
+        self._release(node)
+        return True
+    
+    def discard(self):
+        """
+        Returns True if the current image could be deleted, False otherwise.
+        
+        This method is like undo, except that the current image (and any
+        edits after it) is deleted instead of kept for redo. Use it to back
+        out of an edit that failed. If this method is called on the oldest
+        image, this method returns False instead.
         """
-        if len(self._history) > 1:
-            self._history.pop()
-            return True
-        return False
+        node   = self._node
+        parent = node._parent
+        if parent is None:
+            return False
+        # Detach node first, so that the budget (in _move) cannot delete it
+        parent._children.remove(node)
+        parent._next = parent._children[-1] if parent._children else None
+        node._parent = None
+        stack = [node]
+        while stack:
+            self._count -= 1
+            stack.extend(stack.pop()._children)
+        self._move(parent)
+        return True
+    
+    def redo(self):
+        """
+        Returns True if an undone edit can be redone, False otherwise.
+        
+        This method moves forward to the image that was last undone from the
+        current image (or, after a goto, the next image towards the image of
+        the goto). If there are several branches after the current image, it
+        follows the latest one visited. If there are none, this method
+        returns False.
+        """
+        child = self._node._next
+        if child is None:
+            return False
+        self._snapshot()
+        previous = self._node
+        self._move(child)
+        self._release(previous)
+        return True
+    
+    def goto(self, node):
+        """
+        Moves to the given image of the edit history.
+        
+        The current image is kept. Afterwards, redo from any older image on
+        the way to node follows this branch.
+        
+        Parameter node: The image to move to
+        Precondition: node is a HistoryNode returned by getPosition on this
+        editor, and it has not been deleted
+        """
+        assert isinstance(node,HistoryNode), repr(node)+' is not a history node'
+        ancestor = node
+        while not ancestor._parent is None:
+            ancestor._parent._next = ancestor
+            ancestor = ancestor._parent
+        assert ancestor is self._root, 'node is not in this edit history'
+        if not node is self._node:
+            self._snapshot()
+            previous = self._node
+            self._move(node)
+            self._release(previous)
     
     def clear(self):
         """
@@ -94,17 +518,660 @@ class Editor(object):
         When this method completes, the object should have the same values that 
         it did once it was first initialized.
         """
-        self._history = [self._original.copy()]
+        self._restore(self._base)
+        self._base  = HistoryNode(self._base._width,self._tiles,None,0)
+        self._root  = HistoryNode(self._base._width,self._tiles,None,self._clock)
+        self._node  = self._root
+        self._count = 1
+        self._clock += 1
+        if not self._spill is None:
+            self._spill.close()
+            self._spill = None
     
     def increment(self):
         """
         Adds a new copy of the image to the edit history.
         
-        This method copies the current most recent edit and adds it to the 
-        end of the history.  If this causes the history to grow to larger 
-        (greater than MAX_HISTORY), this method deletes the oldest edit.
+        This method copies the current most recent edit and adds it after the
+        current image in the history. If the current image already has edits
+        after it (because of an undo), the copy starts a new branch. If this
+        causes the history to grow to larger (greater than MAX_HISTORY), this
+        method deletes the oldest edit.
+        
+        If there is a budget, this method instead compresses, moves to disk
+        or deletes older images until the history fits in the budget.
+        """
+        self._snapshot()
+        parent = self._node
+        self._node = HistoryNode(self._current.getWidth(),self._tiles,parent,self._clock)
+        parent._children.append(self._node)
+        parent._next = self._node
+        self._count += 1
+        self._clock += 1
+        self._release(parent)
+        if self._budget is None:
+            while self._count > self.MAX_HISTORY and self._prune():
+                pass
+        else:
+            self._enforce()
+    
+    def perform(self, name, *args):
+        """
+        Returns the result of the action name(*args) as a new edit.
+        
+        This is increment followed by getattr(self,name)(*args), except that
+        the action is recorded in the history. A recorded edit can be undone
+        and redone without keeping its image (if there is a checkpoint
+        interval), and it is part of the recipe. If the action fails, the
+        edit is discarded and the error is raised again.
+        
+        Parameter name: The name of the action
+        Precondition: name is the name of a method of this object that only
+        changes the current image, and always changes it the same way for the
+        same image and arguments
+        
+        Parameter args: The arguments of the action
+        Precondition: args are strings, numbers, bools or lists of these (so
+        the recipe can be saved)
+        """
+        assert type(name) == str and callable(getattr(self,name,None)), repr(name)+' is not an action'
+        self.increment()
+        self._node._action = (name,args)
+        try:
+            return getattr(self,name)(*args)
+        except:
+            self.discard()
+            raise
+    
+    def applyRecipe(self, recipe):
+        """
+        Performs every action of the given recipe on the current image.
+        
+        Each action is a separate edit, made with perform.
+        
+        Parameter recipe: The actions to perform
+        Precondition: recipe is a list of [name, args] lists, as returned by
+        getRecipe (possibly from another editor)
+        """
+        assert type(recipe) == list, repr(recipe)+' is not a recipe'
+        for (name, args) in recipe:
+            self.perform(name,*args)
+    
+    # HIDDEN METHODS
+    def _release(self, node):
+        """
+        Drops the tiles of node if they can be recomputed.
+        
+        This only happens if there is a checkpoint interval, node is not the
+        current image or the root, node was made with perform, and the depth
+        of node is not a multiple of the interval.
+        
+        Parameter node: The image to release
+        Precondition: node is a HistoryNode
+        """
+        if (self._checkpoint is None or node is self._node or node is self._root or
+            node._action is None or node._depth % self._checkpoint == 0):
+            return
+        node._tiles = None
+    
+    def _replay(self, node):
+        """
+        Returns the tiles of node, recomputing them if they were released.
+        
+        Released images are recomputed from the nearest older image that has
+        its tiles, by performing the actions in between on a scratch image.
+        The current image is not changed.
+        
+        Parameter node: The image to compute
+        Precondition: node is a HistoryNode in the tree
+        """
+        path = []
+        while node._tiles is None:
+            path.append(node)
+            node = node._parent
+        if not path:
+            return node._tiles
+        
+        current = self._current
+        tiles   = self._tiles
+        data = b''.join(self._thaw(node._tiles))
+        try:
+            self._current = a6image.Image.fromBytes(data,node._width)
+            self._current.setOrientation(node._orient,node._width)
+            for step in reversed(path):
+                getattr(self,step._action[0])(*step._action[1])
+            return self._current.getTiles()
+        finally:
+            self._current = current
+            self._tiles   = tiles
+    
+    def _snapshot(self):
+        """
+        Saves the tiles of the current image in its node of the history.
+        """
+        self._tiles = self._current.getTiles(self._tiles)
+        self._node._width  = self._current.getWidth()
+        self._node._orient = self._current.getOrientation()
+        self._node._tiles  = self._tiles
+    
+    def _move(self, node):
+        """
+        Makes node the current image of the history.
+        
+        Parameter node: The image to move to
+        Precondition: node is a HistoryNode in the tree
+        """
+        self._restore(node)
+        self._node = node
+        node._tiles = self._tiles
+        if not self._budget is None:
+            self._enforce()
+    
+    def _restore(self, node):
+        """
+        Sets the current image to the given image from the history.
+        
+        Parameter node: The image to restore
+        Precondition: node is a HistoryNode of this editor
+        """
+        tiles = self._thaw(self._replay(node))
+        self._current.setTiles(tiles,self._tiles)
+        self._current.setOrientation(node._orient,node._width)
+        self._tiles = tiles
+    
+    def _thaw(self, tiles):
+        """
+        Returns the given tiles with every stored tile uncompressed.
+        
+        Parameter tiles: The tiles of an image in the history
+        Precondition: tiles is a tuple of tiles of the history (see HistoryNode)
+        """
+        decompress = COMPRESSORS[self.COMPRESSION][1]
+        return tuple(tile.load(decompress,self._spill) if type(tile) == StoredTile else tile
+                     for tile in tiles)
+    
+    def _nodes(self):
+        """
+        Returns a list of the original image and the images in the tree, oldest first.
+        """
+        result = []
+        stack  = [self._root]
+        while stack:
+            node = stack.pop()
+            result.append(node)
+            stack.extend(node._children)
+        result.sort(key=lambda node: node._order)
+        return [self._base]+result
+    
+    def _prune(self):
+        """
+        Returns True if this method deleted an image from the tree.
+        
+        This method deletes the oldest image without any later images that
+        is not the current image or the image that redo returns to. If there
+        is no such image, it deletes the root instead. It never deletes the
+        current image, its parent or the image of redo (so an undo can always
+        be redone).
+        """
+        redo   = self._node._next
+        leaves = [node for node in self._nodes()[1:]
+                  if not node._children and not node is self._node and not node is redo]
+        if leaves:
+            leaf = leaves[0]
+            parent = leaf._parent
+            parent._children.remove(leaf)
+            if parent._next is leaf:
+                parent._next = parent._children[-1] if parent._children else None
+            leaf._parent = None
+        elif self._node._depth-self._root._depth > 1:
+            root = self._root
+            root._children[0]._tiles = self._replay(root._children[0])
+            self._root = root._children[0]
+            self._root._parent = None
+            root._children = []
+            root._next = None
+        else:
+            return False
+        self._count -= 1
+        return True
+    
+    def _measure(self):
+        """
+        Returns the pair (memory, stored) for the tiles of the history.
+        
+        The value memory is the result of getMemoryUsage. The value stored is
+        the list of the distinct StoredTile objects still in memory, oldest
+        first.
+        """
+        seen   = set()
+        stored = []
+        memory = 0
+        for node in self._nodes():
+            if node._tiles is None:
+                continue
+            memory += 8*len(node._tiles)
+            for tile in node._tiles:
+                if not id(tile) in seen:
+                    seen.add(id(tile))
+                    if type(tile) == bytes:
+                        memory += len(tile)
+                    elif type(tile) == StoredTile and not tile.isSpilled():
+                        memory += tile.getSize()
+                        stored.append(tile)
+        return (memory, stored)
+    
+    def _enforce(self):
+        """
+        Compresses, spills or deletes older images until the history fits the budget.
+        
+        The tiles of the current image are never compressed, so the history
+        may still be over budget when this method is done.
+        """
+        memory = self._measure()[0]
+        if memory > self._budget:
+            self._compress(memory)
+            memory, stored = self._measure()
+            if memory > self._budget:
+                if self._spill is None:
+                    self._spill = SpillFile()
+                for tile in stored:
+                    if memory <= self._budget:
+                        break
+                    memory -= tile.getSize()
+                    tile.spill(self._spill)
+        while memory > self._budget and self._prune():
+            memory = self._measure()[0]
+        if not self._spill is None:
+            self._reclaim()
+    
+    def _reclaim(self):
+        """
+        Frees the space in the temporary file of the tiles no longer in the history.
+        
+        If more than half of the file is then free, it is compacted.
+        """
+        spilled = {}
+        for node in self._nodes():
+            if node._tiles is None:
+                continue
+            for tile in node._tiles:
+                if type(tile) == StoredTile and tile.isSpilled():
+                    spilled[tile.getOffset()] = tile
+        self._spill.retain(set(spilled))
+        if 2*self._spill.getFree() > self._spill.getSize():
+            moved = self._spill.compact()
+            for (offset, tile) in spilled.items():
+                tile.relocate(moved[offset])
+    
+    def _compress(self, memory):
+        """
+        Compresses tiles of older images, oldest first, until the history fits.
+        
+        A tile is replaced by the same StoredTile in every image that has it.
+        The tiles of the current image are left alone.
+        
+        Parameter memory: The memory used by the history
+        Precondition: memory is the result of getMemoryUsage
+        """
+        compress = COMPRESSORS[self.COMPRESSION][0]
+        keep = set(map(id,self._tiles))
+        done = {}
+        for node in self._nodes():
+            if node._tiles is None:
+                continue
+            result = []
+            for tile in node._tiles:
+                if id(tile) in done:
+                    tile = done[id(tile)]
+                elif memory > self._budget and type(tile) == bytes and not id(tile) in keep:
+                    stored = StoredTile(tile,compress)
+                    done[id(tile)] = stored
+                    memory -= len(tile)-stored.getSize()
+                    tile = stored
+                result.append(tile)
+            node._tiles = tuple(result)
+
+
+class StoredTile(object):
+    """
+    A compressed tile of the edit history, in memory or in a file.
+    
+    An Editor replaces the tiles of older images with these objects when it
+    is over budget. A stored tile can later be moved (spilled) to a file to
+    save more memory. Every image that had the tile shares the same stored
+    tile, so spilling it once moves it for all of them.
+    """
+    # Stored tiles have a fixed set of attributes, so they do not need a __dict__
+    __slots__ = ('_data', '_offset', '_size')
+    
+    # MUTABLE ATTRIBUTES
+    # Attribute _data: The compressed tile
+    # Invariant: _data is a bytes object, or None if the tile is in a file
+    #
+    # Attribute _offset: The position of the compressed tile in the file
+    # Invariant: _offset is an int >= 0, or None if the tile is in memory
+    #
+    # Attribute _size: The size of the compressed tile
+    # Invariant: _size is an int >= 0
+    
+    # GETTERS
+    def getSize(self):
+        """
+        Returns the size of the compressed tile in bytes.
+        """
+        return self._size
+    
+    def isSpilled(self):
+        """
+        Returns True if this tile is in a file instead of memory.
+        """
+        return self._data is None
+    
+    # INITIALIZER
+    def __init__(self, tile, compress):
+        """
+        Initializes a stored tile from the given (uncompressed) tile.
+        
+        Parameter tile: The tile to store
+        Precondition: tile is a bytes object
+        
+        Parameter compress: The compression function
+        Precondition: compress is a function taking and returning bytes
+        """
+        self._data   = compress(tile)
+        self._offset = None
+        self._size   = len(self._data)
+    
+    # METHODS
+    def getOffset(self):
+        """
+        Returns the position of this tile in its file, or None if it is in memory.
+        """
+        return self._offset
+    
+    def spill(self, file):
+        """
+        Moves this tile to the given file.
+        
+        Parameter file: The file to write to
+        Precondition: file is a SpillFile object
         """
-        self._history.append(self.getCurrent().copy())
-        if len(self._history) > self.MAX_HISTORY:
-            self._history.pop(0)
+        if not self.isSpilled():
+            self._offset = file.write(self._data)
+            self._data = None
+    
+    def relocate(self, offset):
+        """
+        Records that this spilled tile has moved to the given position.
+        
+        Parameter offset: The new position of the tile in its file
+        Precondition: offset is an int >= 0, and this tile is spilled
+        """
+        assert self.isSpilled(), 'the tile is not spilled'
+        self._offset = offset
+    
+    def load(self, decompress, file):
+        """
+        Returns the uncompressed tile.
+        
+        Parameter decompress: The decompression function
+        Precondition: decompress is the inverse of the compression function
+        
+        Parameter file: The file the tile was spilled to
+        Precondition: file is the SpillFile given to spill, or None if this
+        tile is not spilled
+        """
+        data = self._data
+        if data is None:
+            data = file.read(self._offset,self._size)
+        return decompress(data)
 
+
+class SpillFile(object):
+    """
+    A temporary file for the stored tiles that do not fit the budget of an Editor.
+    
+    The file is a list of extents (an offset and a size), one for each tile
+    in it. When the history deletes images, their tiles leave the file (see
+    retain), and the space of their extents is reused by later tiles. If
+    more than half of the file is free, compact moves the tiles together.
+    """
+    # Spill files have a fixed set of attributes, so they do not need a __dict__
+    __slots__ = ('_file', '_size', '_used', '_free')
+    
+    # MUTABLE ATTRIBUTES
+    # Attribute _file: The temporary file
+    # Invariant: _file is a binary file open for reading and writing
+    #
+    # Attribute _size: The size of the file in bytes
+    # Invariant: _size is an int >= 0, the end of the last extent in use
+    #
+    # Attribute _used: The extents in use
+    # Invariant: _used is a dict mapping the offset of each extent to its size
+    #
+    # Attribute _free: The free extents before _size
+    # Invariant: _free is a list of [offset, size] lists sorted by offset,
+    # where no two extents touch
+    
+    # GETTERS
+    def getSize(self):
+        """
+        Returns the size of the file in bytes.
+        """
+        return self._size
+    
+    def getFree(self):
+        """
+        Returns the number of bytes of the file that are not in use.
+        """
+        return sum(size for (_, size) in self._free)
+    
+    # INITIALIZER
+    def __init__(self):
+        """
+        Initializes an empty spill file.
+        """
+        self._file = tempfile.TemporaryFile()
+        self._size = 0
+        self._used = {}
+        self._free = []
+    
+    # METHODS
+    def write(self, data):
+        """
+        Returns the position where data was written.
+        
+        The data goes in the first free extent that is large enough, or at
+        the end of the file.
+        
+        Parameter data: The data to write
+        Precondition: data is a non-empty bytes object
+        """
+        for extent in self._free:
+            if extent[1] >= len(data):
+                offset = extent[0]
+                extent[0] += len(data)
+                extent[1] -= len(data)
+                if extent[1] == 0:
+                    self._free.remove(extent)
+                break
+        else:
+            offset = self._size
+            self._size += len(data)
+        self._file.seek(offset)
+        self._file.write(data)
+        self._used[offset] = len(data)
+        return offset
+    
+    def read(self, offset, size):
+        """
+        Returns the data written at the given position.
+        
+        Parameter offset: The position of the data
+        Precondition: offset is a result of write still in use
+        
+        Parameter size: The size of the data
+        Precondition: size is the length of the data written at offset
+        """
+        self._file.seek(offset)
+        return self._file.read(size)
+    
+    def retain(self, offsets):
+        """
+        Frees every extent that does not start at one of the given offsets.
+        
+        Free space at the end of the file is cut off.
+        
+        Parameter offsets: The positions of the extents still in use
+        Precondition: offsets is a set of results of write
+        """
+        dead = [offset for offset in self._used if not offset in offsets]
+        if not dead:
+            return
+        extents = self._free+[[offset,self._used.pop(offset)] for offset in dead]
+        extents.sort()
+        self._free = []
+        for extent in extents:
+            if self._free and self._free[-1][0]+self._free[-1][1] == extent[0]:
+                self._free[-1][1] += extent[1]
+            else:
+                self._free.append(extent)
+        if self._free[-1][0]+self._free[-1][1] == self._size:
+            self._size = self._free.pop()[0]
+            self._file.truncate(self._size)
+    
+    def compact(self):
+        """
+        Returns a dict mapping the old offset of each extent in use to its new one.
+        
+        This method moves the extents in use to the start of a new file, in
+        order, so that the file has no free space.
+        """
+        file  = tempfile.TemporaryFile()
+        moved = {}
+        used  = {}
+        for offset in sorted(self._used):
+            moved[offset] = file.tell()
+            used[file.tell()] = self._used[offset]
+            file.write(self.read(offset,self._used[offset]))
+        self._file.close()
+        self._file = file
+        self._size = file.tell()
+        self._used = used
+        self._free = []
+        return moved
+    
+    def close(self):
+        """
+        Closes (and so deletes) the file.
+        """
+        self._file.close()
+
+
+class HistoryNode(object):
+    """
+    An image in the edit history of an Editor.
+    
+    The edit history is a tree of these nodes. The parent of a node is the
+    image it was edited from, and its children are the edits made from it.
+    A node stores its image as a tuple of tiles (see Image.getTiles), which
+    it shares with its parent and children where they are the same.
+    
+    Nodes are created by Editor. Outside of that class, a node is only a
+    position in the history to pass to Editor.goto.
+    """
+    # History nodes have a fixed set of attributes, so they do not need a __dict__
+    __slots__ = ('_width', '_orient', '_tiles', '_parent', '_children', '_next',
+                 '_action', '_depth', '_order')
+    
+    # MUTABLE ATTRIBUTES
+    # Attribute _width: The width of the image
+    # Invariant: _width is an int > 0
+    #
+    # Attribute _orient: The orientation of the image (see Image.getOrientation)
+    # Invariant: _orient is a triple of bools
+    #
+    # Attribute _tiles: The stored pixels of the image (see Image.getTiles)
+    # Invariant: _tiles is a tuple of bytes, read-only memoryviews of a file
+    # (see Editor.fromSession) and StoredTile objects, or None if the image
+    # must be recomputed from _action
+    #
+    # Attribute _parent: The image this image was edited from
+    # Invariant: _parent is a HistoryNode, or None for the root (or a
+    # deleted node)
+    #
+    # Attribute _children: The images edited from this image, oldest first
+    # Invariant: _children is a list of HistoryNode objects
+    #
+    # Attribute _next: The child that redo moves to
+    # Invariant: _next is None or an element of _children
+    #
+    # Attribute _action: The action that made this image from its parent
+    # Invariant: _action is None (not recorded) or a pair (name, args)
+    #
+    # IMMUTABLE ATTRIBUTES
+    # Attribute _depth: The number of images before this one (when created)
+    # Invariant: _depth is an int >= 0, one more than the depth of _parent
+    #
+    # Attribute _order: When this image was created
+    # Invariant: _order is an int >= 0, larger than that of every older node
+    
+    def __init__(self, width, tiles, parent, order):
+        """
+        Initializes a history node with no children.
+        
+        The node has the orientation of its parent (or the identity, if it
+        has no parent).
+        
+        Parameter width: The width of the image
+        Precondition: width is an int > 0
+        
+        Parameter tiles: The pixels of the image
+        Precondition: tiles is a tuple of tiles as in the attribute _tiles, or None
+        
+        Parameter parent: The image this image was edited from
+        Precondition: parent is a HistoryNode or None
+        
+        Parameter order: When this image was created
+        Precondition: order is an int >= 0
+        """
+        self._width    = width
+        self._orient   = a6engine.IDENTITY if parent is None else parent._orient
+        self._tiles    = tiles
+        self._parent   = parent
+        self._children = []
+        self._next     = None
+        self._action   = None
+        self._depth    = 0 if parent is None else parent._depth+1
+        self._order    = order
+
+
+# RECIPES
+def writeRecipe(recipe, filename):
+    """
+    Saves a recipe (see Editor.getRecipe) to a JSON file.
+    
+    Parameter recipe: The recipe to save
+    Precondition: recipe is a list of [name, args] lists
+    
+    Parameter filename: The file to write
+    Precondition: filename is a string
+    """
+    assert type(recipe) == list, repr(recipe)+' is not a recipe'
+    with open(filename,'w') as file:
+        json.dump(recipe,file,indent=1)
+
+
+def readRecipe(filename):
+    """
+    Returns the recipe saved in the given JSON file.
+    
+    Parameter filename: The file to read
+    Precondition: filename is a string naming a file written by writeRecipe
+    """
+    with open(filename) as file:
+        recipe = json.load(file)
+    assert type(recipe) == list and all(type(step) == list and len(step) == 2 and
+                                        type(step[0]) == str and type(step[1]) == list
+                                        for step in recipe), filename+' is not a recipe'
+    return recipe
@@ -0,0 +1,1094 @@
+"""
+Whole-image versions of the filters in the imager application.
+
+The methods in a6filter walk the image one pixel at a time, checking the
+preconditions of getPixel and setPixel at every step. That is easy to read,
+but slow on large photos. The functions in this module compute the same
+filters on the packed form of an image (see Image.getBytes): a bytes object
+with the 3 bytes (r,g,b) of every pixel in row-major order.
+
+Instead of loops, these functions use operations that process the entire
+image at once. Geometric filters are index permutations built from slices
+(every row of a transposed image is a column of the original, and a column
+is just the slice data[col::width] of a channel). Color filters use
+bytes.translate or, when NumPy is installed, array arithmetic. A color
+filter that changes each color value on its own (like invert) is a lookup
+table of 256 values; the functions curve, gamma, levels and contrast make
+such tables and lookup applies them.
+
+Every function returns the same bytes that the pixel loop in a6filter would
+produce, so the two can be used interchangeably. None of these functions
+modify their arguments.
+
+Author: Yan Zhu yz2477  Aroma Dong jd778
+Date:   10/18/2026
+"""
+import functools
+import itertools
+import math
+import operator
+
+# NumPy is optional. Without it, the color filters fall back to comprehensions.
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+# The number of pixels that the NumPy functions process at once.
+# This bounds the size of the floating point temporaries.
+BLOCK_PIXELS = 1 << 20
+
+# The number of image sizes whose vignette factors are cached (see _falloff)
+FALLOFF_CACHE = 4
+
+# The terms of the brightness 0.3 * red + 0.6 * green + 0.1 * blue, for each
+# color value. Adding the terms gives exactly the same float as the formula.
+_BRIGHTNESS = ([0.3*v for v in range(256)], [0.6*v for v in range(256)],
+               [0.1*v for v in range(256)])
+
+
+# HELPER FUNCTIONS
+def _split(data):
+    """
+    Returns the three channels of the packed pixels data.
+
+    The result is a tuple (red, green, blue) of bytes objects, each with one
+    byte per pixel.
+
+    Parameter data: The packed pixels
+    Precondition: data is a bytes-like object with length a multiple of 3
+    """
+    return (bytes(data[0::3]), bytes(data[1::3]), bytes(data[2::3]))
+
+
+def _merge(red, green, blue):
+    """
+    Returns the packed pixels for the three given channels.
+
+    This is the inverse of _split.
+
+    Parameter red: The red channel
+    Precondition: red is a bytes-like object
+
+    Parameter green: The green channel
+    Precondition: green is a bytes-like object the same length as red
+
+    Parameter blue: The blue channel
+    Precondition: blue is a bytes-like object the same length as red
+    """
+    result = bytearray(3*len(red))
+    result[0::3] = red
+    result[1::3] = green
+    result[2::3] = blue
+    return bytes(result)
+
+
+def _remap(data, rows):
+    """
+    Returns the packed pixels whose channels are rebuilt row by row.
+
+    The function rows is called on each channel (a bytes object with one byte
+    per pixel) and must return a list of slices of it. These slices are the
+    rows of the new channel, in order. All of the geometric filters are
+    written this way.
+
+    Parameter data: The packed pixels
+    Precondition: data is a bytes-like object with length a multiple of 3
+
+    Parameter rows: The function to compute the rows of a channel
+    Precondition: rows is a function taking and returning bytes
+    """
+    return _merge(*(b''.join(rows(channel)) for channel in _split(data)))
+
+
+def _blocks(size, step):
+    """
+    Returns a list of (start, stop) ranges covering range(size).
+
+    Each range has at most step elements.
+
+    Parameter size: The number of elements to cover
+    Precondition: size is an int >= 0
+
+    Parameter step: The maximum length of a range
+    Precondition: step is an int > 0
+    """
+    return [(start,min(start+step,size)) for start in range(0,size,step)]
+
+
+# COLOR FILTERS
+def invert(data):
+    """
+    Returns the packed pixels data with each color replaced by its complement.
+
+    Parameter data: The packed pixels
+    Precondition: data is a bytes-like object with length a multiple of 3
+    """
+    if numpy is None:
+        return lookup(data,INVERT)
+    # Unlike bytes.translate, NumPy lets other threads run (see a6parallel)
+    return (255-numpy.frombuffer(data,dtype=numpy.uint8)).tobytes()
+
+
+def monochromify(data, sepia):
+    """
+    Returns the packed pixels data converted to greyscale or sepia tone.
+
+    The brightness of each pixel is 0.3 * red + 0.6 * green + 0.1 * blue.
+    For greyscale, all three channels become the brightness. For sepia, the
+    channels are the brightness, 0.6 * brightness and 0.4 * brightness.
+    Values are truncated to ints, as in Filter.monochromify.
+
+    Parameter data: The packed pixels
+    Precondition: data is a bytes-like object with length a multiple of 3
+
+    Parameter sepia: Whether to use sepia tone instead of greyscale.
+    Precondition: sepia is a bool
+    """
+    if numpy is None:
+        # Look up the terms instead of multiplying (NumPy multiplies faster
+        # than it looks up)
+        red, green, blue = _split(data)
+        terms = _BRIGHTNESS
+        grey = [terms[0][r]+terms[1][g]+terms[2][b] for (r,g,b) in zip(red,green,blue)]
+        if not sepia:
+            grey = bytes(map(int,grey))
+            return _merge(grey,grey,grey)
+        return _merge(bytes(map(int,grey)),bytes(int(x*0.6) for x in grey),
+                      bytes(int(x*0.4) for x in grey))
+
+    source = numpy.frombuffer(data,dtype=numpy.uint8).reshape(-1,3)
+    result = numpy.empty_like(source)
+    for (start, stop) in _blocks(len(source),BLOCK_PIXELS):
+        _tone(source[start:stop],sepia,result[start:stop])
+    return result.tobytes()
+
+
+def vignette(data, width, height, top=0):
+    """
+    Returns the packed pixels data with vignetting (corner darkening).
+
+    Each pixel is darkened by the factor 1 - (d / hfD)^2, computed exactly as
+    in Filter.vignette. That method asserts that every darkened color is a
+    valid color; this function does the same. The factors only depend on
+    the size of the image, so they are cached (see _falloff).
+
+    The data can be a band of the image: the rows top, top+1, ... (as many
+    as data holds). The factors are those of these rows in the whole image.
+
+    Parameter data: The packed pixels
+    Precondition: data is a bytes-like object with length 3*width*rows, where
+    rows <= height-top
+
+    Parameter width: The image width
+    Precondition: width is an int > 0
+
+    Parameter height: The image height
+    Precondition: height is an int > 0
+
+    Parameter top: The row of the image that starts data
+    Precondition: top is an int >= 0
+    """
+    rows = len(data)//(3*width)
+    if numpy is None:
+        red, green, blue = _split(data)
+        factors, indices, cols = _falloff(width,height,False)
+        factor = []
+        for row in range(top,top+rows):
+            factor.extend(map(factors[indices[row]].__getitem__,cols))
+        channels = []
+        for channel in (red, green, blue):
+            values = [int(v*f) for (v,f) in zip(channel,factor)]
+            assert min(values,default=0) >= 0, 'vignette produced an invalid color'
+            channels.append(bytes(values))
+        return _merge(*channels)
+
+    source = numpy.frombuffer(data,dtype=numpy.uint8).reshape(rows,width,3)
+    result = numpy.empty_like(source)
+    for (first, last) in _blocks(rows,max(1,BLOCK_PIXELS//width)):
+        _darken(source[first:last],top+first,width,height,result[first:last])
+    return result.tobytes()
+
+
+@functools.lru_cache(maxsize=FALLOFF_CACHE)
+def _falloff(width, height, arrays):
+    """
+    Returns the darkening factors of vignette for an image of the given size.
+
+    The factor of the pixel at (row, col) only depends on the squared
+    distances of row and col from the center. These repeat on the two sides
+    of the center, so this function only computes the factors for distinct
+    pairs of distances, which is one quadrant of a square image. The result
+    is a triple (factors, rows, cols) where the factor of the pixel at
+    (row, col) is factors[rows[row]][cols[col]].
+
+    The results for the last FALLOFF_CACHE sizes are cached, so repeated
+    vignettes on images of the same size (such as the frames of a batch)
+    compute the factors only once. The results must not be modified.
+
+    Parameter width: The image width
+    Precondition: width is an int > 0
+
+    Parameter height: The image height
+    Precondition: height is an int > 0
+
+    Parameter arrays: Whether the result is NumPy arrays (instead of lists)
+    Precondition: arrays is a bool, and NumPy is installed if it is True
+    """
+    cc = height/2
+    cr = width/2
+    h2 = math.sqrt((height-cr)**2 + (width-cc)**2)**2
+    # Python computes x**2 with the C pow function, which differs from
+    # x*x in the last bit. float_power uses pow as well.
+    rowterms = [(row-cr)**2 for row in range(height)]
+    colterms = [(col-cc)**2 for col in range(width)]
+    dr = sorted(set(rowterms))
+    dc = sorted(set(colterms))
+    rows = list(map({term : pos for (pos, term) in enumerate(dr)}.__getitem__,rowterms))
+    cols = list(map({term : pos for (pos, term) in enumerate(dc)}.__getitem__,colterms))
+
+    if not arrays:
+        factors = [[1-(math.sqrt(r + c)**2)/h2 for c in dc] for r in dr]
+        return (factors, rows, cols)
+
+    dr = numpy.array(dr)
+    dc = numpy.array(dc)
+    factors = 1-numpy.float_power(numpy.sqrt(dr[:,None]+dc[None,:]),2)/h2
+    result = (factors, numpy.array(rows,dtype=numpy.intp), numpy.array(cols,dtype=numpy.intp))
+    for array in result:
+        array.flags.writeable = False
+    return result
+
+
+# LOOKUP TABLES
+# A table is a list of 256 ints in 0..255, where entry v is the new value of
+# the color value v. Tables are lists (not bytes) so that they can be saved
+# in a recipe (see Editor.getRecipe).
+def isTable(value):
+    """
+    Returns True if value is a table, False otherwise.
+
+    Parameter value: The value to check
+    Precondition: NONE (value can be anything)
+    """
+    return (type(value) == list and len(value) == 256 and
+            all(type(v) == int and 0 <= v <= 255 for v in value))
+
+
+def curve(function):
+    """
+    Returns the table of the given tone curve.
+
+    Entry v of the table is function(v), rounded to the nearest int and
+    clamped to 0..255. New tone curves can be made this way, and then
+    applied with lookup or Filter.tone.
+
+    Parameter function: The tone curve
+    Precondition: function is a function from an int in 0..255 to a number
+    """
+    return [min(255,max(0,round(function(v)))) for v in range(256)]
+
+
+def gamma(value):
+    """
+    Returns the table for gamma correction.
+
+    Each color value v becomes 255 * (v/255)^(1/value), so a value > 1
+    brightens the image and a value < 1 darkens it.
+
+    Parameter value: The gamma
+    Precondition: value is a number > 0
+    """
+    assert type(value) in [int,float] and value > 0, repr(value)+' is not a valid gamma'
+    return curve(lambda v: 255*(v/255)**(1/value))
+
+
+def levels(low, high):
+    """
+    Returns the table that stretches the color values low..high to 0..255.
+
+    Values below low become 0 and values above high become 255.
+
+    Parameter low: The value that becomes 0
+    Precondition: low is an int in 0..255
+
+    Parameter high: The value that becomes 255
+    Precondition: high is an int in 0..255, high > low
+    """
+    assert type(low) == int and 0 <= low <= 255, repr(low)+' is not a color value'
+    assert type(high) == int and low < high <= 255, repr(high)+' is not a color value above low'
+    return curve(lambda v: 255*(v-low)/(high-low))
+
+
+def contrast(amount):
+    """
+    Returns the table that scales the distance of each color value from middle grey.
+
+    Each color value v becomes 127.5 + amount * (v - 127.5), so an amount > 1
+    increases the contrast and an amount < 1 decreases it.
+
+    Parameter amount: The contrast factor
+    Precondition: amount is a number >= 0
+    """
+    assert type(amount) in [int,float] and amount >= 0, repr(amount)+' is not a valid contrast'
+    return curve(lambda v: 127.5+amount*(v-127.5))
+
+
+# The table that replaces each color value with its complement
+INVERT = [255-v for v in range(256)]
+
+# The named tone curves, for Filter.curve. Each makes a table from its arguments.
+CURVES = {'invert'   : lambda: INVERT,
+          'gamma'    : gamma,
+          'levels'   : levels,
+          'contrast' : contrast}
+
+
+def lookup(data, red, green=None, blue=None):
+    """
+    Returns the packed pixels data with each color value replaced using a table.
+
+    Each channel has its own table. If green and blue are None, all three
+    channels use red, and the whole image is translated at once.
+
+    Parameter data: The packed pixels
+    Precondition: data is a bytes-like object with length a multiple of 3
+
+    Parameter red: The table for the red channel
+    Precondition: red is a table (a list of 256 ints in 0..255)
+
+    Parameter green: The table for the green channel (or None)
+    Precondition: green is a table or None; it is None if and only if blue is
+
+    Parameter blue: The table for the blue channel (or None)
+    Precondition: blue is a table or None; it is None if and only if green is
+    """
+    data = bytes(data)
+    if green is None:
+        return data.translate(bytes(red))
+    result = bytearray(len(data))
+    for (channel, table) in enumerate((red,green,blue)):
+        result[channel::3] = data[channel::3].translate(bytes(table))
+    return bytes(result)
+
+
+# BOX FILTERS
+# A summed-area table (or integral image) of a channel has height+1 rows and
+# width+1 columns. Entry [row][col] is the sum of the channel over the rows
+# 0..row-1 and the columns 0..col-1, so the sum over any box is four lookups
+# (see boxsums), however large the box is.
+def integral(data, width, height, channel):
+    """
+    Returns the summed-area table of one channel of the packed pixels data.
+
+    With NumPy, the table is an int64 array of shape (height+1, width+1).
+    Otherwise it is a list of height+1 lists of width+1 ints.
+
+    Parameter data: The packed pixels
+    Precondition: data is a bytes-like object with length 3*width*height
+
+    Parameter width: The image width
+    Precondition: width is an int > 0
+
+    Parameter height: The image height
+    Precondition: height is an int > 0
+
+    Parameter channel: The channel (0 for red, 1 for green, 2 for blue)
+    Precondition: channel is an int in 0..2
+    """
+    if numpy is None:
+        values = bytes(data[channel::3])
+        table  = [[0]*(width+1)]
+        for pos in range(0,width*height,width):
+            sums = itertools.accumulate(values[pos:pos+width],initial=0)
+            table.append(list(map(operator.add,table[-1],sums)))
+        return table
+
+    source = numpy.frombuffer(data,dtype=numpy.uint8).reshape(height,width,3)
+    return _integral(source[:,:,channel])
+
+
+def boxsums(table, tops, bottoms, lefts, rights):
+    """
+    Returns the sums of a channel over a grid of boxes, using its summed-area table.
+
+    The result has a row for each position i of tops and a column for each
+    position j of lefts. Entry [i][j] is the sum of the channel over the rows
+    tops[i]..bottoms[i]-1 and the columns lefts[j]..rights[j]-1. The result
+    is a NumPy array if table is, and a list of lists otherwise.
+
+    Parameter table: The summed-area table of the channel
+    Precondition: table is a result of integral
+
+    Parameter tops: The first row of each box
+    Precondition: tops is a list of ints in 0..height
+
+    Parameter bottoms: The row after the last row of each box
+    Precondition: bottoms is a list of ints with bottoms[i] >= tops[i]
+
+    Parameter lefts: The first column of each box
+    Precondition: lefts is a list of ints in 0..width
+
+    Parameter rights: The column after the last column of each box
+    Precondition: rights is a list of ints with rights[j] >= lefts[j]
+    """
+    if type(table) == list:
+        result = []
+        for (top, bottom) in zip(tops,bottoms):
+            above, below = table[top], table[bottom]
+            result.append([below[right]-below[left]-above[right]+above[left]
+                           for (left, right) in zip(lefts,rights)])
+        return result
+
+    above = table[tops]
+    below = table[bottoms]
+    return below[:,rights]-below[:,lefts]-above[:,rights]+above[:,lefts]
+
+
+def pixellate(data, width, height, step):
+    """
+    Returns the packed pixels data pixellated into step x step blocks.
+
+    The blocks start at the top left corner; those at the right and bottom
+    edges may be smaller. Every pixel of a block becomes the average of the
+    block (the sum of each channel // the number of pixels), as in
+    Filter.pixellate. The sums come from summed-area tables, so the time
+    does not depend on step.
+
+    Parameter data: The packed pixels
+    Precondition: data is a bytes-like object with length 3*width*height
+
+    Parameter width: The image width
+    Precondition: width is an int > 0
+
+    Parameter height: The image height
+    Precondition: height is an int > 0
+
+    Parameter step: The size of a block
+    Precondition: step is an int > 0
+    """
+    tops  = list(range(0,height,step))
+    lefts = list(range(0,width,step))
+    bottoms = tops[1:]+[height]
+    rights  = lefts[1:]+[width]
+    sizes   = [right-left for (left, right) in zip(lefts,rights)]
+
+    if numpy is None:
+        channels = []
+        for channel in range(3):
+            sums = boxsums(integral(data,width,height,channel),tops,bottoms,lefts,rights)
+            rows = []
+            for (top, bottom, line) in zip(tops,bottoms,sums):
+                size = bottom-top
+                line = b''.join(bytes([total//(size*cols)])*cols for (total, cols) in zip(line,sizes))
+                rows.append(line*size)
+            channels.append(b''.join(rows))
+        return _merge(*channels)
+
+    heights = numpy.array(bottoms)-tops
+    counts  = heights[:,None]*numpy.array(sizes)[None,:]
+    result  = numpy.empty((height,width,3),dtype=numpy.uint8)
+    for channel in range(3):
+        sums = boxsums(integral(data,width,height,channel),tops,bottoms,lefts,rights)
+        average = sums//counts
+        result[:,:,channel] = numpy.repeat(numpy.repeat(average,heights,axis=0),sizes,axis=1)
+    return result.tobytes()
+
+
+def radii(sigma, count=3):
+    """
+    Returns the radii of count box blurs that approximate a Gaussian blur.
+
+    Blurring with boxes of these radii in turn is close to a Gaussian blur
+    with standard deviation sigma (the boxes have two sizes, chosen so that
+    the variances add up to sigma^2).
+
+    Parameter sigma: The standard deviation of the Gaussian
+    Precondition: sigma is a number > 0
+
+    Parameter count: The number of boxes
+    Precondition: count is an int > 0
+    """
+    ideal = math.sqrt(12*sigma*sigma/count+1)
+    lower = int(ideal)
+    if lower % 2 == 0:
+        lower -= 1
+    upper = lower+2
+    small = round((12*sigma*sigma-count*lower*lower-4*count*lower-3*count)/(-4*lower-4))
+    return [(lower-1)//2 if pos < small else (upper-1)//2 for pos in range(count)]
+
+
+def blur(data, width, height, radius):
+    """
+    Returns the packed pixels data with a box blur.
+
+    Each pixel becomes the average of the pixels within radius rows and
+    radius columns of it, rounded to the nearest int (with halves rounded
+    up). Near the edges, only the pixels inside the image are averaged. The
+    sums come from summed-area tables, so the time does not depend on radius.
+
+    Parameter data: The packed pixels
+    Precondition: data is a bytes-like object with length 3*width*height
+
+    Parameter width: The image width
+    Precondition: width is an int > 0
+
+    Parameter height: The image height
+    Precondition: height is an int > 0
+
+    Parameter radius: The radius of the box
+    Precondition: radius is an int >= 0
+    """
+    if numpy is None:
+        tops    = [max(0,row-radius) for row in range(height)]
+        bottoms = [min(height,row+radius+1) for row in range(height)]
+        lefts   = [max(0,col-radius) for col in range(width)]
+        rights  = [min(width,col+radius+1) for col in range(width)]
+        widths  = [right-left for (left, right) in zip(lefts,rights)]
+        channels = []
+        for channel in range(3):
+            sums = boxsums(integral(data,width,height,channel),tops,bottoms,lefts,rights)
+            rows = []
+            for (top, bottom, line) in zip(tops,bottoms,sums):
+                size = bottom-top
+                rows.append(bytes((2*total+size*cols)//(2*size*cols)
+                                  for (total, cols) in zip(line,widths)))
+            channels.append(b''.join(rows))
+        return _merge(*channels)
+
+    source = numpy.frombuffer(data,dtype=numpy.uint8).reshape(height,width,3)
+    result = numpy.empty_like(source)
+    for channel in range(3):
+        table = _integral(source[:,:,channel])
+        for (top, bottom) in _blocks(height,max(1,BLOCK_PIXELS//width)):
+            _box(table,top,bottom,radius,result[top:bottom,:,channel])
+    return result.tobytes()
+
+
+# CONVOLUTION
+# A kernel is a list of lists of numbers, with an odd number of rows and of
+# columns. Convolving an image with a kernel replaces each pixel with a
+# weighted sum of its neighbors: kernel[i][j] is the weight of the pixel
+# i-ry rows below and j-rx columns right of it, where ry and rx are half the
+# number of rows and columns (rounded down). Pixels past the edges of the
+# image are the nearest edge pixel. The sums are rounded to the nearest int
+# (with halves rounded to even, as in round) and clamped to 0..255.
+
+# A kernel that sharpens an image
+SHARPEN = [[0,-1,0],[-1,5,-1],[0,-1,0]]
+
+# A kernel that finds the edges in an image
+EDGES = [[-1,-1,-1],[-1,8,-1],[-1,-1,-1]]
+
+
+def isKernel(value):
+    """
+    Returns True if value is a kernel, False otherwise.
+
+    Parameter value: The value to check
+    Precondition: NONE (value can be anything)
+    """
+    if type(value) != list or len(value) % 2 == 0:
+        return False
+    for weights in value:
+        if type(weights) != list or len(weights) != len(value[0]) or len(weights) % 2 == 0:
+            return False
+        if not all(type(weight) in [int,float] for weight in weights):
+            return False
+    return True
+
+
+def separate(kernel):
+    """
+    Returns the pair (column, row) whose product is kernel, or None if there is none.
+
+    A kernel is separable if every row is a multiple of the same row, so
+    that kernel[i][j] == column[i]*row[j]. Convolving with a separable
+    kernel is the same as convolving with the row and then with the column,
+    which takes rx+ry (instead of rx*ry) steps for every pixel. This
+    function only returns a pair if the products are exactly the kernel.
+
+    Parameter kernel: The kernel to separate
+    Precondition: kernel is a kernel
+    """
+    nonzero = [(i, j) for (i, weights) in enumerate(kernel)
+               for (j, weight) in enumerate(weights) if weight]
+    if not nonzero:
+        return None
+    i, j = nonzero[0]
+    row = list(kernel[i])
+    column = [weights[j]/row[j] for weights in kernel]
+    for (weights, factor) in zip(kernel,column):
+        if any(factor*r != weight for (r, weight) in zip(row,weights)):
+            return None
+    return (column, row)
+
+
+def convolve(data, width, height, kernel):
+    """
+    Returns the packed pixels data convolved with kernel.
+
+    See the description of kernels above. If the kernel is separable (see
+    separate), the image is convolved with its row and then its column.
+
+    Parameter data: The packed pixels
+    Precondition: data is a bytes-like object with length 3*width*height
+
+    Parameter width: The image width
+    Precondition: width is an int > 0
+
+    Parameter height: The image height
+    Precondition: height is an int > 0
+
+    Parameter kernel: The kernel
+    Precondition: kernel is a kernel
+    """
+    parts = separate(kernel)
+    if numpy is None:
+        channels = []
+        for channel in range(3):
+            values = data[channel::3]
+            rows = [values[pos:pos+width] for pos in range(0,width*height,width)]
+            if parts is None:
+                rows = _correlate(rows,kernel)
+            else:
+                rows = _correlate(_correlate(rows,[parts[1]]),[[weight] for weight in parts[0]])
+            channels.append(b''.join(bytes(min(255,max(0,round(x))) for x in row) for row in rows))
+        return _merge(*channels)
+
+    source = numpy.frombuffer(data,dtype=numpy.uint8).reshape(height,width,3)
+    result = numpy.empty_like(source)
+    for (top, bottom) in _blocks(height,max(1,BLOCK_PIXELS//width)):
+        _convolve(source,top,bottom,kernel,parts,result[top:bottom])
+    return result.tobytes()
+
+
+def _correlate(rows, kernel):
+    """
+    Returns the rows of a channel convolved with kernel, without rounding.
+
+    The result is a list of lists of numbers.
+
+    Parameter rows: The rows of the channel
+    Precondition: rows is a non-empty list of sequences of numbers, all the same length
+
+    Parameter kernel: The kernel
+    Precondition: kernel is a kernel
+    """
+    ry = len(kernel)//2
+    rx = len(kernel[0])//2
+    width = len(rows[0])
+    padded = [[row[0]]*rx+list(row)+[row[-1]]*rx for row in rows]
+    padded = [padded[0]]*ry+padded+[padded[-1]]*ry
+    result = []
+    for pos in range(len(rows)):
+        total = [0]*width
+        for (i, weights) in enumerate(kernel):
+            line = padded[pos+i]
+            for (j, weight) in enumerate(weights):
+                if weight:
+                    total = list(map(operator.add,total,
+                                      map(operator.mul,itertools.repeat(weight),line[j:j+width])))
+        result.append(total)
+    return result
+
+
+# NUMPY KERNELS (used by the color filters and by fuse)
+def _tone(block, sepia, out):
+    """
+    Writes the pixels of block, converted to greyscale or sepia, to out.
+
+    Parameter block: The pixels to convert
+    Precondition: block is a NumPy uint8 array whose last axis has length 3
+
+    Parameter sepia: Whether to use sepia tone instead of greyscale.
+    Precondition: sepia is a bool
+
+    Parameter out: The array for the result
+    Precondition: out is a NumPy uint8 array with the shape of block
+    """
+    grey = 0.3*block[...,0]+0.6*block[...,1]+0.1*block[...,2]
+    out[...,0] = grey
+    out[...,1] = grey*0.6 if sepia else grey
+    out[...,2] = grey*0.4 if sepia else grey
+
+
+def _darken(block, top, width, height, out):
+    """
+    Writes the pixels of block, darkened as in vignette, to out.
+
+    Parameter block: The rows top, top+1, ... of the image to darken
+    Precondition: block is a NumPy uint8 array of shape (rows, width, 3)
+
+    Parameter top: The row of the image that starts block
+    Precondition: top is an int >= 0
+
+    Parameter width: The image width
+    Precondition: width is an int > 0
+
+    Parameter height: The image height
+    Precondition: height is an int > 0
+
+    Parameter out: The array for the result
+    Precondition: out is a NumPy uint8 array with the shape of block
+    """
+    factors, rows, cols = _falloff(width,height,True)
+    f = factors[numpy.ix_(rows[top:top+len(block)],cols)]
+    values = block*f[:,:,None]
+    if f.min(initial=0) < 0:
+        assert numpy.trunc(values).min(initial=0) >= 0, 'vignette produced an invalid color'
+    # The values are in 0..255, so converting to uint8 truncates them
+    out[...] = values
+
+
+def _integral(values):
+    """
+    Returns the summed-area table of a channel (see integral).
+
+    Parameter values: The channel
+    Precondition: values is a 2-dimensional NumPy uint8 array
+    """
+    height, width = values.shape
+    table = numpy.zeros((height+1,width+1),dtype=numpy.int64)
+    table[1:,1:] = values
+    numpy.cumsum(table,axis=1,out=table)
+    # Adding one row at a time reads memory in order, unlike cumsum on axis 0
+    for row in range(1,height+1):
+        numpy.add(table[row],table[row-1],out=table[row])
+    return table
+
+
+def _box(table, top, bottom, radius, out):
+    """
+    Writes the rows top..bottom-1 of a channel, with a box blur, to out.
+
+    Parameter table: The summed-area table of the channel
+    Precondition: table is a result of _integral
+
+    Parameter top: The first row to blur
+    Precondition: top is an int >= 0
+
+    Parameter bottom: The row after the last row to blur
+    Precondition: bottom is an int, top < bottom <= height
+
+    Parameter radius: The radius of the box
+    Precondition: radius is an int >= 0
+
+    Parameter out: The array for the result
+    Precondition: out is a NumPy uint8 array of shape (bottom-top, width)
+    """
+    height, width = table.shape[0]-1, table.shape[1]-1
+    rows = numpy.arange(top,bottom)
+    cols = numpy.arange(width)
+    tops    = numpy.maximum(rows-radius,0)
+    bottoms = numpy.minimum(rows+radius+1,height)
+    lefts   = numpy.maximum(cols-radius,0)
+    rights  = numpy.minimum(cols+radius+1,width)
+    counts  = (bottoms-tops)[:,None]*(rights-lefts)[None,:]
+    # As in boxsums, but subtracting the rows first halves the lookups
+    across = table[bottoms]-table[tops]
+    sums   = across[:,rights]-across[:,lefts]
+    # A quotient that is not an int is at least 1/(2*count) below the next
+    # one, far more than the float error, so truncating it to uint8 gives
+    # the same value as (2*sums+counts)//(2*counts)
+    out[...] = (sums+0.5*counts)/counts
+
+
+def _convolve(source, top, bottom, kernel, parts, out):
+    """
+    Writes the rows top..bottom-1 of source, convolved with kernel, to out.
+
+    The rows above and below (up to half the kernel) are read from source,
+    so source must be the whole image.
+
+    Parameter source: The image
+    Precondition: source is a NumPy uint8 array of shape (height, width, 3)
+
+    Parameter top: The first row to convolve
+    Precondition: top is an int >= 0
+
+    Parameter bottom: The row after the last row to convolve
+    Precondition: bottom is an int, top < bottom <= height
+
+    Parameter kernel: The kernel
+    Precondition: kernel is a kernel
+
+    Parameter parts: The separated kernel, or None if it is not separable
+    Precondition: parts is the result of separate(kernel)
+
+    Parameter out: The array for the result
+    Precondition: out is a NumPy uint8 array of shape (bottom-top, width, 3)
+    """
+    height, width = source.shape[:2]
+    ry = len(kernel)//2
+    rx = len(kernel[0])//2
+    rows = numpy.clip(numpy.arange(top-ry,bottom+ry),0,height-1)
+    cols = numpy.clip(numpy.arange(-rx,width+rx),0,width-1)
+    # Python ints times uint8 arrays are uint8 arrays (which overflow)
+    window = source[rows][:,cols].astype(numpy.float64)
+    size = bottom-top
+    if parts is None:
+        total = numpy.zeros(out.shape)
+        for (i, weights) in enumerate(kernel):
+            for (j, weight) in enumerate(weights):
+                if weight:
+                    total += weight*window[i:i+size,j:j+width]
+    else:
+        across = numpy.zeros((len(window),width,3))
+        for (j, weight) in enumerate(parts[1]):
+            if weight:
+                across += weight*window[:,j:j+width]
+        total = numpy.zeros(out.shape)
+        for (i, weight) in enumerate(parts[0]):
+            if weight:
+                total += weight*across[i:i+size]
+    out[...] = numpy.clip(numpy.rint(total),0,255)
+
+
+# GEOMETRIC FILTERS
+def transpose(data, width, height):
+    """
+    Returns the packed pixels data transposed.
+
+    The result is an image with width height and height width, where the
+    pixel at (row, col) is the pixel at (col, row) in the original.
+
+    Parameter data: The packed pixels
+    Precondition: data is a bytes-like object with length 3*width*height
+
+    Parameter width: The image width
+    Precondition: width is an int > 0
+
+    Parameter height: The image height
+    Precondition: height is an int > 0
+    """
+    return _remap(data, lambda channel: [channel[col::width] for col in range(width)])
+
+
+def reflectHori(data, width, height):
+    """
+    Returns the packed pixels data reflected around the horizontal middle.
+
+    Each row of the result is the corresponding row of the original, in
+    reverse order.
+
+    Parameter data: The packed pixels
+    Precondition: data is a bytes-like object with length 3*width*height
+
+    Parameter width: The image width
+    Precondition: width is an int > 0
+
+    Parameter height: The image height
+    Precondition: height is an int > 0
+    """
+    return _remap(data, lambda channel:
+                  [channel[pos:pos+width][::-1] for pos in range(0,width*height,width)])
+
+
+def reflectVert(data, width, height):
+    """
+    Returns the packed pixels data reflected around the vertical middle.
+
+    The rows of the result are the rows of the original, in reverse order.
+
+    Parameter data: The packed pixels
+    Precondition: data is a bytes-like object with length 3*width*height
+
+    Parameter width: The image width
+    Precondition: width is an int > 0
+
+    Parameter height: The image height
+    Precondition: height is an int > 0
+    """
+    size = 3*width
+    return b''.join(data[pos:pos+size] for pos in range(size*(height-1),-1,-size))
+
+
+def rotateRight(data, width, height):
+    """
+    Returns the packed pixels data rotated right by 90 degrees.
+
+    The result has width height and height width. Row r of the result is
+    column r of the original, read from bottom to top.
+
+    Parameter data: The packed pixels
+    Precondition: data is a bytes-like object with length 3*width*height
+
+    Parameter width: The image width
+    Precondition: width is an int > 0
+
+    Parameter height: The image height
+    Precondition: height is an int > 0
+    """
+    return _remap(data, lambda channel: [channel[col::width][::-1] for col in range(width)])
+
+
+def rotateLeft(data, width, height):
+    """
+    Returns the packed pixels data rotated left by 90 degrees.
+
+    The result has width height and height width. Row r of the result is
+    column width-1-r of the original, read from top to bottom.
+
+    Parameter data: The packed pixels
+    Precondition: data is a bytes-like object with length 3*width*height
+
+    Parameter width: The image width
+    Precondition: width is an int > 0
+
+    Parameter height: The image height
+    Precondition: height is an int > 0
+    """
+    return _remap(data, lambda channel: [channel[col::width] for col in range(width-1,-1,-1)])
+
+
+# FUSED FILTERS
+# Every geometric filter is one of the 8 symmetries of a rectangle. Each is a
+# triple (swap, flipRows, flipCols): first transpose the image if swap is
+# True, then reverse the order of the rows if flipRows is True, then reverse
+# every row if flipCols is True.
+GEOMETRY = {'transpose'   : (True, False, False),
+            'reflectVert' : (False, True, False),
+            'reflectHori' : (False, False, True),
+            'rotateRight' : (True, False, True),
+            'rotateLeft'  : (True, True, False)}
+
+# The symmetry that leaves the image unchanged
+IDENTITY = (False, False, False)
+
+# The color filters that fuse can apply, and whether they depend on position
+POINTS = {'invert' : False, 'monochromify' : False, 'vignette' : True}
+
+
+def compose(first, second):
+    """
+    Returns the symmetry that applies first and then second.
+
+    Parameter first: The symmetry applied first
+    Precondition: first is a triple of bools (see GEOMETRY)
+
+    Parameter second: The symmetry applied second
+    Precondition: second is a triple of bools (see GEOMETRY)
+    """
+    if second[0]:
+        # Transposing swaps the roles of the row and column flips
+        return (not first[0], second[1] != first[2], second[2] != first[1])
+    return (first[0], second[1] != first[1], second[2] != first[2])
+
+
+def orient(data, width, height, symmetry):
+    """
+    Returns the packed pixels data with the given symmetry applied.
+
+    If the symmetry transposes, the result has width height and height width.
+    This is a single index remapping, however many geometric filters were
+    composed to make the symmetry.
+
+    Parameter data: The packed pixels
+    Precondition: data is a bytes-like object with length 3*width*height
+
+    Parameter width: The image width
+    Precondition: width is an int > 0
+
+    Parameter height: The image height
+    Precondition: height is an int > 0
+
+    Parameter symmetry: The symmetry to apply
+    Precondition: symmetry is a triple of bools (see GEOMETRY)
+    """
+    swap, flipRows, flipCols = symmetry
+    if numpy is not None:
+        view = numpy.frombuffer(data,dtype=numpy.uint8).reshape(height,width,3)
+        return _orient(view,symmetry).tobytes()
+
+    def rows(channel):
+        if swap:
+            result = [channel[col::width] for col in range(width)]
+        else:
+            result = [channel[pos:pos+width] for pos in range(0,width*height,width)]
+        if flipRows:
+            result.reverse()
+        if flipCols:
+            result = [row[::-1] for row in result]
+        return result
+    return _remap(data,rows)
+
+
+def _orient(view, symmetry):
+    """
+    Returns a NumPy view of the pixels view with the given symmetry applied.
+
+    Parameter view: The pixels
+    Precondition: view is a NumPy array of shape (height, width, 3)
+
+    Parameter symmetry: The symmetry to apply
+    Precondition: symmetry is a triple of bools (see GEOMETRY)
+    """
+    if symmetry[0]:
+        view = view.transpose(1,0,2)
+    if symmetry[1]:
+        view = view[::-1]
+    if symmetry[2]:
+        view = view[:,::-1]
+    return view
+
+
+def fuse(data, width, height, symmetry, points):
+    """
+    Returns the packed pixels data with a symmetry and then color filters applied.
+
+    This is the same as orient followed by each color filter in turn, but
+    (when NumPy is installed) it makes only one pass over the image. Each
+    block of rows is read through the symmetry and passes through all of the
+    color filters while it is in the cache. Without NumPy, the color filters
+    are applied one at a time.
+
+    Parameter data: The packed pixels
+    Precondition: data is a bytes-like object with length 3*width*height
+
+    Parameter width: The image width
+    Precondition: width is an int > 0
+
+    Parameter height: The image height
+    Precondition: height is an int > 0
+
+    Parameter symmetry: The symmetry to apply first
+    Precondition: symmetry is a triple of bools (see GEOMETRY)
+
+    Parameter points: The color filters to apply, in order
+    Precondition: points is a list of (name, args) pairs, where name is a key
+    of POINTS and args are the arguments of that function after data (only
+    the sepia flag of monochromify)
+    """
+    if numpy is None:
+        if symmetry != IDENTITY:
+            data = orient(data,width,height,symmetry)
+        if symmetry[0]:
+            width, height = height, width
+        for (name, args) in points:
+            if name == 'invert':
+                data = invert(data)
+            elif name == 'monochromify':
+                data = monochromify(data,*args)
+            else:
+                data = vignette(data,width,height)
+        return bytes(data)
+
+    source = numpy.frombuffer(data,dtype=numpy.uint8).reshape(height,width,3)
+    source = _orient(source,symmetry)
+    height, width = source.shape[:2]
+    result = numpy.empty((height,width,3),dtype=numpy.uint8)
+    for (top, bottom) in _blocks(height,max(1,BLOCK_PIXELS//width)):
+        block = source[top:bottom]
+        for (name, args) in points:
+            out = numpy.empty(block.shape,dtype=numpy.uint8)
+            if name == 'invert':
+                numpy.subtract(255,block,out=out)
+            elif name == 'monochromify':
+                _tone(block,*args,out)
+            else:
+                _darken(block,top,width,height,out)
+            block = out
+        result[top:bottom] = block
+    return result.tobytes()
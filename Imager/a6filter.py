@@ -16,6 +16,8 @@ Author: Yan Zhu yz2477  Aroma Dong jd778
 Date:   11/20/2019
 """
 import a6editor
+import a6engine
+import a6parallel
 import math
 
 
@@ -35,7 +37,25 @@ class Filter(a6editor.Editor):
 
     Each one of the non-hidden functions should edit the most recent image
     in the edit history (which is inherited from Editor).
+
+    Pixel-by-pixel loops are slow on large images, so each provided action
+    and assignment method also has a whole-image version in a6engine. These
+    produce exactly the same pixels. The geometric actions do not even move
+    pixels: they change the orientation of the image (see Image.transform).
+    The loops are still here, as they are the easiest way to understand
+    each filter, and are used whenever VECTORIZE is False.
+
+    Attribute VECTORIZE: A CLASS ATTRIBUTE for whether to use a6engine
+    Invariant: VECTORIZE is a bool
+
+    Attribute EXECUTOR: A CLASS ATTRIBUTE for the workers of the whole-image filters
+    Invariant: EXECUTOR is an a6parallel.Executor, or None to use this process
     """
+    # Whether the filters process the whole image at once (using a6engine)
+    VECTORIZE = True
+
+    # The workers (processes or threads) for the whole-image filters (see a6parallel)
+    EXECUTOR = None
 
     # PROVIDED ACTIONS (STUDY THESE)
     def invert(self):
@@ -44,6 +64,10 @@ class Filter(a6editor.Editor):
         color complement
         """
         current = self.getCurrent()
+        if self.VECTORIZE:
+            self._engine('invert')
+            return
+
         for pos in range(len(current)): # We can do this because of __len__
             rgb = current[pos]         # We can do this because of __getitem__
             red   = 255 - rgb[0]
@@ -62,6 +86,10 @@ class Filter(a6editor.Editor):
         image with setPixel, but read (with getPixel) from the copy.
         """
         current  = self.getCurrent()
+        if self.VECTORIZE:
+            current.transform(a6engine.GEOMETRY['transpose'])
+            return
+
         original = current.copy()
         current.setWidth(current.getHeight())
 
@@ -74,10 +102,12 @@ class Filter(a6editor.Editor):
         Reflects the current image around the horizontal middle.
         """
         current = self.getCurrent()
-        for h in range(current.getWidth()//2):      # Loop over the columnns
-            for row in range(current.getHeight()):  # Loop over the rows
-                k = current.getWidth()-1-h
-                current.swapPixels(row,h,row,k)
+        if self.VECTORIZE:
+            current.transform(a6engine.GEOMETRY['reflectHori'])
+            return
+
+        for row in range(current.getHeight()):      # Loop over the rows
+            current.setRow(row,current.getRow(row)[::-1])
 
     def rotateRight(self):
         """
@@ -88,6 +118,10 @@ class Filter(a6editor.Editor):
         strategy below.
         """
         current  = self.getCurrent()
+        if self.VECTORIZE:
+            current.transform(a6engine.GEOMETRY['rotateRight'])
+            return
+
         original = current.copy()
         current.setWidth(current.getHeight())
 
@@ -105,6 +139,10 @@ class Filter(a6editor.Editor):
         strategy below.
         """
         current  = self.getCurrent()
+        if self.VECTORIZE:
+            current.transform(a6engine.GEOMETRY['rotateLeft'])
+            return
+
         original = current.copy()
         current.setWidth(current.getHeight())
 
@@ -119,10 +157,15 @@ class Filter(a6editor.Editor):
         Reflects the current image around the vertical middle.
         """
         current = self.getCurrent()
+        if self.VECTORIZE:
+            current.transform(a6engine.GEOMETRY['reflectVert'])
+            return
+
         for h in range(current.getHeight()//2):
-            for col in range(current.getWidth()):
-                k = current.getHeight()-1-h
-                current.swapPixels(h,col,k,col)
+            k = current.getHeight()-1-h
+            top = current.getRow(h)
+            current.setRow(h,current.getRow(k))
+            current.setRow(k,top)
 
     def monochromify(self, sepia):
         """
@@ -142,6 +185,10 @@ class Filter(a6editor.Editor):
         """
         assert isinstance(sepia,bool), repr(sepia)+' is not a bool'
         current=self.getCurrent()
+        if self.VECTORIZE:
+            self._engine('monochromify',sepia)
+            return
+
         if sepia == False:
             for pos in range(current.__len__()):
                 rgb = current[pos]
@@ -204,6 +251,10 @@ class Filter(a6editor.Editor):
         current=self.getCurrent()
         height = current.getHeight()
         width = current.getWidth()
+        if self.VECTORIZE:
+            self._engine('vignette')
+            return
+
         cc=height/2
         cr=width/2
         h =math.sqrt((height-cr)**2 + (width-cc)**2)
@@ -236,8 +287,288 @@ class Filter(a6editor.Editor):
         Parameter step: The number of pixels in a pixellated block
         Precondition: step is an int > 0
         """
+        assert type(step) == int and step > 0, repr(step)+' is not a valid step'
+        current = self.getCurrent()
+        height = current.getHeight()
+        width = current.getWidth()
+        if self.VECTORIZE:
+            self._engine('pixellate',step)
+            return
+
+        for top in range(0,height,step):
+            for left in range(0,width,step):
+                bottom = min(top+step,height)
+                right = min(left+step,width)
+                red = green = blue = 0
+                for row in range(top,bottom):
+                    for col in range(left,right):
+                        rgb = current.getPixel(row,col)
+                        red   += rgb[0]
+                        green += rgb[1]
+                        blue  += rgb[2]
+                count = (bottom-top)*(right-left)
+                current.fillRect(top,left,bottom-top,right-left,
+                                 (red//count,green//count,blue//count))
+
+    # NEIGHBORHOOD FILTERS
+    def convolve(self, kernel):
+        """
+        Convolves the current image with the given kernel.
+
+        A kernel is a list of lists of numbers, with an odd number of rows
+        and of columns. Each pixel becomes a weighted sum of its neighbors,
+        where kernel[i][j] is the weight of the pixel i-ry rows below and
+        j-rx columns right of it (ry and rx are half the number of rows and
+        columns, rounded down). Pixels past the edges of the image are the
+        nearest edge pixel. The sums are rounded and clamped to 0..255.
+
+        Parameter kernel: The kernel
+        Precondition: kernel is a kernel (see a6engine.isKernel)
+        """
+        assert a6engine.isKernel(kernel), repr(kernel)+' is not a kernel'
+        current = self.getCurrent()
+        height = current.getHeight()
+        width = current.getWidth()
+        if self.VECTORIZE:
+            self._engine('convolve',kernel)
+            return
+
+        original = current.copy()
+        ry = len(kernel)//2
+        rx = len(kernel[0])//2
+        for row in range(height):
+            for col in range(width):
+                total = [0,0,0]
+                for i in range(len(kernel)):
+                    for j in range(len(kernel[0])):
+                        if kernel[i][j]:
+                            rgb = original.getPixel(min(max(row+i-ry,0),height-1),
+                                                    min(max(col+j-rx,0),width-1))
+                            for ii in range(3):
+                                total[ii] = total[ii]+kernel[i][j]*rgb[ii]
+                current.setPixel(row,col,tuple(min(255,max(0,round(x))) for x in total))
+
+    def blur(self, radius):
+        """
+        Blurs the current image with a box blur.
+
+        Each pixel becomes the average of the pixels within radius rows and
+        radius columns of it, rounded to the nearest int (with halves
+        rounded up). Near the edges, only the pixels inside the image are
+        averaged. The time does not depend on radius.
+
+        Parameter radius: The radius of the box
+        Precondition: radius is an int >= 0
+        """
+        assert type(radius) == int and radius >= 0, repr(radius)+' is not a valid radius'
+        current = self.getCurrent()
+        height = current.getHeight()
+        width = current.getWidth()
+        if self.VECTORIZE:
+            self._engine('blur',radius)
+            return
+
+        original = current.copy()
+        for row in range(height):
+            for col in range(width):
+                top, bottom = max(row-radius,0), min(row+radius+1,height)
+                left, right = max(col-radius,0), min(col+radius+1,width)
+                total = [0,0,0]
+                for r in range(top,bottom):
+                    for c in range(left,right):
+                        rgb = original.getPixel(r,c)
+                        for ii in range(3):
+                            total[ii] += rgb[ii]
+                count = (bottom-top)*(right-left)
+                current.setPixel(row,col,tuple((2*x+count)//(2*count) for x in total))
+
+    def gaussian(self, sigma):
+        """
+        Blurs the current image with (an approximation of) a Gaussian blur.
+
+        The blur is three box blurs in a row (see a6engine.radii), so like
+        blur, the time does not depend on sigma.
+
+        Parameter sigma: The standard deviation of the blur, in pixels
+        Precondition: sigma is a number > 0
+        """
+        assert type(sigma) in [int,float] and sigma > 0, repr(sigma)+' is not a valid sigma'
+        for radius in a6engine.radii(sigma):
+            self.blur(radius)
+
+    def sharpen(self):
+        """
+        Sharpens the current image.
+
+        This convolves the image with the kernel a6engine.SHARPEN.
+        """
+        self.convolve(a6engine.SHARPEN)
+
+    def edges(self):
+        """
+        Replaces the current image with its edges.
+
+        This convolves the image with the kernel a6engine.EDGES. Flat areas
+        become black, and edges become bright.
+        """
+        self.convolve(a6engine.EDGES)
+
+    # TONE CURVES
+    def tone(self, red, green=None, blue=None):
+        """
+        Replaces each color value of the current image using lookup tables.
+
+        A table is a list of 256 ints in 0..255, where entry v is the new
+        value of the color value v (see a6engine.curve). Each channel has its
+        own table. If green and blue are None, all three channels use red.
+
+        Parameter red: The table for the red channel
+        Precondition: red is a table
+
+        Parameter green: The table for the green channel (or None)
+        Precondition: green is a table or None; it is None if and only if blue is
+
+        Parameter blue: The table for the blue channel (or None)
+        Precondition: blue is a table or None; it is None if and only if green is
+        """
+        assert a6engine.isTable(red), repr(red)+' is not a table'
+        assert (green is None) == (blue is None), 'green and blue are not both tables or both None'
+        assert green is None or a6engine.isTable(green), repr(green)+' is not a table'
+        assert blue is None or a6engine.isTable(blue), repr(blue)+' is not a table'
+        current = self.getCurrent()
+        if self.VECTORIZE:
+            self._engine('tone',red,green,blue)
+            return
+
+        if green is None:
+            green = blue = red
+        for pos in range(len(current)):
+            rgb = current[pos]
+            current[pos] = (red[rgb[0]],green[rgb[1]],blue[rgb[2]])
+
+    def curve(self, name, *args):
+        """
+        Applies the named tone curve to all three channels of the current image.
+
+        The tone curves are the functions in a6engine.CURVES: 'invert',
+        'gamma' (with the gamma), 'levels' (with the low and high values) and
+        'contrast' (with the contrast factor). Unlike tone, the recipe of an
+        edit made with this method records the name instead of the table.
+
+        Parameter name: The name of the tone curve
+        Precondition: name is a key of a6engine.CURVES
+
+        Parameter args: The arguments of the tone curve
+        Precondition: args are valid arguments for that function
+        """
+        assert name in a6engine.CURVES, repr(name)+' is not a tone curve'
+        self.tone(a6engine.CURVES[name](*args))
+
+    # PIPELINES
+    def chain(self, actions):
+        """
+        Applies the given actions to the current image, fusing them if possible.
+
+        The result is the same as calling each action in turn. However, the
+        geometric actions (transpose, reflections and rotations) in a row
+        are composed into a single remapping, and the color actions (invert,
+        monochromify and vignette) in a row are applied in a single pass over
+        the image (see a6engine.fuse). As invert and monochromify do not
+        depend on the position of a pixel, a geometric action can move ahead
+        of them, so these two kinds of actions fuse even when they are mixed.
+        Only a vignette followed by a geometric action needs a second pass.
+
+        Any other action is applied on its own, between the fused passes. If
+        VECTORIZE is False, nothing is fused.
+
+        Parameter actions: The actions to apply
+        Precondition: actions is a list of [name, args] lists (as in
+        Editor.getRecipe), where name is an action of this object
+        """
+        assert type(actions) == list, repr(actions)+' is not a list of actions'
+        if not self.VECTORIZE:
+            for (name, args) in actions:
+                getattr(self,name)(*args)
+            return
+
+        symmetry = a6engine.IDENTITY
+        points = []
+        for (name, args) in actions:
+            if name in a6engine.GEOMETRY and not args:
+                if any(a6engine.POINTS[point[0]] for point in points):
+                    self._fuse(symmetry,points)
+                    symmetry, points = a6engine.IDENTITY, []
+                symmetry = a6engine.compose(symmetry,a6engine.GEOMETRY[name])
+            elif name in a6engine.POINTS and (name != 'monochromify' or len(args) == 1):
+                if name == 'monochromify':
+                    assert isinstance(args[0],bool), repr(args[0])+' is not a bool'
+                else:
+                    assert not args, repr(name)+' does not take arguments'
+                points.append((name,tuple(args)))
+            else:
+                self._fuse(symmetry,points)
+                symmetry, points = a6engine.IDENTITY, []
+                getattr(self,name)(*args)
+        self._fuse(symmetry,points)
+
+    def pipeline(self):
+        """
+        Returns a new (empty) lazy pipeline for this object.
+
+        See class Pipeline.
+        """
+        return Pipeline(self)
 
     # HELPER METHODS
+    def _engine(self, name, *args):
+        """
+        Applies a whole-image filter to the current image.
+
+        The filter is computed by a6parallel.compute. If EXECUTOR is not
+        None, it computes the filter in bands, on several cores.
+
+        Parameter name: The filter
+        Precondition: name is in a6parallel.FILTERS
+
+        Parameter args: The arguments of the filter
+        Precondition: args are valid arguments for the filter
+        """
+        current = self.getCurrent()
+        width = current.getWidth()
+        height = current.getHeight()
+        if self.EXECUTOR is None:
+            data = a6parallel.compute(name,current.getBytes(),width,height,0,args)
+        else:
+            data = self.EXECUTOR.run(name,current.getBytes(),width,height,args)
+        current.setBytes(data)
+
+    def _fuse(self, symmetry, points):
+        """
+        Applies a symmetry and then color filters to the current image in one pass.
+
+        The symmetry only changes the orientation of the image. If there are
+        color filters, the pass applies the orientation as it reads.
+
+        Parameter symmetry: The symmetry to apply first
+        Precondition: symmetry is a triple of bools (see a6engine.GEOMETRY)
+
+        Parameter points: The color filters to apply, in order
+        Precondition: points is a list of (name, args) pairs (see a6engine.fuse)
+        """
+        current = self.getCurrent()
+        current.transform(symmetry)
+        if not points:
+            return
+        # Fuse the orientation of the image into the pass, instead of moving
+        # the pixels first
+        symmetry = current.getOrientation()
+        width    = current.getWidth()
+        stored   = current.getHeight() if symmetry[0] else width
+        current.setOrientation(a6engine.IDENTITY,stored)
+        current.setBytes(a6engine.fuse(current.getBytes(),stored,len(current)//stored,
+                                       symmetry,points))
+        current.setOrientation(a6engine.IDENTITY,width)
+
     def _drawHBar(self, row, pixel):
         """
         Draws a horizontal bar on the current image at the given row.
@@ -254,10 +585,7 @@ class Filter(a6editor.Editor):
         Precondition: pixel is a 3-element tuple (r,b,g) of ints in 0..255
         """
         current = self.getCurrent()
-        for col in range(current.getWidth()):
-            current.setPixel(row,   col, pixel)
-            current.setPixel(row+1, col, pixel)
-            current.setPixel(row+2, col, pixel)
+        current.fillRect(row,0,3,current.getWidth(),pixel)
 
     def _drawVBar(self, col, pixel):
         """
@@ -275,8 +603,132 @@ class Filter(a6editor.Editor):
         Precondition: pixel is a 3-element tuple (r,b,g) of ints in 0..255
         """
         current = self.getCurrent()
-        for row in range(current.getHeight()):
-            current.setPixel(row,   col, pixel)
-            current.setPixel(row, col+1, pixel)
-            current.setPixel(row, col+2, pixel)
-            current.setPixel(row, col+3, pixel)
+        current.fillRect(0,col,current.getHeight(),4,pixel)
+
+
+class Pipeline(object):
+    """
+    A lazy sequence of actions for a Filter.
+
+    Calling an action on a pipeline (such as invert or transpose) does not
+    change any image. It only adds the action to the pipeline and returns
+    the pipeline, so actions can be chained:
+
+        editor.pipeline().invert().monochromify(True).rotateRight().vignette().apply()
+
+    The actions run when the result is needed, which is when apply is
+    called. They then run as a single edit of the Filter, with the
+    consecutive geometric and color actions fused (see Filter.chain). So a
+    chain of five actions makes one edit in the history, and usually one
+    pass over the image, instead of five of each.
+    """
+    __slots__ = ('_editor', '_actions')
+    # HIDDEN ATTRIBUTES
+    # Attribute _editor: The filter to apply the actions to
+    # Invariant: _editor is a Filter object
+    #
+    # Attribute _actions: The actions added since the last apply
+    # Invariant: _actions is a list of [name, args] lists
+
+    def __init__(self, editor):
+        """
+        Initializes an empty pipeline for the given filter.
+
+        Parameter editor: The filter to apply the actions to
+        Precondition: editor is a Filter object
+        """
+        assert isinstance(editor,Filter), repr(editor)+' is not a Filter'
+        self._editor  = editor
+        self._actions = []
+
+    def __len__(self):
+        """
+        Returns the number of actions waiting in this pipeline.
+        """
+        return len(self._actions)
+
+    def getActions(self):
+        """
+        Returns a copy of the actions waiting in this pipeline.
+
+        The actions have the format of Editor.getRecipe.
+        """
+        return [[name,list(args)] for (name, args) in self._actions]
+
+    def apply(self):
+        """
+        Applies the waiting actions to the filter as one edit, and empties the pipeline.
+
+        The edit is made with perform (the action is chain), so it is part of
+        the recipe. If there are no waiting actions, this method does nothing.
+        """
+        if self._actions:
+            actions = self.getActions()
+            self._actions = []
+            self._editor.perform('chain',actions)
+
+    def invert(self):
+        """
+        Returns this pipeline after adding Filter.invert.
+        """
+        return self._add('invert')
+
+    def monochromify(self, sepia):
+        """
+        Returns this pipeline after adding Filter.monochromify.
+
+        Parameter sepia: Whether to use sepia tone instead of greyscale.
+        Precondition: sepia is a bool
+        """
+        assert isinstance(sepia,bool), repr(sepia)+' is not a bool'
+        return self._add('monochromify',sepia)
+
+    def vignette(self):
+        """
+        Returns this pipeline after adding Filter.vignette.
+        """
+        return self._add('vignette')
+
+    def transpose(self):
+        """
+        Returns this pipeline after adding Filter.transpose.
+        """
+        return self._add('transpose')
+
+    def reflectHori(self):
+        """
+        Returns this pipeline after adding Filter.reflectHori.
+        """
+        return self._add('reflectHori')
+
+    def reflectVert(self):
+        """
+        Returns this pipeline after adding Filter.reflectVert.
+        """
+        return self._add('reflectVert')
+
+    def rotateLeft(self):
+        """
+        Returns this pipeline after adding Filter.rotateLeft.
+        """
+        return self._add('rotateLeft')
+
+    def rotateRight(self):
+        """
+        Returns this pipeline after adding Filter.rotateRight.
+        """
+        return self._add('rotateRight')
+
+    def _add(self, name, *args):
+        """
+        Returns this pipeline after adding the action name(*args).
+
+        Parameter name: The name of the action
+        Precondition: name is an action of Filter
+
+        Parameter args: The arguments of the action
+        Precondition: args are valid arguments for the action
+        """
+        self._actions.append((name,args))
+        return self
+
@@ -5,11 +5,32 @@ This modules contains a single class.
 Instances of this class support an image that can be modified.
 This is the main class needed to display images in the viewer.
 
+It also has a helper class Region for views of rectangular parts of an image.
+
 Based on an original file by Dexter Kozen (dck10) and Walker White (wmw2)
 
 Author: Yan Zhu yz2477  Aroma Dong jd778
 Date:   11/20/2019
 """
+from itertools import chain
+import a6engine
+import io
+import os
+
+# NumPy is optional. Without it, array views are plain memoryviews.
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+# The number of pixels in a tile is 2**TILE_SHIFT (see Image.getTiles). A tile
+# is a run of consecutive stored pixels, so it holds whole rows (or one piece
+# of a row), not a block. An edit of a few rows dirties a few tiles, but an
+# edit of a column, or of a border (such as jail), dirties every tile.
+TILE_SHIFT  = 12
+TILE_PIXELS = 1 << TILE_SHIFT
+
 
 def _is_pixel(item):
     """
@@ -49,6 +70,79 @@ def _is_pixel_list(data):
     return bool1 and bool2
 
 
+def _is_pixel_buffer(data):
+    """
+    Returns True if data is a pixel buffer, False otherwise.
+
+    A pixel buffer is a bytearray, or a writable 1-dimensional memoryview of
+    unsigned bytes, whose length is a multiple of 3. Each group of 3
+    consecutive bytes is the (r,g,b) value of one pixel, so a pixel buffer
+    stores the same information as a pixel list in 3 bytes per pixel.
+
+    Parameter data: The data to check
+    Precondition: NONE (data can be anything)
+    """
+    if type(data) == memoryview:
+        if data.format != 'B' or data.ndim != 1 or data.readonly:
+            return False
+    elif type(data) != bytearray:
+        return False
+    return len(data) % 3 == 0
+
+
+def _is_pixel_run(data, size):
+    """
+    Returns True if data is a pixel list of exactly size pixels.
+
+    This is the same test as _is_pixel_list, but it is written with builtin
+    functions (map, set, min and max) instead of a loop calling _is_pixel.
+    That makes it fast enough to check whole rows and columns.
+
+    Parameter data: The data to check
+    Precondition: NONE (data can be anything)
+
+    Parameter size: The expected number of pixels
+    Precondition: size is an int >= 0
+    """
+    if type(data) != list or len(data) != size:
+        return False
+    if size == 0:
+        return True
+    if set(map(type,data)) != {tuple} or set(map(len,data)) != {3}:
+        return False
+    if set(map(type,chain.from_iterable(data))) != {int}:
+        return False
+    values = set(chain.from_iterable(data))
+    return min(values) >= 0 and max(values) <= 255
+
+
+def _tile_flags(size):
+    """
+    Returns a bytearray of zeros with one byte for each tile of size pixels.
+
+    Parameter size: The number of pixels
+    Precondition: size is an int >= 0
+    """
+    return bytearray((size+TILE_PIXELS-1) >> TILE_SHIFT)
+
+
+def split_tiles(data):
+    """
+    Returns the packed pixels data divided into tiles, without copying them.
+
+    The result is like Image.getTiles for an image that stores data, except
+    that the tiles are read-only memoryviews of data instead of copies. So
+    they only stay the same while data does. This is for data that is never
+    written, such as a file mapped for reading (see a6session).
+
+    Parameter data: The stored pixels in packed form (see getBytes)
+    Precondition: data is a bytes-like object with 3 bytes per pixel
+    """
+    view = memoryview(data).toreadonly()
+    step = 3*TILE_PIXELS
+    return tuple(view[pos:pos+step] for pos in range(0,len(view),step))
+
+
 # TASK 1: IMPLEMENT THIS CLASS
 class Image(object):
     """
@@ -78,10 +172,50 @@ class Image(object):
 
      These operations are used by the greyscale filters and
      the stenography methods.
+
+    An image can store its pixels in one of two ways. By default, the data
+    is a pixel list: a Python list of 3-element tuples. This is convenient,
+    but every pixel costs a list slot plus a tuple object (over 70 bytes),
+    so large photos take gigabytes of memory. Alternatively, the data can be
+    a pixel buffer: a bytearray holding the (r,g,b) bytes of each pixel one
+    after the other (3 bytes per pixel). We say that such an image is
+    packed. Packed images still take and return tuples in every method, so
+    code using an Image does not need to know which storage it has.
+
+    The 1-dimensional and 2-dimensional access methods are called once per
+    pixel, so their precondition checks can cost more than the access itself.
+    In release mode (see setRelease) these four methods skip their checks.
+    All other methods enforce their preconditions in either mode.
+
+    For the edit history, the pixels are also divided into tiles of
+    TILE_PIXELS pixels each. An image remembers which tiles it has written
+    since the last call to getTiles or setTiles. So a snapshot of the image
+    only has to copy the tiles that changed, and can share the rest with
+    the previous snapshot.
+
+    An image also has an orientation: one of the 8 symmetries of a rectangle
+    (see a6engine.GEOMETRY). The pixels are stored as they were before the
+    symmetry, and every method applies it when it reads or writes them. So
+    transposing, reflecting or rotating an image (with transform) takes
+    constant time, and transforms compose. The methods that access single
+    pixels translate the position. The bulk methods that only read (such as
+    getBytes, getRow, getColumn and toPIL) return the oriented pixels
+    without changing the storage. The bulk methods that write, such as
+    setRow and fillRect, and asArray first move the pixels to match the
+    orientation (see materialize). None of this is visible, except in the
+    tiles, which are tiles of the stored pixels (see getTiles).
     """
+    # Images have a fixed set of attributes, so they do not need a __dict__
+    __slots__ = ('_data', '_packed', '_width', '_height', '_dirty', '_shared', '_orient',
+                 '_affine')
+
     # IMMUTABLE ATTRIBUTES (Fixed after initialization)
-    # Attribute _data: The underlying list of pixels
-    # Invariant: _data is a pixel list (see _is_pixel_list)
+    # Attribute _data: The underlying pixel storage
+    # Invariant: _data is a pixel list (see _is_pixel_list) or a pixel
+    # buffer (see _is_pixel_buffer)
+    #
+    # Attribute _packed: Whether the pixels are stored in a pixel buffer
+    # Invariant: _packed is True if _data is a pixel buffer, False otherwise
     #
     # MUTABLE ATTRIBUTES (Can be changed at any time, via the setters)
     # Attribute _width:  The image width, which is the number of columns
@@ -93,6 +227,23 @@ class Image(object):
     # height = 0 only if len(_data) = 0
     # Note that if you change width, you must change height
     #(to satisfy the invariant)
+    #
+    # Attribute _dirty: The tiles written since the last getTiles or setTiles
+    # Invariant: _dirty is a bytearray with one byte for each tile, which is
+    # 1 if the tile may have been written and 0 otherwise
+    #
+    # Attribute _shared: Whether the pixels can be written outside the image
+    # Invariant: _shared is a bool, True once an array view was created
+    #
+    # Attribute _orient: The symmetry applied to the stored pixels
+    # Invariant: _orient is None (the identity) or a triple of bools (see
+    # a6engine.GEOMETRY) other than the identity. If it transposes, the data
+    # is stored with width _height and height _width.
+    #
+    # Attribute _affine: The stored position of a pixel, as a linear function
+    # Invariant: _affine is None if _orient is None. Otherwise it is a triple
+    # (offset, rowstep, colstep) such that the pixel at (row, col) is stored
+    # at offset+row*rowstep+col*colstep.
 
     # PART A
     # GETTERS AND SETTERS
@@ -102,9 +253,47 @@ class Image(object):
 
         The image data is a 1-dimensional list of 3-element tuples.  The list
         returned by this method is a copy of the one managed by this object.
+        This is true even if the image is packed.
         """
+        if self._packed:
+            values = iter(self.getBytes() if self._orient else self._data)
+            return list(zip(values,values,values))
+        if self._orient:
+            return self._permute(self._data)
         return self._data.copy()
 
+    def getBytes(self):
+        """
+        Returns a COPY of the image data in packed form.
+
+        The packed form is a bytes object with the 3 bytes (r,g,b) of each
+        pixel, in the same order as getData. This works whether or not this
+        image is packed, and is the form used by the whole-image filters in
+        a6engine.
+        """
+        if self._orient:
+            if self._packed:
+                return a6engine.orient(self._data,*self._stored(),self._orient)
+            return bytes(chain.from_iterable(self._permute(self._data)))
+        return self._getSpan(0,len(self))
+
+    def setBytes(self, data):
+        """
+        Replaces every pixel of this image with the given packed pixels.
+
+        The image keeps its storage and its dimensions. A packed image writes
+        the bytes into its existing buffer, so any array views see the new
+        pixels. An image with a pixel list gets new tuples in that list. The
+        pixels are stored as given, so the orientation becomes the identity.
+
+        Parameter data: The new pixels in packed form (see getBytes)
+        Precondition: data is a bytes, bytearray or memoryview with 3 bytes
+        for each pixel in this image
+        """
+        assert type(data) in (bytes, bytearray, memoryview), repr(data)+' is not a bytes object'
+        assert memoryview(data).nbytes == 3*len(self), 'data has the wrong number of pixels'
+        self._setSpan(0,data)
+
     def getWidth(self):
         """
         Returns the image width
@@ -130,9 +319,11 @@ class Image(object):
         Precondition: value is a valid width >= 0
         """
         assert type(value)==int and value>=0
-        assert (value==0 and len(self.getData())==0) or (value>0)
-        assert (len(self.getData())/value)==int(len(self.getData())/value)
-        if len(self.getData())==0:
+        size = len(self)
+        assert (value==0 and size==0) or (value>0)
+        assert value==0 or size % value == 0
+        self.materialize()
+        if size==0:
             if value==0:
                 self._width=value
             else:
@@ -140,7 +331,7 @@ class Image(object):
                 self._height=0
         else:
             self._width=value
-            self._height=(int(len(self.getData())/value))
+            self._height=size//value
 
     def getHeight(self):
         """
@@ -167,9 +358,11 @@ class Image(object):
         Precondition: value is a valid height >= 0
         """
         assert type(value)==int and value>=0
-        assert (value==0 and len(self.getData())==0) or (value>0)
-        assert (len(self.getData())/value)==int(len(self.getData())/value)
-        if len(self.getData())==0:
+        size = len(self)
+        assert (value==0 and size==0) or (value>0)
+        assert value==0 or size % value == 0
+        self.materialize()
+        if size==0:
             if value==0:
                 self._height=value
             else:
@@ -177,12 +370,123 @@ class Image(object):
                 self._width=0
         else:
             self._height=value
-            self._width=(int(len(self.getData())/value))
+            self._width=size//value
+
+    def isPacked(self):
+        """
+        Returns True if this image stores its pixels in a pixel buffer.
+
+        A packed image keeps its pixels in a bytearray (3 bytes per pixel)
+        instead of a list of tuples. See _is_pixel_buffer.
+        """
+        return self._packed
+
+    def reshape(self, width, height):
+        """
+        Sets the image width and height at the same time.
+
+        This is the same as setWidth(width), except that it also checks that
+        the height comes out as expected. Like the other setters, it takes
+        constant time; no pixels are moved or copied.
+
+        Parameter width: the new width value
+        Precondition: width is an int >= 0
+
+        Parameter height: the new height value
+        Precondition: height is an int >= 0 and width*height is the number
+        of pixels in the image
+        """
+        assert type(width)==int and width>=0
+        assert type(height)==int and height>=0
+        assert width*height==len(self), repr((width,height))+' does not match the image size'
+        if self._orient and width != self._width:
+            self.materialize()
+        self._width=width
+        self._height=height
+
+    # ORIENTATION
+    def getOrientation(self):
+        """
+        Returns the symmetry applied to the stored pixels of this image.
+
+        The result is a triple of bools (see a6engine.GEOMETRY). It is the
+        identity (a6engine.IDENTITY) unless the image was transformed.
+        """
+        return a6engine.IDENTITY if self._orient is None else self._orient
+
+    def setOrientation(self, symmetry, width):
+        """
+        Reinterprets the stored pixels with the given symmetry and width.
+
+        No pixels are moved. The stored pixels (as in getTiles) stay the same,
+        but the image now shows them with the given symmetry applied, and has
+        the given width. This is used to restore the tiles of an image along
+        with its orientation and width.
+
+        Parameter symmetry: The symmetry to apply to the stored pixels
+        Precondition: symmetry is a triple of bools (see a6engine.GEOMETRY)
+
+        Parameter width: The width of the image after the symmetry
+        Precondition: width is an int > 0 that evenly divides the number of
+        pixels
+        """
+        assert type(symmetry) == tuple and len(symmetry) == 3, repr(symmetry)+' is not a symmetry'
+        assert all(type(flag) == bool for flag in symmetry), repr(symmetry)+' is not a symmetry'
+        assert type(width)==int and width>0 and len(self) % width == 0, repr(width)+' is not a valid width'
+        self._width  = width
+        self._height = len(self)//width
+        self._reorient(symmetry)
+
+    def transform(self, symmetry):
+        """
+        Applies the given symmetry to this image, in constant time.
+
+        The symmetries are the geometric filters (see a6engine.GEOMETRY), so
+        transform(a6engine.GEOMETRY['transpose']) transposes the image. No
+        pixels are moved; the symmetry is composed with the orientation of
+        this image. If the symmetry transposes, the width and height swap.
+
+        An image with an array view (see asArray) moves its pixels right
+        away, so that the view sees the change.
+
+        Parameter symmetry: The symmetry to apply
+        Precondition: symmetry is a triple of bools (see a6engine.GEOMETRY)
+        """
+        assert type(symmetry) == tuple and len(symmetry) == 3, repr(symmetry)+' is not a symmetry'
+        assert all(type(flag) == bool for flag in symmetry), repr(symmetry)+' is not a symmetry'
+        if symmetry == a6engine.IDENTITY:
+            return
+        if len(self) == 0:
+            if symmetry[0]:
+                self._width, self._height = self._height, self._width
+            return
+        width = self._height if symmetry[0] else self._width
+        self.setOrientation(a6engine.compose(self.getOrientation(),symmetry),width)
+        if self._shared:
+            self.materialize()
+
+    def materialize(self):
+        """
+        Moves the pixels of this image so that its orientation is the identity.
+
+        Nothing visible changes, but afterwards the stored pixels are the
+        pixels of the image. This takes one pass over the image, and does
+        nothing if the orientation is already the identity. The methods that
+        need the stored pixels in order call this method themselves.
+        """
+        if self._orient is None:
+            return
+        if self._packed:
+            self._data[:] = a6engine.orient(self._data,*self._stored(),self._orient)
+        else:
+            self._data[:] = self._permute(self._data)
+        self._reorient(a6engine.IDENTITY)
+        self._touch(0,len(self))
 
     # INITIALIZER
     def __init__(self, data, width):
         """
-        Initializes an Image from the given pixel list.
+        Initializes an Image from the given pixel list or pixel buffer.
 
         A pixel list is a 1-dimensional list of pixels where a pixel is a
         tuple of 3 ints in the range 0..255. The pixel list contains the
@@ -190,6 +494,10 @@ class Image(object):
         That happens elsewhere in the application (in code that you did not
         write).
 
+        The data may also be a pixel buffer: a bytearray (or memoryview) with
+        the 3 bytes (r,g,b) of each pixel in order. In that case the image is
+        packed.
+
         However, in order to be valid, the width  must evenly divide the
         number of pixels in the image. So if the pixel list has 10 pixels, a
         valid width is 1, 2, 5, or 10.
@@ -201,19 +509,23 @@ class Image(object):
         does not copy it. So changes to the image will change the data
         parameter as well.
 
-        Parameter data: The image data as a pixel list
-        Precondition: data is a pixel list
+        Parameter data: The image data as a pixel list or pixel buffer
+        Precondition: data is a pixel list or a pixel buffer
 
         Parameter width: The image width
         Precondition: width is an int > 0 and evenly
         divides the length of pixels
         """
-        assert _is_pixel_list(data)
+        assert _is_pixel_buffer(data) or _is_pixel_list(data)
         assert type(width)==int and width>0
-        assert (len(data)/width)==int(len(data)/width)
         self._data=data
-        self.setWidth(width)
-        self.setHeight(int(len(self.getData())/self.getWidth()))
+        self._packed=type(data)!=list
+        self._orient=None
+        self._affine=None
+        assert (len(self)/width)==int(len(self)/width)
+        self.reshape(width,len(self)//width)
+        self._dirty=_tile_flags(len(self))
+        self._shared=False
 
     # PART B
     # OPERATOR OVERLOADING
@@ -223,6 +535,8 @@ class Image(object):
 
         This special method supports the built-in len function.
         """
+        if self._packed:
+            return len(self._data)//3
         return len(self._data)
 
     def __getitem__(self, pos):
@@ -243,8 +557,22 @@ class Image(object):
         in the pixel list.
         """
         assert type(pos)==int and pos>=0
-        assert pos<len(self._data)
-        return self._data[pos]
+        assert pos<self._width*self._height
+        return self._get(pos)
+
+    def __iter__(self):
+        """
+        Returns an iterator over the pixels of this image.
+
+        This special method supports for-loops over an image. The pixels are
+        produced in the same order as the pixel list.
+        """
+        if self._orient:
+            return iter(self.getData())
+        if self._packed:
+            values = iter(self._data)
+            return zip(values,values,values)
+        return iter(self._data)
 
     def __setitem__(self, pos, pixel):
         """
@@ -261,9 +589,9 @@ class Image(object):
         Precondition: pixel is a 3-element tuple (r,g,b) of ints in 0..255
         """
         assert type(pos)==int and pos>=0
-        assert pos<len(self._data)
+        assert pos<self._width*self._height
         assert _is_pixel(pixel)
-        self._data[pos]=pixel
+        self._set(pos,pixel)
 
     # PART C
     # TWO-DIMENSIONAL ACCESS METHODS
@@ -284,7 +612,7 @@ class Image(object):
         """
         assert type(row)==int and row>=0 and row<self.getHeight()
         assert type(col)==int and col>=0 and col<self.getWidth()
-        return self[row*self.getWidth()+col]
+        return self._getPixel(row,col)
 
     def setPixel(self, row, col, pixel):
         """
@@ -305,7 +633,133 @@ class Image(object):
         assert type(row)==int and row>=0 and row<self.getHeight()
         assert type(col)==int and col>=0 and col<self.getWidth()
         assert _is_pixel(pixel)
-        self[row*self.getWidth()+col]=pixel
+        self._setPixel(row,col,pixel)
+
+    # ROW AND COLUMN ACCESS METHODS
+    def getRow(self, row):
+        """
+        Returns a list of the pixels in the given row, from left to right.
+
+        Parameter row: The pixel row
+        Precondition: row is an int >= 0 and < height
+        """
+        assert type(row)==int and row>=0 and row<self.getHeight()
+        if self._orient:
+            offset, rowstep, colstep = self._affine
+            values = iter(self._getRun(offset+row*rowstep,colstep,self._width))
+            return list(zip(values,values,values))
+        start = row*self._width
+        if self._packed:
+            values = iter(self._data[3*start:3*(start+self._width)])
+            return list(zip(values,values,values))
+        return self._data[start:start+self._width]
+
+    def setRow(self, row, pixels):
+        """
+        Sets the pixels of the given row, from left to right.
+
+        Parameter row: The pixel row
+        Precondition: row is an int >= 0 and < height
+
+        Parameter pixels: The new pixels of the row
+        Precondition: pixels is a pixel list with width pixels
+        """
+        assert type(row)==int and row>=0 and row<self.getHeight()
+        assert _is_pixel_run(pixels,self._width), repr(pixels)+' is not a row of pixels'
+        self.materialize()
+        start = row*self._width
+        self._touch(start,start+self._width)
+        if self._packed:
+            self._data[3*start:3*(start+self._width)] = bytes(chain.from_iterable(pixels))
+        else:
+            self._data[start:start+self._width] = pixels
+
+    def getColumn(self, col):
+        """
+        Returns a list of the pixels in the given column, from top to bottom.
+
+        Parameter col: The pixel column
+        Precondition: col is an int >= 0 and < width
+        """
+        assert type(col)==int and col>=0 and col<self.getWidth()
+        if self._orient:
+            offset, rowstep, colstep = self._affine
+            values = iter(self._getRun(offset+col*colstep,rowstep,self._height))
+            return list(zip(values,values,values))
+        if self._packed:
+            step = 3*self._width
+            return list(zip(self._data[3*col::step],self._data[3*col+1::step],
+                            self._data[3*col+2::step]))
+        return self._data[col::self._width]
+
+    def setColumn(self, col, pixels):
+        """
+        Sets the pixels of the given column, from top to bottom.
+
+        Parameter col: The pixel column
+        Precondition: col is an int >= 0 and < width
+
+        Parameter pixels: The new pixels of the column
+        Precondition: pixels is a pixel list with height pixels
+        """
+        assert type(col)==int and col>=0 and col<self.getWidth()
+        assert _is_pixel_run(pixels,self._height), repr(pixels)+' is not a column of pixels'
+        self.materialize()
+        self._touch(col,len(self))
+        if self._packed:
+            step = 3*self._width
+            values = bytes(chain.from_iterable(pixels))
+            for ii in range(3):
+                self._data[3*col+ii::step] = values[ii::3]
+        else:
+            self._data[col::self._width] = pixels
+
+    def fillRect(self, row, col, height, width, pixel):
+        """
+        Sets every pixel in a rectangle of this image to the given pixel.
+
+        The rectangle has the given height and width, and its top left pixel
+        is at (row, col).
+
+        Parameter row: The top row of the rectangle
+        Precondition: row is an int >= 0
+
+        Parameter col: The left column of the rectangle
+        Precondition: col is an int >= 0
+
+        Parameter height: The number of rows in the rectangle
+        Precondition: height is an int >= 0 and row+height <= image height
+
+        Parameter width: The number of columns in the rectangle
+        Precondition: width is an int >= 0 and col+width <= image width
+
+        Parameter pixel: The pixel value
+        Precondition: pixel is a 3-element tuple (r,g,b) of ints in 0..255
+        """
+        assert type(row)==int and row>=0, repr(row)+' is not a valid row'
+        assert type(col)==int and col>=0, repr(col)+' is not a valid column'
+        assert type(height)==int and height>=0 and row+height<=self.getHeight()
+        assert type(width)==int and width>=0 and col+width<=self.getWidth()
+        assert _is_pixel(pixel)
+        if width == 0 or height == 0:
+            return
+
+        self.materialize()
+        start = row*self._width+col
+        stop  = (row+height-1)*self._width+col+width
+        if width == self._width:
+            # The rectangle is one contiguous run of pixels
+            self._setSpan(start,bytes(pixel)*(stop-start))
+        elif self._packed and width < height:
+            # Tall rectangles are filled a column (and channel) at a time
+            self._touch(start,stop)
+            step = 3*self._width
+            for pos in range(3*start,3*(start+width)):
+                self._data[pos:3*stop:step] = bytes([pixel[pos % 3]])*height
+        else:
+            run = bytes(pixel)*width
+            for pos in range(start,stop,self._width):
+                self._setSpan(pos,run)
 
     # PART D
     def __str__(self):
@@ -339,18 +793,41 @@ class Image(object):
         but you need to handle the commas between pixels and the
         newlines between rows.
         """
-        m=self.getHeight()
-        n=self.getWidth()
-        c=''
-        for i in range(m):
-            a=''
-            for j in range(n):
-                a=a+', '+str(self.getPixel(i,j))
-            b=',\n['+a[2:]+']'
-            c=c+b
-        d=c[2:]
-        result='['+d+']'
-        return result
+        # Building the string with + copies it for every pixel (quadratic time)
+        buffer = io.StringIO()
+        self.dump(buffer)
+        return buffer.getvalue()
+
+    def dump(self, stream, rows=None):
+        """
+        Writes the string representation of this image to stream.
+
+        This writes the same text as str(image), but one row at a time, so
+        the whole string is never in memory at once. This makes it possible
+        to log (and diff) the text of very large images.
+
+        If rows is not None, only those rows are written, in the order given.
+        The text is still a 2D list, with one row per line. For example,
+        image.dump(sys.stdout,range(10,20)) prints rows 10 to 19.
+
+        Parameter stream: The file to write to
+        Precondition: stream is a text file object open for writing (or
+        any object with a write method taking strings)
+
+        Parameter rows: The rows to write, or None for all rows
+        Precondition: rows is None or an iterable of ints >= 0 and < height
+        """
+        if rows is None:
+            rows = range(self.getHeight())
+        stream.write('[')
+        first = True
+        for row in rows:
+            assert type(row)==int and row>=0 and row<self.getHeight(), repr(row)+' is not a valid row'
+            if not first:
+                stream.write(',\n')
+            stream.write('['+', '.join(map(str,self.getRow(row)))+']')
+            first = False
+        stream.write(']')
 
 
     # ADDITIONAL METHODS
@@ -377,11 +854,826 @@ class Image(object):
         self.setPixel(row1,col1,pixel2)
         self.setPixel(row2,col2,pixel1)
 
-    def copy(self):
+    def copy(self, packed=None):
         """
         Returns a copy of this image object.
 
         The underlying pixel data must be copied (e.g. the copy cannot refer
         to the same list of pixels that this object does).
+
+        By default the copy uses the same storage as this image. Passing a
+        bool for packed converts the copy to (or from) a pixel buffer.
+
+        Parameter packed: Whether the copy is packed (None to keep storage)
+        Precondition: packed is a bool or None
+        """
+        assert packed is None or type(packed)==bool, repr(packed)+' is not a bool'
+        if packed is None:
+            packed = self._packed
+        if not packed:
+            return Image(self.getData(), self.getWidth())
+        if self._packed or self._orient:
+            return Image(bytearray(self.getBytes()), self.getWidth())
+        return Image(bytearray(chain.from_iterable(self._data)), self.getWidth())
+
+    def region(self, row, col, height, width):
+        """
+        Returns a view of a rectangle in this image.
+
+        The rectangle has the given height and width, and its top left pixel
+        is at (row, col). The view does not copy any pixels. Reading a pixel of
+        the view reads the pixel of this image, and setting a pixel sets it in
+        this image. See the class Region for details.
+
+        Parameter row: The top row of the rectangle
+        Precondition: row is an int >= 0
+
+        Parameter col: The left column of the rectangle
+        Precondition: col is an int >= 0
+
+        Parameter height: The number of rows in the rectangle
+        Precondition: height is an int > 0 and row+height <= image height
+
+        Parameter width: The number of columns in the rectangle
+        Precondition: width is an int > 0 and col+width <= image width
+        """
+        return Region(self,row,col,height,width)
+
+    # TILES
+    def getTiles(self, tiles=None):
+        """
+        Returns a tuple of the pixels of this image, divided into tiles.
+
+        Tile i is a bytes object with the packed pixels (see getBytes) at the
+        positions i*TILE_PIXELS up to (i+1)*TILE_PIXELS; the last tile may be
+        shorter. So a tile is a run of rows, not a block of the image: writing
+        a single column writes to every tile (see TILE_SHIFT). The result is a
+        snapshot: it does not change when the image does, and setTiles can
+        restore it.
+
+        The tiles hold the stored pixels, before the orientation is applied.
+        So transforming an image does not change its tiles. To restore an
+        image, restore its orientation and width as well (see setOrientation).
+
+        If tiles is the result of the last call to getTiles or setTiles on
+        this image, the tiles that this image has not changed since then are
+        reused from it instead of copied. So this method takes time for each
+        tile, but only copies the tiles that were written. Writes to the data
+        given to the initializer made outside this image are not seen.
+
+        Parameter tiles: The previous tiles of this image (or None)
+        Precondition: tiles is None or the tuple returned by the last call to
+        getTiles or setTiles
+        """
+        if tiles is None:
+            search = range(len(self._dirty))
+            result = [None]*len(self._dirty)
+        elif self._shared:
+            search = range(len(self._dirty))
+            result = list(tiles)
+        else:
+            search = []
+            result = list(tiles)
+            pos = self._dirty.find(1)
+            while pos != -1:
+                search.append(pos)
+                pos = self._dirty.find(1,pos+1)
+
+        size = len(self)
+        for ii in search:
+            start = ii << TILE_SHIFT
+            tile  = self._getStored(start,min(TILE_PIXELS,size-start))
+            if tile != result[ii]:
+                result[ii] = tile
+        self._dirty[:] = bytes(len(self._dirty))
+        return tuple(result)
+
+    def setTiles(self, tiles, current=None):
+        """
+        Replaces every pixel of this image with the given tiles.
+
+        The image keeps its storage, its dimensions and its orientation. The
+        tiles are the stored pixels (see getTiles), so the orientation is
+        applied to them. If current is the result of the last call to
+        getTiles or setTiles on this image, only the tiles that differ from
+        it (or that this image has changed since) are written.
+
+        Parameter tiles: The new pixels, as returned by getTiles
+        Precondition: tiles is a tuple of tiles for an image of this length
+
+        Parameter current: The previous tiles of this image (or None)
+        Precondition: current is None or the tuple returned by the last call
+        to getTiles or setTiles
+        """
+        assert type(tiles) == tuple and len(tiles) == len(self._dirty), 'tiles do not match the image'
+        if current is None or self._shared:
+            self._setStored(0,b''.join(tiles))
+        else:
+            dirty = self._dirty
+            for ii in range(len(tiles)):
+                if dirty[ii] or not tiles[ii] is current[ii]:
+                    self._setStored(ii << TILE_SHIFT,tiles[ii])
+        self._dirty[:] = bytes(len(self._dirty))
+
+    # TRUSTED CONSTRUCTORS
+    @classmethod
+    def fromBytes(cls, data, width):
+        """
+        Returns a packed image for the given packed pixels.
+
+        This is a fast alternative to the initializer for data from a trusted
+        source, such as an image file. It does not look at the pixels at all,
+        so it takes the same time for any size of image. Call validate on the
+        result if you want to check it anyway.
+
+        A bytearray or memoryview is used as the pixel buffer directly, so the
+        image shares it (like the initializer). A bytes object is immutable,
+        so it is copied into a new bytearray.
+
+        Parameter data: The image data in packed form (see getBytes)
+        Precondition: data is a bytes, bytearray or writable memoryview with
+        3 bytes per pixel
+
+        Parameter width: The image width
+        Precondition: width is an int > 0 and evenly divides the number of
+        pixels
+        """
+        if type(data) == bytes:
+            data = bytearray(data)
+        result = cls.__new__(cls)
+        result._data   = data
+        result._packed = True
+        result._width  = width
+        result._height = len(data)//(3*width)
+        result._dirty  = _tile_flags(result._width*result._height)
+        result._shared = False
+        result._orient = None
+        result._affine = None
+        return result
+
+    @classmethod
+    def fromPIL(cls, image):
+        """
+        Returns a packed image with the pixels of the given PIL image.
+
+        The image is converted to RGB first if necessary (dropping any alpha
+        channel). This uses fromBytes, so the pixels are not validated.
+
+        Parameter image: The image to convert
+        Precondition: image is a PIL.Image.Image object
+        """
+        if image.mode != 'RGB':
+            image = image.convert('RGB')
+        return cls.fromBytes(image.tobytes(),image.size[0])
+
+    def toPIL(self):
+        """
+        Returns a new PIL image with the pixels of this image.
+
+        The PIL image is in RGB mode. It is a copy, so changing it does not
+        affect this image.
+        """
+        from PIL import Image as CoreImage
+        return CoreImage.frombytes('RGB',(self.getWidth(),self.getHeight()),self.getBytes())
+
+    def validate(self):
+        """
+        Checks that this image satisfies all of its invariants.
+
+        This is the check that the initializer makes (and that fromBytes
+        skips). It is linear in the number of pixels for images with a pixel
+        list, but constant time for packed images, whose bytes are always
+        valid colors.
+
+        This method raises an AssertionError if the image is invalid.
+        """
+        assert _is_pixel_buffer(self._data) if self._packed else _is_pixel_list(self._data)
+        assert type(self._width) == int and type(self._height) == int
+        assert self._width*self._height == len(self), 'width and height do not match the data'
+
+    # HIDDEN METHODS
+    # The unchecked versions of the hot accessors (used in release mode)
+    def _get(self, pos):
+        """
+        Returns the pixel at the given position, without checking pos.
+
+        Parameter pos: The position in the pixel list
+        Precondition: pos is an int and a valid position >= 0
+        """
+        if self._orient:
+            pos = self._locate(*divmod(pos,self._width))
+        if self._packed:
+            data = self._data
+            pos  = 3*pos
+            return (data[pos],data[pos+1],data[pos+2])
+        return self._data[pos]
+
+    def _set(self, pos, pixel):
+        """
+        Sets the pixel at the given position, without checking pos or pixel.
+
+        Parameter pos: The position in the pixel list
+        Precondition: pos is an int and a valid position >= 0
+
+        Parameter pixel: The pixel value
+        Precondition: pixel is a 3-element tuple (r,g,b) of ints in 0..255
+        """
+        if self._orient:
+            pos = self._locate(*divmod(pos,self._width))
+        self._dirty[pos >> TILE_SHIFT] = 1
+        if self._packed:
+            data = self._data
+            pos  = 3*pos
+            data[pos],data[pos+1],data[pos+2] = pixel
+        else:
+            self._data[pos]=pixel
+
+    def _getPixel(self, row, col):
+        """
+        Returns the pixel value at (row, col), without checking row or col.
+
+        Parameter row: The pixel row
+        Precondition: row is an int >= 0 and < height
+
+        Parameter col: The pixel column
+        Precondition: col is an int >= 0 and < width
         """
-        return Image(self.getData(), self.getWidth())
+        pos = self._locate(row,col) if self._orient else row*self._width+col
+        if self._packed:
+            data = self._data
+            pos  = 3*pos
+            return (data[pos],data[pos+1],data[pos+2])
+        return self._data[pos]
+
+    def _setPixel(self, row, col, pixel):
+        """
+        Sets the pixel value at (row, col), without checking any arguments.
+
+        Parameter row: The pixel row
+        Precondition: row is an int >= 0 and < height
+
+        Parameter col: The pixel column
+        Precondition: col is an int >= 0 and < width
+
+        Parameter pixel: The pixel value
+        Precondition: pixel is a 3-element tuple (r,g,b) of ints in 0..255
+        """
+        pos = self._locate(row,col) if self._orient else row*self._width+col
+        self._dirty[pos >> TILE_SHIFT] = 1
+        if self._packed:
+            data = self._data
+            pos  = 3*pos
+            data[pos],data[pos+1],data[pos+2] = pixel
+        else:
+            self._data[pos]=pixel
+
+    def _getSpan(self, pos, count):
+        """
+        Returns the packed pixels of count pixels starting at pos.
+
+        This is getBytes for a part of the 1-dimensional pixel list. It does
+        not enforce its preconditions; that is the job of the caller.
+
+        Parameter pos: The position of the first pixel
+        Precondition: pos is an int >= 0
+
+        Parameter count: The number of pixels
+        Precondition: count is an int >= 0 and pos+count <= len(self)
+        """
+        if self._orient:
+            if pos == 0 and count == len(self):
+                return self.getBytes()
+            # Read the span a row (a run of stored pixels) at a time
+            offset, rowstep, colstep = self._affine
+            parts = []
+            while count > 0:
+                row, col = divmod(pos,self._width)
+                size = min(count,self._width-col)
+                parts.append(self._getRun(offset+row*rowstep+col*colstep,colstep,size))
+                pos   += size
+                count -= size
+            return b''.join(parts)
+        return self._getStored(pos,count)
+
+    def _setSpan(self, pos, data):
+        """
+        Replaces the pixels starting at pos with the given packed pixels.
+
+        This is setBytes for a part of the 1-dimensional pixel list. It does
+        not enforce its preconditions; that is the job of the caller.
+
+        Parameter pos: The position of the first pixel
+        Precondition: pos is an int >= 0
+
+        Parameter data: The new pixels in packed form
+        Precondition: data is a bytes-like object with 3*n bytes where
+        pos+n <= len(self)
+        """
+        if self._orient:
+            if pos == 0 and memoryview(data).nbytes == 3*len(self):
+                self._reorient(a6engine.IDENTITY)   # Every pixel is replaced
+            else:
+                self.materialize()
+        self._setStored(pos,data)
+
+    def _getStored(self, pos, count):
+        """
+        Returns the packed stored pixels of count pixels starting at pos.
+
+        This is _getSpan for the stored pixels, ignoring the orientation.
+
+        Parameter pos: The position of the first stored pixel
+        Precondition: pos is an int >= 0
+
+        Parameter count: The number of pixels
+        Precondition: count is an int >= 0 and pos+count <= len(self)
+        """
+        if self._packed:
+            return bytes(self._data[3*pos:3*(pos+count)])
+        return bytes(chain.from_iterable(self._data[pos:pos+count]))
+
+    def _getRun(self, first, step, count):
+        """
+        Returns the packed stored pixels at first, first+step, first+2*step, ...
+
+        This reads a row or a column of an oriented image from the stored
+        pixels (see _locate), without moving them.
+
+        Parameter first: The position of the first stored pixel
+        Precondition: first is an int >= 0
+
+        Parameter step: The distance between the stored pixels
+        Precondition: step is a nonzero int
+
+        Parameter count: The number of pixels
+        Precondition: count is an int > 0 and first+(count-1)*step is a
+        valid position
+        """
+        if step == 1:
+            return self._getStored(first,count)
+        # Slice from the lowest position up, and reverse if step < 0
+        low  = min(first,first+(count-1)*step)
+        span = abs(step)
+        if self._packed:
+            result = bytearray(3*count)
+            for ii in range(3):
+                values = self._data[3*low+ii:3*(low+(count-1)*span)+ii+1:3*span]
+                result[ii::3] = values if step > 0 else values[::-1]
+            return bytes(result)
+        values = self._data[low:low+(count-1)*span+1:span]
+        if step < 0:
+            values.reverse()
+        return bytes(chain.from_iterable(values))
+
+    def _setStored(self, pos, data):
+        """
+        Replaces the stored pixels starting at pos with the given packed pixels.
+
+        This is _setSpan for the stored pixels, ignoring the orientation.
+
+        Parameter pos: The position of the first stored pixel
+        Precondition: pos is an int >= 0
+
+        Parameter data: The new pixels in packed form
+        Precondition: data is a bytes-like object with 3*n bytes where
+        pos+n <= len(self)
+        """
+        size = memoryview(data).nbytes
+        self._touch(pos,pos+size//3)
+        if self._packed:
+            self._data[3*pos:3*pos+size] = data
+        else:
+            values = iter(data)
+            self._data[pos:pos+size//3] = zip(values,values,values)
+
+    def _stored(self):
+        """
+        Returns the pair (width, height) of the stored pixels.
+
+        These are the width and height before the orientation is applied.
+        """
+        if self._orient and self._orient[0]:
+            return (self._height, self._width)
+        return (self._width, self._height)
+
+    def _locate(self, row, col):
+        """
+        Returns the position of the stored pixel shown at (row, col).
+
+        Parameter row: The pixel row
+        Precondition: row is an int >= 0 and < height
+
+        Parameter col: The pixel column
+        Precondition: col is an int >= 0 and < width
+        """
+        offset, rowstep, colstep = self._affine
+        return offset+row*rowstep+col*colstep
+
+    def _reorient(self, symmetry):
+        """
+        Sets the orientation of this image, without moving any pixels.
+
+        The width and height must already be those after the symmetry.
+
+        Parameter symmetry: The new orientation
+        Precondition: symmetry is a triple of bools (see a6engine.GEOMETRY)
+        """
+        if symmetry == a6engine.IDENTITY:
+            self._orient = None
+            self._affine = None
+            return
+        swap, flipRows, flipCols = symmetry
+        width, height = self._width, self._height
+        # Stored rows are the columns (swap) or rows of the image
+        rowstep, colstep = (1, height) if swap else (width, 1)
+        offset = 0
+        if flipRows:
+            offset += (height-1)*rowstep
+            rowstep = -rowstep
+        if flipCols:
+            offset += (width-1)*colstep
+            colstep = -colstep
+        self._orient = symmetry
+        self._affine = (offset, rowstep, colstep)
+
+    def _permute(self, data):
+        """
+        Returns a list of the elements of data, in the order of the orientation.
+
+        This is a6engine.orient for a pixel list: data has one element for
+        each stored pixel, and the result has them in the order they are
+        shown.
+
+        Parameter data: The stored pixels
+        Precondition: data is a list with one element per pixel
+        """
+        swap, flipRows, flipCols = self._orient
+        width = self._stored()[0]
+        if swap:
+            rows = [data[col::width] for col in range(width)]
+        else:
+            rows = [data[pos:pos+width] for pos in range(0,len(data),width)]
+        if flipRows:
+            rows.reverse()
+        if flipCols:
+            rows = [row[::-1] for row in rows]
+        return list(chain.from_iterable(rows))
+
+    def _touch(self, start, stop):
+        """
+        Marks the tiles with the pixels start..stop-1 as written.
+
+        Parameter start: The position of the first pixel
+        Precondition: start is an int >= 0
+
+        Parameter stop: The position after the last pixel
+        Precondition: stop is an int <= len(self)
+        """
+        if start < stop:
+            first = start >> TILE_SHIFT
+            last  = ((stop-1) >> TILE_SHIFT)+1
+            self._dirty[first:last] = b'\1'*(last-first)
+
+    # ARRAY ACCESS
+    @classmethod
+    def fromArray(cls, array):
+        """
+        Returns a packed image that shares memory with the given array.
+
+        The array must be an H x W x 3 array of bytes, such as a NumPy array
+        with dtype uint8. No pixels are copied: changes to the image change
+        the array, and changes to the array change the image.
+
+        Parameter array: The pixels as a height x width x 3 array
+        Precondition: array is a writable, C-contiguous buffer of unsigned
+        bytes with shape (height, width, 3) and width > 0
+        """
+        view = memoryview(array)
+        assert view.format == 'B' and view.ndim == 3, 'array is not a 3d array of bytes'
+        assert view.shape[2] == 3 and view.shape[1] > 0, repr(view.shape)+' is not a valid shape'
+        assert view.c_contiguous and not view.readonly, 'array is not a writable contiguous buffer'
+        result = cls(view.cast('B'), view.shape[1])
+        result._shared = True
+        return result
+
+    def asArray(self):
+        """
+        Returns a height x width x 3 view of the pixels in this image.
+
+        The view shares memory with this image. Writing to it changes the
+        image, so whole-array operations can replace the pixel-by-pixel
+        loops. If NumPy is installed, the view is an ndarray with dtype
+        uint8. Otherwise it is a 3-dimensional memoryview, which can still
+        be indexed as view[row,col,channel].
+
+        Only packed images can share memory this way. If this image stores
+        a pixel list, it is packed first (see pack).
+
+        Writes through the view are not seen by getTiles, so once an image
+        has a view, getTiles compares every tile to find the changed ones.
+        """
+        self.pack()
+        self.materialize()
+        self._shared = True
+        if numpy is not None:
+            view = numpy.frombuffer(self._data, dtype=numpy.uint8)
+            return view.reshape(self.getHeight(),self.getWidth(),3)
+        return memoryview(self._data).cast('B',(self.getHeight(),self.getWidth(),3))
+
+    def pack(self):
+        """
+        Converts this image to packed storage, if it is not already packed.
+
+        The pixels are moved into a new pixel buffer. Afterwards this image no
+        longer shares the pixel list given to the initializer.
+        """
+        if not self._packed:
+            self._data=bytearray(chain.from_iterable(self._data))
+            self._packed=True
+
+
+class Region(object):
+    """
+    A class for a rectangular view into an image
+
+    A region is a rectangle of pixels in an Image. It has its own rows and
+    columns, with (0,0) the top left corner of the rectangle. It supports the
+    same access methods as Image (len, [], iteration, getPixel, setPixel,
+    getBytes and setBytes), but it does not have pixels of its own. Every
+    method reads from or writes to the image, without copying. So you can
+    process part of an image, or split an image into tiles that are handled
+    separately, and the changes show up in the image itself.
+
+    Regions are created with the method region in Image. A region of a region
+    is a view into the same image.
+    """
+    # Regions have a fixed set of attributes, so they do not need a __dict__
+    __slots__ = ('_parent', '_row', '_col', '_height', '_width')
+
+    # IMMUTABLE ATTRIBUTES (Fixed after initialization)
+    # Attribute _parent: The image containing this region
+    # Invariant: _parent is an Image object
+    #
+    # Attribute _row: The row of the top left pixel in _parent
+    # Invariant: _row is an int >= 0
+    #
+    # Attribute _col: The column of the top left pixel in _parent
+    # Invariant: _col is an int >= 0
+    #
+    # Attribute _height: The number of rows in this region
+    # Invariant: _height is an int > 0, _row+_height <= _parent height
+    #
+    # Attribute _width: The number of columns in this region
+    # Invariant: _width is an int > 0, _col+_width <= _parent width
+
+    # GETTERS
+    def getParent(self):
+        """
+        Returns the image containing this region
+        """
+        return self._parent
+
+    def getOrigin(self):
+        """
+        Returns the position (row, col) of this region in its parent image
+        """
+        return (self._row,self._col)
+
+    def getWidth(self):
+        """
+        Returns the region width (the number of columns)
+        """
+        return self._width
+
+    def getHeight(self):
+        """
+        Returns the region height (the number of rows)
+        """
+        return self._height
+
+    # INITIALIZER
+    def __init__(self, parent, row, col, height, width):
+        """
+        Initializes a view of a rectangle in the image parent.
+
+        If parent is a region, the new region is a view into the image of
+        that region, with (row, col) relative to its top left corner.
+
+        Parameter parent: The image to view
+        Precondition: parent is an Image or Region object
+
+        Parameter row: The top row of the rectangle
+        Precondition: row is an int >= 0
+
+        Parameter col: The left column of the rectangle
+        Precondition: col is an int >= 0
+
+        Parameter height: The number of rows in the rectangle
+        Precondition: height is an int > 0 and row+height <= parent height
+
+        Parameter width: The number of columns in the rectangle
+        Precondition: width is an int > 0 and col+width <= parent width
+        """
+        assert isinstance(parent,(Image,Region)), repr(parent)+' is not an image'
+        assert type(row)==int and row>=0, repr(row)+' is not a valid row'
+        assert type(col)==int and col>=0, repr(col)+' is not a valid column'
+        assert type(height)==int and height>0 and row+height<=parent.getHeight()
+        assert type(width)==int and width>0 and col+width<=parent.getWidth()
+        if isinstance(parent,Region):
+            row += parent._row
+            col += parent._col
+            parent = parent._parent
+        self._parent = parent
+        self._row = row
+        self._col = col
+        self._height = height
+        self._width  = width
+
+    # OPERATOR OVERLOADING
+    def __len__(self):
+        """
+        Returns the number of pixels in this region
+        """
+        return self._width*self._height
+
+    def __getitem__(self, pos):
+        """
+        Returns the pixel at the given position in this region.
+
+        The positions are in row-major order, as for an image with the width
+        and height of this region.
+
+        Parameter pos: The position in the region
+        Precondition: pos is an int and a valid position >= 0 in the region
+        """
+        assert type(pos)==int and pos>=0 and pos<len(self)
+        return self.getPixel(pos // self._width, pos % self._width)
+
+    def __setitem__(self, pos, pixel):
+        """
+        Sets the pixel at the given position in this region.
+
+        Parameter pos: The position in the region
+        Precondition: pos is an int and a valid position >= 0 in the region
+
+        Parameter pixel: The pixel value
+        Precondition: pixel is a 3-element tuple (r,g,b) of ints in 0..255
+        """
+        assert type(pos)==int and pos>=0 and pos<len(self)
+        self.setPixel(pos // self._width, pos % self._width, pixel)
+
+    def __iter__(self):
+        """
+        Returns an iterator over the pixels of this region, in row-major order
+        """
+        for row in range(self._height):
+            values = iter(self._getRowBytes(row))
+            yield from zip(values,values,values)
+
+    # TWO-DIMENSIONAL ACCESS METHODS
+    def getPixel(self, row, col):
+        """
+        Returns the pixel value at (row, col) in this region
+
+        Parameter row: The pixel row
+        Precondition: row is an int >= 0 and < region height
+
+        Parameter col: The pixel column
+        Precondition: col is an int >= 0 and < region width
+        """
+        assert type(row)==int and row>=0 and row<self._height
+        assert type(col)==int and col>=0 and col<self._width
+        return self._parent.getPixel(self._row+row,self._col+col)
+
+    def setPixel(self, row, col, pixel):
+        """
+        Sets the pixel value at (row, col) in this region
+
+        Parameter row: The pixel row
+        Precondition: row is an int >= 0 and < region height
+
+        Parameter col: The pixel column
+        Precondition: col is an int >= 0 and < region width
+
+        Parameter pixel: The pixel value
+        Precondition: pixel is a 3-element tuple (r,g,b) of ints in 0..255
+        """
+        assert type(row)==int and row>=0 and row<self._height
+        assert type(col)==int and col>=0 and col<self._width
+        self._parent.setPixel(self._row+row,self._col+col,pixel)
+
+    # BULK ACCESS METHODS
+    def getBytes(self):
+        """
+        Returns a COPY of the pixels of this region in packed form.
+
+        See the method getBytes in Image.
+        """
+        return b''.join(self._getRowBytes(row) for row in range(self._height))
+
+    def setBytes(self, data):
+        """
+        Replaces every pixel of this region with the given packed pixels.
+
+        The pixels are written into the parent image, one row at a time.
+
+        Parameter data: The new pixels in packed form (see getBytes)
+        Precondition: data is a bytes, bytearray or memoryview with 3 bytes
+        for each pixel in this region
+        """
+        assert type(data) in (bytes, bytearray, memoryview), repr(data)+' is not a bytes object'
+        data = memoryview(data).cast('B')
+        assert len(data) == 3*len(self), 'data has the wrong number of pixels'
+        size  = 3*self._width
+        start = self._row*self._parent.getWidth()+self._col
+        for row in range(self._height):
+            self._parent._setSpan(start,data[row*size:(row+1)*size])
+            start += self._parent.getWidth()
+
+    def region(self, row, col, height, width):
+        """
+        Returns a view of a rectangle in this region.
+
+        See the method region in Image.
+
+        Parameter row: The top row of the rectangle
+        Precondition: row is an int >= 0
+
+        Parameter col: The left column of the rectangle
+        Precondition: col is an int >= 0
+
+        Parameter height: The number of rows in the rectangle
+        Precondition: height is an int > 0 and row+height <= region height
+
+        Parameter width: The number of columns in the rectangle
+        Precondition: width is an int > 0 and col+width <= region width
+        """
+        return Region(self,row,col,height,width)
+
+    def copy(self):
+        """
+        Returns a new (packed) Image with a copy of the pixels in this region.
+
+        This is how to crop an image. The copy does not share pixels with the
+        parent, so it can be filtered without changing the parent. Use
+        setBytes to write the result back.
+        """
+        return Image.fromBytes(self.getBytes(),self._width)
+
+    # HIDDEN METHODS
+    def _getRowBytes(self, row):
+        """
+        Returns the packed pixels of the given row of this region.
+
+        Parameter row: The region row
+        Precondition: row is an int >= 0 and < region height
+        """
+        start = (self._row+row)*self._parent.getWidth()+self._col
+        return self._parent._getSpan(start,self._width)
+
+
+# RELEASE MODE
+# The methods of Image that check their preconditions on every pixel access,
+# paired with the hidden methods that do the same thing without the checks.
+_CHECKED   = {name : getattr(Image,name) for name in
+              ('__getitem__', '__setitem__', 'getPixel', 'setPixel')}
+_UNCHECKED = {'__getitem__' : Image._get, '__setitem__' : Image._set,
+              'getPixel' : Image._getPixel, 'setPixel' : Image._setPixel}
+
+
+def isRelease():
+    """
+    Returns True if Image is in release mode, False if it is in debug mode.
+    """
+    return Image.__getitem__ is _UNCHECKED['__getitem__']
+
+
+def setRelease(flag):
+    """
+    Puts class Image in release mode (if flag is True) or debug mode.
+
+    In debug mode (the default) every method of Image enforces its
+    preconditions. In release mode the per-pixel methods __getitem__,
+    __setitem__, getPixel and setPixel are replaced by versions without any
+    precondition checks, which are more than twice as fast. The other
+    methods, including the initializer, setters and bulk methods, still
+    enforce their preconditions.
+
+    In release mode a bad position or pixel is not detected. It may read
+    or write the wrong pixel, or raise an error other than AssertionError.
+    So only use release mode for code that already passes its tests.
+
+    The mode applies to every Image, and is normally chosen once at startup.
+    Setting the environment variable IMAGER_RELEASE to 1 (or running the
+    application with --release) starts in release mode.
+
+    Parameter flag: Whether to use release mode
+    Precondition: flag is a bool
+    """
+    assert type(flag) == bool, repr(flag)+' is not a bool'
+    methods = _UNCHECKED if flag else _CHECKED
+    for name in methods:
+        setattr(Image,name,methods[name])
+
+
+setRelease(os.environ.get('IMAGER_RELEASE','0') not in ('','0'))
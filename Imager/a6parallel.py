@@ -0,0 +1,400 @@
+"""
+Parallel execution of the whole-image filters for the imager application.
+
+The functions in a6engine process the whole image at once, but on a single
+core, so a machine with many cores sits idle while a large image is
+filtered. This module splits an image into bands of rows and computes the
+bands at the same time in a pool of worker processes (or threads, see
+Executor):
+
+    1. The pixels are copied once into shared memory (see the module
+       multiprocessing.shared_memory), which every worker maps. No pixels
+       are pickled or sent through pipes.
+    2. Each worker computes the filter on its band, and writes the result
+       to its rows of a second block of shared memory. A neighborhood
+       filter (such as blur) also reads the rows just above and below the
+       band (the halo), so the edges of the bands match the whole image.
+    3. The second block is then the whole result, and replaces the pixels
+       of the image.
+
+Set Filter.EXECUTOR to an Executor to run the filters of a Filter this way,
+or start the application with --workers. The function compute is what a
+worker runs on its band; on the whole image (one band), it is the filter
+itself.
+
+Author: Yan Zhu yz2477  Aroma Dong jd778
+Date:   10/18/2026
+"""
+import a6engine
+import concurrent.futures
+import multiprocessing
+import multiprocessing.shared_memory
+import os
+
+
+# The filters that can be computed in bands (see compute)
+FILTERS = ('invert', 'monochromify', 'tone', 'vignette', 'pixellate', 'blur', 'convolve')
+
+# The filters that threads compute in place with the NumPy kernels (see _point)
+POINTS = ('invert', 'monochromify', 'vignette')
+
+# How the worker processes start. The GUI filters in a thread, and forking a
+# process with threads may deadlock the child, so the workers never fork.
+START = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+
+
+def compute(name, data, width, height, top, args):
+    """
+    Returns the packed pixels data with the given filter applied.
+
+    The data is a band of an image: the rows top, top+1, ... (as many as
+    data holds) of an image with the given height. For a neighborhood
+    filter, the result is only correct for the rows of the band that have
+    halo(name, args) rows of the band (or the edge of the image) on either
+    side of them.
+
+    Parameter name: The filter
+    Precondition: name is in FILTERS
+
+    Parameter data: The packed pixels of the band
+    Precondition: data is a bytes-like object with length a multiple of 3*width
+
+    Parameter width: The image width
+    Precondition: width is an int > 0
+
+    Parameter height: The image height
+    Precondition: height is an int > 0
+
+    Parameter top: The row of the image that starts data
+    Precondition: top is an int >= 0
+
+    Parameter args: The arguments of the filter (as in the method of Filter)
+    Precondition: args is a tuple of valid arguments for the filter
+    """
+    rows = len(data)//(3*width)
+    if name == 'invert':
+        return a6engine.invert(data)
+    elif name == 'monochromify':
+        return a6engine.monochromify(data,*args)
+    elif name == 'tone':
+        return a6engine.lookup(data,*args)
+    elif name == 'vignette':
+        return a6engine.vignette(data,width,height,top)
+    elif name == 'pixellate':
+        return a6engine.pixellate(data,width,rows,*args)
+    elif name == 'blur':
+        return a6engine.blur(data,width,rows,*args)
+    return a6engine.convolve(data,width,rows,*args)
+
+
+def halo(name, args):
+    """
+    Returns the number of rows above and below a band that the filter reads.
+
+    Parameter name: The filter
+    Precondition: name is in FILTERS
+
+    Parameter args: The arguments of the filter
+    Precondition: args is a tuple of valid arguments for the filter
+    """
+    if name == 'blur':
+        return args[0]
+    elif name == 'convolve':
+        return len(args[0])//2
+    return 0
+
+
+def split(name, args, height, count):
+    """
+    Returns a list of at most count bands (top, bottom) that cover the rows of an image.
+
+    The bands have about the same number of rows. For pixellate, every band
+    starts at a multiple of the step, so that no block is split.
+
+    Parameter name: The filter
+    Precondition: name is in FILTERS
+
+    Parameter args: The arguments of the filter
+    Precondition: args is a tuple of valid arguments for the filter
+
+    Parameter height: The image height
+    Precondition: height is an int > 0
+
+    Parameter count: The number of bands
+    Precondition: count is an int > 0
+    """
+    align = args[0] if name == 'pixellate' else 1
+    units = -(-height//align)
+    count = min(count,units)
+    bounds = [min(height,align*(units*pos//count)) for pos in range(count+1)]
+    return list(zip(bounds[:-1],bounds[1:]))
+
+
+def _span(name, args, height, top, bottom):
+    """
+    Returns the pair (first, last) of rows that the band top..bottom-1 reads.
+
+    The rows first..last-1 are the band and its halo (see halo), cut off at
+    the edges of the image.
+
+    Parameter name: The filter
+    Precondition: name is in FILTERS
+
+    Parameter args: The arguments of the filter
+    Precondition: args is a tuple of valid arguments for the filter
+
+    Parameter height: The image height
+    Precondition: height is an int > 0
+
+    Parameter top: The first row of the band
+    Precondition: top is an int >= 0
+
+    Parameter bottom: The row after the last row of the band
+    Precondition: bottom is an int, top < bottom <= height
+    """
+    extra = halo(name,args)
+    return (max(0,top-extra), min(height,bottom+extra))
+
+
+def _band(name, args, data, first, result, width, height, top, bottom):
+    """
+    Computes the rows top..bottom-1 of a filter, and writes them to result.
+
+    Parameter name: The filter
+    Precondition: name is in FILTERS
+
+    Parameter args: The arguments of the filter
+    Precondition: args is a tuple of valid arguments for the filter
+
+    Parameter data: The packed pixels of the rows that the band reads
+    Precondition: data is a bytes-like object with the rows first..last-1,
+    where (first, last) is _span(name, args, height, top, bottom)
+
+    Parameter first: The first row of data
+    Precondition: first is an int >= 0
+
+    Parameter result: The buffer for the whole result
+    Precondition: result is a writable bytes-like object with length >= 3*width*height
+
+    Parameter width: The image width
+    Precondition: width is an int > 0
+
+    Parameter height: The image height
+    Precondition: height is an int > 0
+
+    Parameter top: The first row of the band
+    Precondition: top is an int >= 0
+
+    Parameter bottom: The row after the last row of the band
+    Precondition: bottom is an int, top < bottom <= height
+    """
+    band  = memoryview(compute(name,data,width,height,first,args))
+    start = 3*width*(top-first)
+    result[3*width*top:3*width*bottom] = band[start:start+3*width*(bottom-top)]
+
+
+def _point(name, args, source, result, top, bottom):
+    """
+    Computes the rows top..bottom-1 of a color filter with NumPy, writing to result.
+
+    Unlike _band, this copies nothing: the kernels of a6engine read source
+    and write result directly. NumPy lets other threads run while they do.
+
+    Parameter name: The filter
+    Precondition: name is in POINTS
+
+    Parameter args: The arguments of the filter
+    Precondition: args is a tuple of valid arguments for the filter
+
+    Parameter source: The pixels of the image
+    Precondition: source is a NumPy uint8 array of shape (height, width, 3)
+
+    Parameter result: The array for the result
+    Precondition: result is a NumPy uint8 array with the shape of source
+
+    Parameter top: The first row of the band
+    Precondition: top is an int >= 0
+
+    Parameter bottom: The row after the last row of the band
+    Precondition: bottom is an int, top < bottom <= height
+    """
+    numpy = a6engine.numpy
+    height, width = source.shape[:2]
+    for (first, last) in a6engine._blocks(bottom-top,max(1,a6engine.BLOCK_PIXELS//width)):
+        block = source[top+first:top+last]
+        out = result[top+first:top+last]
+        if name == 'invert':
+            numpy.subtract(255,block,out=out)
+        elif name == 'monochromify':
+            a6engine._tone(block,*args,out)
+        else:
+            a6engine._darken(block,top+first,width,height,out)
+
+
+def _work(task):
+    """
+    Computes one band of a filter in a worker process.
+
+    The task is a tuple (name, args, source, result, width, height, top,
+    bottom), where source and result are the names of the shared memory
+    blocks with the original pixels and for the result (see _band).
+
+    Parameter task: The band to compute
+    Precondition: task is a tuple as described above
+    """
+    name, args, source, result, width, height, top, bottom = task
+    source = multiprocessing.shared_memory.SharedMemory(name=source)
+    result = multiprocessing.shared_memory.SharedMemory(name=result)
+    try:
+        first, last = _span(name,args,height,top,bottom)
+        # A copy, as the memory cannot be closed while a view of it exists
+        data = bytes(source.buf[3*width*first:3*width*last])
+        _band(name,args,data,first,result.buf,width,height,top,bottom)
+    finally:
+        source.close()
+        result.close()
+
+
+class Executor(object):
+    """
+    A pool of workers that computes the whole-image filters in bands.
+
+    The workers are processes or threads. Processes run Python code at the
+    same time, but the pixels have to be copied to and from shared memory.
+    Threads share the image, so nothing is copied, but only one of them runs
+    Python code at a time. They still help with NumPy (see a6engine), which
+    lets other threads run while it processes an array.
+
+    The workers start when the executor is first used, and stay until it is
+    closed (an executor can be used in a with statement, which closes it at
+    the end). Each filter is split into one band for each worker.
+    """
+    __slots__ = ('_workers', '_threads', '_pool')
+    # HIDDEN ATTRIBUTES
+    # Attribute _workers: The number of workers
+    # Invariant: _workers is an int > 0
+    #
+    # Attribute _threads: Whether the workers are threads (instead of processes)
+    # Invariant: _threads is a bool
+    #
+    # Attribute _pool: The workers, or None if they have not started
+    # Invariant: _pool is a concurrent.futures.Executor or None
+
+    def __init__(self, workers=None, threads=False):
+        """
+        Initializes an executor with the given number of workers.
+
+        Parameter workers: The number of workers (or None for one per core)
+        Precondition: workers is an int > 0 or None
+
+        Parameter threads: Whether the workers are threads (instead of processes)
+        Precondition: threads is a bool
+        """
+        assert workers is None or (type(workers) == int and workers > 0), repr(workers)+' is not a valid number of workers'
+        assert type(threads) == bool, repr(threads)+' is not a bool'
+        self._workers = (os.cpu_count() or 1) if workers is None else workers
+        self._threads = threads
+        self._pool = None
+
+    def __enter__(self):
+        """
+        Returns this executor, at the start of a with statement.
+        """
+        return self
+
+    def __exit__(self, *exception):
+        """
+        Closes this executor, at the end of a with statement.
+        """
+        self.close()
+
+    def getWorkers(self):
+        """
+        Returns the number of workers.
+        """
+        return self._workers
+
+    def isThreaded(self):
+        """
+        Returns True if the workers are threads, False if they are processes.
+        """
+        return self._threads
+
+    def run(self, name, data, width, height, args):
+        """
+        Returns the packed pixels data with the given filter applied.
+
+        The result is the same as compute(name, data, width, height, 0, args),
+        but the bands are computed at the same time by the workers.
+
+        Parameter name: The filter
+        Precondition: name is in FILTERS
+
+        Parameter data: The packed pixels
+        Precondition: data is a bytes-like object with length 3*width*height
+
+        Parameter width: The image width
+        Precondition: width is an int > 0
+
+        Parameter height: The image height
+        Precondition: height is an int > 0
+
+        Parameter args: The arguments of the filter
+        Precondition: args is a tuple of valid arguments for the filter
+        """
+        assert name in FILTERS, repr(name)+' cannot be computed in bands'
+        size  = 3*width*height
+        bands = split(name,args,height,self._workers)
+        if self._pool is None:
+            if self._threads:
+                self._pool = concurrent.futures.ThreadPoolExecutor(self._workers)
+            else:
+                context = multiprocessing.get_context(START)
+                self._pool = concurrent.futures.ProcessPoolExecutor(self._workers,mp_context=context)
+
+        numpy = a6engine.numpy
+        if self._threads and name in POINTS and not numpy is None:
+            source = numpy.frombuffer(data,dtype=numpy.uint8).reshape(height,width,3)
+            result = numpy.empty_like(source)
+            futures = [self._pool.submit(_point,name,args,source,result,top,bottom)
+                       for (top, bottom) in bands]
+            for future in futures:
+                future.result()
+            return result.tobytes()
+
+        if self._threads:
+            # The threads share the pixels, and write to the same result
+            source = memoryview(data)
+            result = bytearray(size)
+            futures = []
+            for (top, bottom) in bands:
+                first, last = _span(name,args,height,top,bottom)
+                futures.append(self._pool.submit(_band,name,args,source[3*width*first:3*width*last],
+                                                 first,result,width,height,top,bottom))
+            for future in futures:
+                future.result()
+            return bytes(result)
+
+        source = multiprocessing.shared_memory.SharedMemory(create=True,size=size)
+        result = multiprocessing.shared_memory.SharedMemory(create=True,size=size)
+        try:
+            source.buf[:size] = data
+            tasks = [(name,args,source.name,result.name,width,height,top,bottom)
+                     for (top, bottom) in bands]
+            for future in [self._pool.submit(_work,task) for task in tasks]:
+                future.result()
+            return bytes(result.buf[:size])
+        finally:
+            for block in (source, result):
+                block.close()
+                block.unlink()
+
+    def close(self):
+        """
+        Stops the workers.
+
+        The executor can still be used; it starts new workers when needed.
+        """
+        if not self._pool is None:
+            self._pool.shutdown()
+            self._pool = None
@@ -0,0 +1,193 @@
+"""
+A raw, memory-mapped image format for the imager application.
+
+Formats like PNG and JPEG are compressed, so they have to be decoded in full
+before the first pixel can be shown. For very large scans that takes a long
+time and needs all of the pixels in memory at once. This module provides an
+uncompressed format (with the extension .imr) that is stored exactly like a
+packed Image:
+
+    bytes 0-7    the signature b'IMAGER\0\1'
+    bytes 8-11   the width, as a little-endian unsigned int
+    bytes 12-15  the height, as a little-endian unsigned int
+    bytes 16-    the packed pixels (see Image.getBytes), 3 bytes per pixel
+
+The function load maps such a file into memory with mmap and wraps it in a
+packed Image without reading it. The operating system pages pixels in from
+disk when they are first used (and can page them out again), so opening a
+file is instant and the image can be larger than the available memory. The
+function edit also builds the edit history on the mapped file, so editing a
+file does not copy it either.
+
+Author: Yan Zhu yz2477  Aroma Dong jd778
+Date:   10/18/2026
+"""
+import a6editor
+import a6image
+import mmap
+import struct
+
+
+# The file extension for raw images
+EXTENSION = '.imr'
+
+# The first bytes of every raw image file
+SIGNATURE = b'IMAGER\0\1'
+
+# The layout of the header: signature, width, height
+HEADER = struct.Struct('<8sII')
+
+# The number of pixels that save writes at a time
+CHUNK = 1 << 20
+
+
+def _read_header(file):
+    """
+    Returns the pair (width, height) from the header of a raw image file.
+
+    This function raises a ValueError if the file is not a raw image, or if
+    the width or height is 0.
+
+    Parameter file: The file to read, positioned at the start
+    Precondition: file is a binary file object open for reading
+    """
+    header = file.read(HEADER.size)
+    if len(header) != HEADER.size:
+        raise ValueError('file is too short to be a raw image')
+    signature, width, height = HEADER.unpack(header)
+    if signature != SIGNATURE:
+        raise ValueError('file is not a raw image')
+    if width <= 0 or height <= 0:
+        raise ValueError('file has an empty '+str(width)+'x'+str(height)+' image')
+    return (width, height)
+
+
+def is_raw(filename):
+    """
+    Returns True if filename has the extension of a raw image file.
+
+    This does not check the contents of the file.
+
+    Parameter filename: The file name
+    Precondition: filename is a string
+    """
+    return filename.lower().endswith(EXTENSION)
+
+
+def save(image, filename):
+    """
+    Saves image to a raw image file, replacing any existing file.
+
+    Parameter image: The image to save
+    Precondition: image is an Image object with at least one pixel
+
+    Parameter filename: The file to write
+    Precondition: filename is a string
+    """
+    assert isinstance(image,a6image.Image), repr(image)+' is not an image'
+    assert len(image) > 0, 'cannot save an empty image'
+    with open(filename,'wb') as file:
+        file.write(HEADER.pack(SIGNATURE,image.getWidth(),image.getHeight()))
+        for pos in range(0,len(image),CHUNK):
+            file.write(image._getSpan(pos,min(CHUNK,len(image)-pos)))
+
+
+def _map(filename, access):
+    """
+    Returns the pair (pixels, width) of a raw image file mapped into memory.
+
+    The value pixels is a memoryview of the packed pixels in the mapping.
+    This function raises a ValueError if the file is not a raw image, and an
+    OSError if it cannot be opened.
+
+    Parameter filename: The file to map
+    Precondition: filename is a string
+
+    Parameter access: The access to the mapping
+    Precondition: access is mmap.ACCESS_READ, mmap.ACCESS_WRITE or mmap.ACCESS_COPY
+    """
+    with open(filename,'r+b' if access == mmap.ACCESS_WRITE else 'rb') as file:
+        width, height = _read_header(file)
+        size = HEADER.size+3*width*height
+        file.seek(0,2)
+        if file.tell() < size:
+            raise ValueError('file is too short for a '+str(width)+'x'+str(height)+' image')
+        # The mapping stays open after the file is closed
+        mapping = mmap.mmap(file.fileno(),size,access=access)
+    return (memoryview(mapping)[HEADER.size:], width)
+
+
+def load(filename, writeback=False):
+    """
+    Returns a packed image that maps the pixels of a raw image file.
+
+    No pixels are read when this function is called. They are paged in from
+    the file as the image uses them.
+
+    If writeback is True, changes to the image are written to the file, so
+    the file is always the current state of the image (the operating system
+    decides when). Otherwise the mapping is copy-on-write: the image can be
+    changed, but the changes stay in memory and the file is never modified.
+
+    This function raises a ValueError if the file is not a raw image, and an
+    OSError if it cannot be opened.
+
+    Parameter filename: The file to load
+    Precondition: filename is a string
+
+    Parameter writeback: Whether changes to the image are saved to the file
+    Precondition: writeback is a bool
+    """
+    assert type(writeback) == bool, repr(writeback)+' is not a bool'
+    pixels, width = _map(filename,mmap.ACCESS_WRITE if writeback else mmap.ACCESS_COPY)
+    return a6image.Image.fromBytes(pixels,width)
+
+
+def edit(filename, kind=a6editor.Editor, budget=None):
+    """
+    Returns an editor for the image in a raw image file, without copying it.
+
+    An Editor made by its initializer copies the image, and its history
+    copies every tile. Instead, the original and the current image of the
+    result map the file (copy-on-write, as in load), and the tiles of its
+    history are read-only views of another mapping of it (see
+    Editor.fromSession). So only the tiles that an edit writes are copied
+    into memory. Showing the image, and the filters that work on the whole
+    image (such as blur), still read every pixel; the operating system pages
+    those in and out of the file as needed.
+
+    This function raises a ValueError if the file is not a raw image, and an
+    OSError if it cannot be opened.
+
+    Parameter filename: The file to edit
+    Precondition: filename is a string
+
+    Parameter kind: The class of the editor
+    Precondition: kind is Editor or a subclass of Editor
+
+    Parameter budget: The memory budget of the history, in bytes
+    Precondition: budget is None or an int > 0
+    """
+    assert isinstance(kind,type) and issubclass(kind,a6editor.Editor), repr(kind)+' is not an editor class'
+    tiles = a6image.split_tiles(_map(filename,mmap.ACCESS_READ)[0])
+    original = load(filename)
+    current  = load(filename)
+    entry = {'action' : None, 'width' : current.getWidth(), 'orient' : list(current.getOrientation())}
+    return kind.fromSession(original,tiles,current,[(entry,tiles)],budget)
+
+
+def convert(source, filename):
+    """
+    Converts an image file (such as a PNG or JPEG) to a raw image file.
+
+    The source is decoded with PIL, so it can be any format that PIL reads.
+    Open the result with load.
+
+    Parameter source: The image file to convert
+    Precondition: source is a string naming an image file
+
+    Parameter filename: The raw image file to write
+    Precondition: filename is a string
+    """
+    from PIL import Image as CoreImage
+    save(a6image.Image.fromPIL(CoreImage.open(source)),filename)
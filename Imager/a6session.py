@@ -0,0 +1,210 @@
+"""
+Saved editing sessions for the imager application.
+
+An Editor keeps its history in memory, so it is lost when the application
+closes, and reopening a large image means recomputing every edit. This
+module saves an editor to a session file (with the extension .ims) and
+opens it again:
+
+    bytes 0-7    the signature b'IMAGES\0\1'
+    bytes 8-15   the offset of the index, as a little-endian unsigned int
+    bytes 16-19  the length of the index, as a little-endian unsigned int
+    bytes 20-    the images, as packed pixels (see Image.getBytes)
+    then         the index, as UTF-8 JSON
+
+The index records the budget and checkpoint interval of the editor, and the
+offset and size of every image. It is written last, so that the images can
+be written one at a time as they are uncompressed.
+
+The index also records the path of edits from the oldest image in the
+history to the current one. Each edit on the path has its action (see
+Editor.perform), its image, or both. Like the history, the images are the
+stored pixels, with their width and orientation (see Image.getTiles). An
+edit made without perform always has its image. The other edits only have
+their image every CHECKPOINT steps (or every checkpoint interval of the
+editor), so the file is not much larger than the original and the current
+image. Branches off the path are not saved.
+
+The function load maps the file into memory (as in a6raw), so the original
+and the current image are used in place without decoding or replaying any
+edit, and the other images are only read from the file if the user undoes
+back to them. The images between checkpoints are replayed from their
+actions instead.
+
+Author: Yan Zhu yz2477  Aroma Dong jd778
+Date:   10/18/2026
+"""
+import a6editor
+import a6image
+import json
+import mmap
+import os
+import struct
+
+
+# The file extension for sessions
+EXTENSION = '.ims'
+
+# The first bytes of every session file
+SIGNATURE = b'IMAGES\0\1'
+
+# The layout of the header: signature, index offset, index length
+HEADER = struct.Struct('<8sQI')
+
+# The number of edits between saved images, if the editor has no checkpoints
+CHECKPOINT = 5
+
+
+def is_session(filename):
+    """
+    Returns True if filename has the extension of a session file.
+
+    This does not check the contents of the file.
+
+    Parameter filename: The file name
+    Precondition: filename is a string
+    """
+    return filename.lower().endswith(EXTENSION)
+
+
+def _check(index, end, kind):
+    """
+    Raises a ValueError if index is not a valid session index.
+
+    The images of the index must be in the file before end, and have the
+    same number of pixels. Each image on the path must have a width that
+    fits that number, an orientation, and an action of kind or None. The
+    oldest image must be saved, and the current image must be saved apart
+    from the original, as it is edited in place.
+
+    Parameter index: The decoded index
+    Precondition: NONE (index can be anything)
+
+    Parameter end: The position of the index in the file
+    Precondition: end is an int >= HEADER.size
+
+    Parameter kind: The class of the editor
+    Precondition: kind is Editor or a subclass of Editor
+    """
+    try:
+        valid = all(index[key] is None or (type(index[key]) == int and index[key] > 0)
+                    for key in ('budget','checkpoint'))
+        images = index['images']
+        valid  = valid and type(images) == list and images != []
+        for image in images:
+            start, width, height = image
+            valid = (valid and all(type(value) == int for value in image) and width > 0 and
+                     height >= 0 and start >= HEADER.size and start+3*width*height <= end and
+                     width*height == images[0][1]*images[0][2])
+        path  = index['path']
+        valid = valid and type(path) == list and path != []
+        for entry in path:
+            action, image, width, orient = entry['action'], entry['image'], entry['width'], entry['orient']
+            valid = (valid and type(width) == int and width > 0 and images[0][1]*images[0][2] % width == 0 and
+                     type(orient) == list and len(orient) == 3 and all(type(value) == bool for value in orient))
+            valid = valid and (image is None or (type(image) == int and 0 <= image < len(images) and
+                                                 images[image][1] == width))
+            valid = valid and (action is None or (type(action) == list and len(action) == 2 and
+                                                  type(action[0]) == str and type(action[1]) == list and
+                                                  callable(getattr(kind,action[0],None))))
+        valid = valid and not path[0]['image'] is None and not path[-1]['image'] in (None, 0)
+    except (KeyError, TypeError, ValueError, IndexError):
+        valid = False
+    if not valid:
+        raise ValueError('file has an invalid session index')
+
+
+def save(editor, filename):
+    """
+    Saves the history of editor to a session file, replacing any existing file.
+
+    Only the path from the oldest image to the current image is saved (see
+    the module description and Editor.toSession). The file is written under
+    another name first and then renamed, so an editor loaded from the old
+    file keeps the images it maps (see load).
+
+    Parameter editor: The editor to save
+    Precondition: editor is an Editor object
+
+    Parameter filename: The file to write
+    Precondition: filename is a string
+    """
+    assert isinstance(editor,a6editor.Editor), repr(editor)+' is not an editor'
+    interval = editor.getCheckpoint() or CHECKPOINT
+    partial  = filename+'.part'
+    try:
+        with open(partial,'wb') as file:
+            file.write(HEADER.pack(SIGNATURE,0,0))
+            images  = []
+            entries = []
+            for (entry, tiles) in editor.toSession(interval):
+                image = 0 if entry['original'] else None
+                if not tiles is None:
+                    image = len(images)
+                    start = file.tell()
+                    for tile in tiles:
+                        file.write(tile)
+                    images.append([start,entry['width'],(file.tell()-start)//(3*entry['width'])])
+                entries.append({'action' : entry['action'], 'image' : image, 'width' : entry['width'],
+                                'orient' : entry['orient']})
+
+            # The first entry is the original, which is not on the path
+            index = json.dumps({'budget' : editor.getBudget(), 'checkpoint' : editor.getCheckpoint(),
+                                'images' : images, 'path' : entries[1:]}).encode('utf-8')
+            offset = file.tell()
+            file.write(index)
+            file.seek(0)
+            file.write(HEADER.pack(SIGNATURE,offset,len(index)))
+        os.replace(partial,filename)
+    except Exception:
+        if os.path.exists(partial):
+            os.remove(partial)
+        raise
+
+
+def load(filename, kind=a6editor.Editor):
+    """
+    Returns an editor with the history saved in the given session file.
+
+    No images are decoded and no edits are replayed. The original and the
+    current image map the file (copy-on-write, so the file is never
+    modified), and the tiles of the history are read-only views of another
+    mapping of it (see Editor.fromSession). So an image is only read when
+    the editor restores it, and a tile is only copied into memory when an
+    edit writes it. Edits saved only as actions are replayed when the
+    editor needs them, so kind must have the methods named by the actions.
+
+    This function raises a ValueError if the file is not a session or its
+    index is invalid, and an OSError if it cannot be opened.
+
+    Parameter filename: The file to load
+    Precondition: filename is a string
+
+    Parameter kind: The class of the editor
+    Precondition: kind is Editor or a subclass of Editor
+    """
+    assert isinstance(kind,type) and issubclass(kind,a6editor.Editor), repr(kind)+' is not an editor class'
+    with open(filename,'rb') as file:
+        header = file.read(HEADER.size)
+        if len(header) != HEADER.size:
+            raise ValueError('file is too short to be a session')
+        signature, offset, size = HEADER.unpack(header)
+        if signature != SIGNATURE:
+            raise ValueError('file is not a session')
+        file.seek(offset)
+        try:
+            index = json.loads(file.read(size).decode('utf-8'))
+        except (UnicodeDecodeError, ValueError):
+            raise ValueError('file has an invalid session index')
+        _check(index,offset,kind)
+        # The mappings stay open after the file is closed
+        source  = memoryview(mmap.mmap(file.fileno(),offset,access=mmap.ACCESS_READ))
+        mapping = memoryview(mmap.mmap(file.fileno(),offset,access=mmap.ACCESS_COPY))
+
+    spans = [slice(start,start+3*width*height) for (start, width, height) in index['images']]
+    path  = index['path']
+    original = a6image.Image.fromBytes(mapping[spans[0]],index['images'][0][1])
+    current  = a6image.Image.fromBytes(mapping[spans[path[-1]['image']]],path[-1]['width'])
+    tiles = [a6image.split_tiles(source[span]) for span in spans]
+    steps = [(entry, None if entry['image'] is None else tiles[entry['image']]) for entry in path]
+    return kind.fromSession(original,tiles[0],current,steps,index['budget'],index['checkpoint'])
@@ -13,7 +13,13 @@ Date:   October 29, 2019
 import introcs
 import a6image
 import a6filter
+import a6editor
+import a6engine
 import a6encode
+import a6raw
+import a6session
+import a6parallel
+import a6batch
 import traceback
 
 # Helper to read the test images
@@ -34,23 +40,17 @@ def load_image(file):
     path = os.path.join(path,'tests',file+'.png')
     
     try:
-        image = CoreImage.open(path)
-        image = image.convert("RGB")
-        buffer = list(image.getdata())
-        size  = image.size[0]*image.size[1]
-        width = image.size[0]
+        image = CoreImage.open(path).convert("RGB")
     except:
         traceback.print_exc()
         print('Could not load the file '+path)
-        buffer = None
+        return None
     
-    result = None
-    if not buffer is None:
-        try:
-            result = a6image.Image(buffer,width)
-        except:
-            traceback.print_exc()
-            result = None
+    try:
+        result = a6image.Image.fromPIL(image)
+    except:
+        traceback.print_exc()
+        result = None
     return result
 
 
@@ -156,7 +156,13 @@ def test_image_setters():
     introcs.assert_equals(1,image.getWidth())
     introcs.assert_equals(6,image.getHeight())
     
+    image.reshape(3,2)
+    introcs.assert_equals(3,image.getWidth())
+    introcs.assert_equals(2,image.getHeight())
+    
     # Test enforcement
+    introcs.assert_error(image.reshape,2,2,  message='reshape does not enforce the precondition on size')
+    introcs.assert_error(image.reshape,3,'2',message='reshape does not enforce the precondition on height type')
     introcs.assert_error(image.setWidth,'a', message='setWidth does not enforce the precondition on width type')
     introcs.assert_error(image.setWidth,5,   message='setWidth does not enforce the precondition on width validity')
     introcs.assert_error(image.setHeight,'a',message='setHeight does not enforce the precondition on height type')
@@ -252,6 +258,26 @@ def test_image_str():
     introcs.assert_equals(str3,str(image))
     image.setWidth(1)
     introcs.assert_equals(str4,str(image))
+    
+    # The streaming version
+    import io
+    image = a6image.Image(p,2)
+    stream = io.StringIO()
+    image.dump(stream)
+    introcs.assert_equals(str1,stream.getvalue())
+    
+    stream = io.StringIO()
+    image.dump(stream,range(1,3))
+    introcs.assert_equals('[['+str(p[2])+', '+str(p[3])+'],\n['+str(p[4])+', '+str(p[5])+']]',stream.getvalue())
+    stream = io.StringIO()
+    image.dump(stream,[2,0])
+    introcs.assert_equals('[['+str(p[4])+', '+str(p[5])+'],\n['+str(p[0])+', '+str(p[1])+']]',stream.getvalue())
+    stream = io.StringIO()
+    image.dump(stream,[])
+    introcs.assert_equals('[]',stream.getvalue())
+    
+    introcs.assert_equals(str1,str(image.copy(packed=True)))
+    introcs.assert_error(image.dump,io.StringIO(),[3], message='dump does not enforce the precondition on rows')
 
 
 def test_image_other():
@@ -298,6 +324,474 @@ def test_image_other():
     introcs.assert_error(image.swapPixels, 0, 1, 0, 'a', message='swapPixels does not enforce the precondition on column type')
     introcs.assert_error(image.swapPixels, 0, 1, 0, 8,   message='swapPixels does not enforce the precondition on column value')
 
+
+def test_image_packed():
+    """
+    Tests the packed (pixel buffer) storage in class Image
+    """
+    print('Testing packed image storage')
+    p = [(255, 64, 0),(0, 255, 64),(64, 0, 255),(64, 255, 128),(128, 64, 255),(255, 128, 64)]
+    b = bytearray([255, 64, 0, 0, 255, 64, 64, 0, 255, 64, 255, 128, 128, 64, 255, 255, 128, 64])
+    
+    introcs.assert_true(a6image._is_pixel_buffer(b))
+    introcs.assert_false(a6image._is_pixel_buffer(b[:4]))
+    introcs.assert_false(a6image._is_pixel_buffer(bytes(b)))
+    introcs.assert_false(a6image._is_pixel_buffer(p))
+    
+    image = a6image.Image(b,2)
+    introcs.assert_true(image.isPacked())
+    introcs.assert_equals(id(b),id(image._data))
+    introcs.assert_equals(6,len(image))
+    introcs.assert_equals(2,image.getWidth())
+    introcs.assert_equals(3,image.getHeight())
+    introcs.assert_equals(p,image.getData())
+    for n in range(6):
+        introcs.assert_equals(p[n],image[n])
+        introcs.assert_equals(p[n],image.getPixel(n // 2, n % 2))
+    
+    image[4] = (1,2,3)
+    introcs.assert_equals((1,2,3),image[4])
+    introcs.assert_equals(bytearray([1,2,3]),b[12:15])  # Because image has a reference to b
+    image.setPixel(0,1,(4,5,6))
+    introcs.assert_equals((4,5,6),image[1])
+    introcs.assert_equals(str(a6image.Image(image.getData(),2)),str(image))
+    
+    # Converting between storage
+    copy = image.copy()
+    introcs.assert_true(copy.isPacked())
+    introcs.assert_not_equals(id(image._data), id(copy._data))
+    listed = image.copy(packed=False)
+    introcs.assert_false(listed.isPacked())
+    introcs.assert_equals(image.getData(),listed.getData())
+    packed = listed.copy(packed=True)
+    introcs.assert_true(packed.isPacked())
+    introcs.assert_equals(image._data,packed._data)
+    
+    # Test enforcement
+    introcs.assert_error(a6image.Image,b[:4],1, message='Image does not enforce the precondition on buffer length')
+    introcs.assert_error(a6image.Image,b,4,     message='Image does not enforce the precondition width validity')
+    introcs.assert_error(image.__setitem__,0,(0,0,256), message='__setitem__ does not enforce the precondition on pixel value')
+    introcs.assert_error(image.copy,1, message='copy does not enforce the precondition on packed')
+
+
+def test_image_rows():
+    """
+    Tests the row, column and rectangle methods in class Image
+    """
+    print('Testing image row and column methods')
+    p = [(n,2*n,3*n) for n in range(12)]
+    
+    for image in [a6image.Image(p[:],4), a6image.Image(p[:],4).copy(packed=True)]:
+        introcs.assert_equals(p[4:8],image.getRow(1))
+        introcs.assert_equals([p[2],p[6],p[10]],image.getColumn(2))
+        
+        image.setRow(2,[(0,0,0),(1,1,1),(2,2,2),(3,3,3)])
+        introcs.assert_equals((1,1,1),image.getPixel(2,1))
+        introcs.assert_equals(p[7],image.getPixel(1,3))
+        image.setColumn(3,[(4,4,4),(5,5,5),(6,6,6)])
+        introcs.assert_equals([(4,4,4),(5,5,5),(6,6,6)],image.getColumn(3))
+        introcs.assert_equals(p[2],image.getPixel(0,2))
+        
+        image.fillRect(0,1,3,2,(9,9,9))        # Tall
+        introcs.assert_equals([p[0],(9,9,9),(9,9,9),(4,4,4)],image.getRow(0))
+        introcs.assert_equals([(0,0,0),(9,9,9),(9,9,9),(6,6,6)],image.getRow(2))
+        image.fillRect(1,0,1,3,(8,8,8))        # Wide
+        introcs.assert_equals([(8,8,8),(8,8,8),(8,8,8),(5,5,5)],image.getRow(1))
+        image.fillRect(1,0,2,4,(7,7,7))        # Full rows
+        introcs.assert_equals([(7,7,7)]*8,image.getData()[4:])
+        image.fillRect(0,0,0,4,(6,6,6))        # Empty
+        introcs.assert_equals(p[0],image[0])
+        
+        # Test enforcement
+        introcs.assert_error(image.getRow,3,   message='getRow does not enforce the precondition on row')
+        introcs.assert_error(image.getColumn,'a', message='getColumn does not enforce the precondition on col')
+        introcs.assert_error(image.setRow,0,[(0,0,0)]*3,  message='setRow does not enforce the precondition on length')
+        introcs.assert_error(image.setRow,0,[(0,0,0)]*3+[(0,0,256)], message='setRow does not enforce the precondition on pixels')
+        introcs.assert_error(image.setColumn,0,[(0,0,0),(0,0),(0,0,0)], message='setColumn does not enforce the precondition on pixels')
+        introcs.assert_error(image.setColumn,0,[(0,0,0),(0,0,0.0),(0,0,0)], message='setColumn does not enforce the precondition on pixels')
+        introcs.assert_error(image.fillRect,2,0,2,1,(0,0,0),  message='fillRect does not enforce the precondition on height')
+        introcs.assert_error(image.fillRect,0,3,1,2,(0,0,0),  message='fillRect does not enforce the precondition on width')
+        introcs.assert_error(image.fillRect,0,0,1,1,(0,0,-1), message='fillRect does not enforce the precondition on pixel')
+
+
+def test_image_release():
+    """
+    Tests the release mode (setRelease) and the slots of class Image
+    """
+    print('Testing image release mode')
+    p = [(255,0,0),(0,255,0),(0,0,255),(0,255,255),(255,0,255),(255,255,0)]
+    introcs.assert_false(hasattr(a6image.Image(p[:],3),'__dict__'))
+    introcs.assert_false(hasattr(a6image.Image(p[:],3).region(0,0,1,1),'__dict__'))
+    
+    mode = a6image.isRelease()
+    try:
+        a6image.setRelease(True)
+        introcs.assert_true(a6image.isRelease())
+        for image in [a6image.Image(p[:],3), a6image.Image(p[:],3).copy(packed=True)]:
+            introcs.assert_equals(p[4],image[4])
+            introcs.assert_equals(p[4],image.getPixel(1,1))
+            image[4] = (1,2,3)
+            introcs.assert_equals((1,2,3),image.getPixel(1,1))
+            image.setPixel(0,2,(4,5,6))
+            introcs.assert_equals((4,5,6),image[2])
+            # API boundaries are still checked
+            introcs.assert_error(image.setWidth,4, message='setWidth is not checked in release mode')
+            introcs.assert_error(image.setRow,0,[(0,0,0)], message='setRow is not checked in release mode')
+            introcs.assert_error(a6image.Image,p,4, message='Image is not checked in release mode')
+        
+        a6image.setRelease(False)
+        introcs.assert_false(a6image.isRelease())
+        image = a6image.Image(p[:],3)
+        introcs.assert_error(image.__getitem__,9, message='__getitem__ is not checked in debug mode')
+        introcs.assert_error(image.setPixel,0,0,(0,0,'a'), message='setPixel is not checked in debug mode')
+        introcs.assert_error(a6image.setRelease,1, message='setRelease does not enforce the precondition')
+    finally:
+        a6image.setRelease(mode)
+
+
+def test_image_bytes():
+    """
+    Tests the packed pixel methods and trusted constructors in class Image
+    """
+    print('Testing image packed pixels')
+    p = [(255, 64, 0),(0, 255, 64),(64, 0, 255),(64, 255, 128),(128, 64, 255),(255, 128, 64)]
+    b = bytes([255, 64, 0, 0, 255, 64, 64, 0, 255, 64, 255, 128, 128, 64, 255, 255, 128, 64])
+    
+    image = a6image.Image(p[:],3)
+    introcs.assert_equals(b,image.getBytes())
+    image.setBytes(b[::-1])
+    introcs.assert_equals((64,128,255),image[0])
+    introcs.assert_false(image.isPacked())
+    
+    image = a6image.Image.fromBytes(b,2)
+    introcs.assert_true(image.isPacked())
+    introcs.assert_equals(2,image.getWidth())
+    introcs.assert_equals(3,image.getHeight())
+    introcs.assert_equals(p,image.getData())
+    introcs.assert_equals(b,image.getBytes())
+    image.validate()
+    image[0] = (1,1,1)
+    introcs.assert_equals((1,1,1),image[0])
+    
+    buffer = bytearray(b)
+    image = a6image.Image.fromBytes(buffer,3)
+    introcs.assert_equals(id(buffer),id(image._data))
+    image.setBytes(bytes(18))
+    introcs.assert_equals(bytearray(18),buffer)
+    
+    # The trusted constructor skips validation
+    image = a6image.Image.fromBytes(b[:4],1)
+    introcs.assert_error(image.validate, message='validate does not check the buffer length')
+    image = a6image.Image(p[:],3)
+    image._data[0] = (256,0,0)
+    introcs.assert_error(image.validate, message='validate does not check the pixels')
+    
+    # Test enforcement
+    introcs.assert_error(image.setBytes,b[:6], message='setBytes does not enforce the precondition on length')
+    introcs.assert_error(image.setBytes,list(b), message='setBytes does not enforce the precondition on type')
+
+
+def test_image_region():
+    """
+    Tests the method region in class Image and the class Region
+    """
+    print('Testing image regions')
+    p = [(n,2*n,3*n) for n in range(20)]
+    
+    for image in [a6image.Image(p[:],5), a6image.Image(p[:],5).copy(packed=True)]:
+        region = image.region(1,2,3,2)
+        introcs.assert_equals(6,len(region))
+        introcs.assert_equals(2,region.getWidth())
+        introcs.assert_equals(3,region.getHeight())
+        introcs.assert_equals((1,2),region.getOrigin())
+        introcs.assert_equals(id(image),id(region.getParent()))
+        introcs.assert_equals(p[7],region.getPixel(0,0))
+        introcs.assert_equals(p[18],region.getPixel(2,1))
+        introcs.assert_equals(p[13],region[3])
+        introcs.assert_equals([p[7],p[8],p[12],p[13],p[17],p[18]],list(region))
+        
+        # Writes go through to the parent
+        region.setPixel(1,0,(0,0,0))
+        introcs.assert_equals((0,0,0),image.getPixel(2,2))
+        region[5] = (1,1,1)
+        introcs.assert_equals((1,1,1),image[18])
+        
+        # Bulk access and copies
+        data = region.getBytes()
+        introcs.assert_equals(18,len(data))
+        introcs.assert_equals(bytes(p[7]),data[:3])
+        region.setBytes(bytes(range(18)))
+        introcs.assert_equals((15,16,17),image[18])
+        introcs.assert_equals(p[6],image[6])
+        introcs.assert_equals(p[9],image[9])
+        crop = region.copy()
+        introcs.assert_equals(bytes(range(18)),crop.getBytes())
+        crop[0] = (9,9,9)
+        introcs.assert_equals((0,1,2),image[7])
+        
+        # Regions of regions
+        inner = region.region(1,1,2,1)
+        introcs.assert_equals(id(image),id(inner.getParent()))
+        introcs.assert_equals((2,3),inner.getOrigin())
+        introcs.assert_equals(image[13],inner[0])
+        
+        # Test enforcement
+        introcs.assert_error(image.region,3,0,2,2, message='region does not enforce the precondition on height')
+        introcs.assert_error(image.region,0,4,2,2, message='region does not enforce the precondition on width')
+        introcs.assert_error(image.region,0,0,0,2, message='region does not enforce the precondition on size')
+        introcs.assert_error(region.getPixel,3,0,  message='getPixel does not enforce the precondition on row value')
+        introcs.assert_error(region.__getitem__,6, message='__getitem__ does not enforce the precondition on range')
+        introcs.assert_error(region.setBytes,bytes(3), message='setBytes does not enforce the precondition on length')
+    
+    introcs.assert_equals(p,list(a6image.Image(p[:],4)))
+
+
+def test_image_array():
+    """
+    Tests the array views fromArray and asArray in class Image
+    """
+    print('Testing image array views')
+    b = bytearray([255, 64, 0, 0, 255, 64, 64, 0, 255, 64, 255, 128, 128, 64, 255, 255, 128, 64])
+    
+    # A memoryview works whether or not NumPy is installed
+    array = memoryview(b).cast('B',(3,2,3))
+    image = a6image.Image.fromArray(array)
+    introcs.assert_true(image.isPacked())
+    introcs.assert_equals(2,image.getWidth())
+    introcs.assert_equals(3,image.getHeight())
+    introcs.assert_equals((64,255,128),image.getPixel(1,1))
+    image.setPixel(1,1,(1,2,3))
+    introcs.assert_equals(bytearray([1,2,3]),b[9:12])   # Shared, not copied
+    
+    view = image.asArray()
+    introcs.assert_equals(3,view[1,1,2])
+    view[2,0,0] = 7
+    introcs.assert_equals((7,64,255),image.getPixel(2,0))
+    
+    # Lists are packed first
+    image = a6image.Image([(0,0,0),(10,20,30)],1)
+    view  = image.asArray()
+    introcs.assert_true(image.isPacked())
+    introcs.assert_equals(20,view[1,0,1])
+    view[0,0,1] = 99
+    introcs.assert_equals((0,99,0),image[0])
+    
+    if not a6image.numpy is None:
+        numpy = a6image.numpy
+        array = numpy.zeros((4,5,3),dtype=numpy.uint8)
+        image = a6image.Image.fromArray(array)
+        introcs.assert_equals(5,image.getWidth())
+        introcs.assert_equals(4,image.getHeight())
+        array[3,4] = (1,2,3)
+        introcs.assert_equals((1,2,3),image.getPixel(3,4))
+        view = image.asArray()
+        introcs.assert_true(isinstance(view,numpy.ndarray))
+        introcs.assert_true(numpy.shares_memory(view,array))
+        introcs.assert_error(a6image.Image.fromArray,array.astype(numpy.int32),
+                             message='fromArray does not enforce the precondition on dtype')
+        introcs.assert_error(a6image.Image.fromArray,array[:,::2],
+                             message='fromArray does not enforce the precondition on contiguity')
+    
+    # Test enforcement
+    introcs.assert_error(a6image.Image.fromArray,memoryview(b).cast('B',(6,3)),
+                         message='fromArray does not enforce the precondition on shape')
+    introcs.assert_error(a6image.Image.fromArray,memoryview(bytes(b)).cast('B',(3,2,3)),
+                         message='fromArray does not enforce the precondition on writability')
+
+def test_image_tiles():
+    """
+    Tests the tile snapshots getTiles and setTiles in class Image
+    """
+    print('Testing image tiles')
+    size  = a6image.TILE_PIXELS
+    image = a6image.Image(bytearray(3*(2*size+10)),2)
+    tiles = image.getTiles()
+    introcs.assert_equals(3,len(tiles))
+    introcs.assert_equals([3*size,3*size,30],[len(tile) for tile in tiles])
+    introcs.assert_equals(image.getBytes(),b''.join(tiles))
+    
+    # Unchanged tiles are shared with the previous snapshot
+    image.setPixel(0,0,(1,2,3))
+    image.fillRect(image.getHeight()-1,0,1,2,(4,5,6))
+    second = image.getTiles(tiles)
+    introcs.assert_false(second[0] is tiles[0])
+    introcs.assert_true(second[1] is tiles[1])
+    introcs.assert_false(second[2] is tiles[2])
+    introcs.assert_equals(image.getBytes(),b''.join(second))
+    third = image.getTiles(second)
+    introcs.assert_true(all(a is b for (a,b) in zip(second,third)))
+    
+    # A tile written with the same pixels is still shared
+    image.setPixel(0,0,(1,2,3))
+    introcs.assert_true(image.getTiles(third)[0] is third[0])
+    
+    # Restoring a snapshot
+    image[5] = (7,8,9)
+    image.setTiles(tiles,third)
+    introcs.assert_equals(bytes(3*len(image)),image.getBytes())
+    image.setTiles(third)
+    introcs.assert_equals((1,2,3),image[0])
+    introcs.assert_equals((0,0,0),image[5])
+    
+    # Writes through an array view are found by comparing
+    view = image.asArray()
+    tiles = image.getTiles()
+    view[0,1,0] = 99
+    introcs.assert_equals(bytes([99,0,0]),image.getTiles(tiles)[0][3:6])
+    
+    # Test enforcement
+    introcs.assert_error(image.setTiles,tiles[:2],
+                         message='setTiles does not enforce the precondition on tiles')
+
+
+def test_image_orientation():
+    """
+    Tests the orientation (transform, materialize, setOrientation) of class Image
+    """
+    print('Testing image orientation')
+    import random
+    width, height = 7, 5
+    data  = random.Random(6).randbytes(3*width*height)
+    names = ['transpose','reflectHori','reflectVert','rotateRight','rotateLeft']
+    for packed in (True,False):
+        rand = random.Random(7)
+        for trial in range(30):
+            steps = [rand.choice(names) for _ in range(rand.randint(1,4))]
+            image = a6image.Image(bytearray(data),width).copy(packed)
+            tiles = image.getTiles()
+            expected, w, h = data, width, height
+            for name in steps:
+                image.transform(a6engine.GEOMETRY[name])
+                expected = getattr(a6engine,name)(expected,w,h)
+                if a6engine.GEOMETRY[name][0]:
+                    w, h = h, w
+            
+            # Every accessor sees the transformed pixels
+            pixels = [tuple(expected[pos:pos+3]) for pos in range(0,len(expected),3)]
+            introcs.assert_equals((w,h),(image.getWidth(),image.getHeight()))
+            introcs.assert_equals(expected,image.getBytes())
+            introcs.assert_equals(pixels,image.getData())
+            introcs.assert_equals(pixels,list(image))
+            introcs.assert_equals(pixels[w+1],image.getPixel(1,1))
+            introcs.assert_equals(pixels[-1],image[len(image)-1])
+            introcs.assert_equals(expected,image.copy().getBytes())
+            introcs.assert_equals(packed,image.isPacked())
+            
+            # The stored pixels did not move
+            introcs.assert_true(all(a is b for (a,b) in zip(tiles,image.getTiles(tiles))))
+            
+            # Writes go to the right place
+            image.setPixel(h-1,0,(1,2,3))
+            image[1] = (4,5,6)
+            pixels[(h-1)*w] = (1,2,3)
+            pixels[1] = (4,5,6)
+            introcs.assert_equals(pixels,image.getData())
+            turned = image.getOrientation()
+            stored = image.getTiles()
+            
+            # Reads do not move the stored pixels
+            introcs.assert_equals(pixels[2*w:3*w],image.getRow(2))
+            introcs.assert_equals(pixels[w-1::w],image.getColumn(w-1))
+            span = b''.join(bytes(pixel) for pixel in pixels[w-2:2*w+1])
+            introcs.assert_equals(span,image._getSpan(w-2,w+3))
+            introcs.assert_equals(turned,image.getOrientation())
+            introcs.assert_true(all(a is b for (a,b) in zip(stored,image.getTiles(stored))))
+            introcs.assert_equals(pixels,image.getData())
+            
+            # Restoring stored pixels with their orientation
+            image.setTiles(stored)
+            image.setOrientation(turned,w)
+            introcs.assert_equals(pixels,image.getData())
+            image.setBytes(bytes(3*len(image)))
+            introcs.assert_equals(a6engine.IDENTITY,image.getOrientation())
+            introcs.assert_equals((0,0,0),image.getPixel(h-1,0))
+    
+    # Array views see a transform immediately
+    image = a6image.Image(bytearray(data),width)
+    view  = image.asArray()
+    image.transform(a6engine.GEOMETRY['reflectHori'])
+    introcs.assert_equals(a6engine.IDENTITY,image.getOrientation())
+    introcs.assert_equals(tuple(data[3*width-3:3*width]),tuple(view[0,0,ii] for ii in range(3)))
+    
+    # Test enforcement
+    introcs.assert_error(image.transform,'transpose',
+                         message='transform does not enforce the precondition on symmetry')
+    introcs.assert_error(image.setOrientation,(True,False),width,
+                         message='setOrientation does not enforce the precondition on symmetry')
+    introcs.assert_error(image.setOrientation,a6engine.IDENTITY,4,
+                         message='setOrientation does not enforce the precondition on width')
+
+
+def test_raw():
+    """
+    Tests the memory-mapped raw image format in module a6raw
+    """
+    import os
+    import tempfile
+    print('Testing raw image files')
+    p = [(255, 64, 0), (0, 255, 64), (64, 0, 255), (64, 255, 128), (128, 64, 255), (255, 128, 64)]
+    folder = tempfile.mkdtemp()
+    path = os.path.join(folder,'test.imr')
+    try:
+        image = a6image.Image(p,3)
+        a6raw.save(image,path)
+        introcs.assert_equals(a6raw.HEADER.size+18,os.path.getsize(path))
+        introcs.assert_true(a6raw.is_raw(path))
+        introcs.assert_false(a6raw.is_raw('test.png'))
+        
+        # Changes stay in memory by default
+        loaded = a6raw.load(path)
+        introcs.assert_true(loaded.isPacked())
+        introcs.assert_equals(3,loaded.getWidth())
+        introcs.assert_equals(2,loaded.getHeight())
+        introcs.assert_equals(p,loaded.getData())
+        loaded.setPixel(1,2,(1,2,3))
+        introcs.assert_equals((1,2,3),loaded.getPixel(1,2))
+        introcs.assert_equals(p,a6raw.load(path).getData())
+        
+        # Changes are written to the file with writeback
+        loaded = a6raw.load(path,True)
+        loaded.setPixel(1,2,(1,2,3))
+        loaded = None
+        introcs.assert_equals(p[:5]+[(1,2,3)],a6raw.load(path).getData())
+        
+        # An editor of the file maps it, and never changes it
+        q = p[:5]+[(1,2,3)]
+        editor = a6raw.edit(path,a6filter.Filter)
+        introcs.assert_equals(q,editor.getCurrent().getData())
+        introcs.assert_equals(q,editor.getOriginal().getData())
+        introcs.assert_true(editor.getMemoryUsage() < 3*len(q))
+        editor.perform('invert')
+        introcs.assert_equals([tuple(255-v for v in pixel) for pixel in q],editor.getCurrent().getData())
+        introcs.assert_equals(q,editor.getOriginal().getData())
+        introcs.assert_true(editor.undo())
+        introcs.assert_equals(q,editor.getCurrent().getData())
+        editor.perform('transpose')
+        editor.clear()
+        introcs.assert_equals(q,editor.getCurrent().getData())
+        introcs.assert_equals(q,a6raw.load(path).getData())
+        editor = None
+        
+        # Test enforcement
+        for (width, height) in ((0, 5), (5, 0)):
+            with open(path,'wb') as file:
+                file.write(a6raw.HEADER.pack(a6raw.SIGNATURE,width,height))
+            introcs.assert_error(a6raw.load,path,error=ValueError,
+                                 message='load does not reject empty images')
+        with open(path,'wb') as file:
+            file.write(b'not an image file')
+        introcs.assert_error(a6raw.load,path,error=ValueError,
+                             message='load does not reject other files')
+        introcs.assert_error(a6raw.edit,path,a6filter.Filter,error=ValueError,
+                             message='edit does not reject other files')
+        introcs.assert_error(a6raw.save,p,path,
+                             message='save does not enforce the precondition on image')
+    finally:
+        if os.path.exists(path):
+            os.remove(path)
+        os.rmdir(folder)
+
+
 ## All of these tests hava a familiar form
 
 def compare_images(image1,image2,file1,file2):
@@ -509,6 +1003,948 @@ def test_pixellate():
     compare_images(editor.getCurrent(),image2,file1,file2)
 
 
+def test_vectorize():
+    """
+    Tests that the whole-image filters match the pixel loops in class Filter
+    """
+    print('Testing whole-image (vectorized) filters')
+    import random
+    actions = [('invert',()), ('transpose',()), ('reflectHori',()), ('reflectVert',()),
+               ('rotateRight',()), ('rotateLeft',()), ('monochromify',(False,)),
+               ('monochromify',(True,)), ('jail',()), ('vignette',())]
+    
+    for (width, height) in [(60,60),(73,41),(41,73),(9,9)]:
+        data = bytearray(random.Random(width).randbytes(3*width*height))
+        for (name, args) in actions:
+            if name == 'vignette' and width != height:
+                continue    # vignette only produces valid colors on squares
+            loops  = a6filter.Filter(a6image.Image(list(zip(data[0::3],data[1::3],data[2::3])),width))
+            loops.VECTORIZE  = False
+            getattr(loops,name)(*args)
+            vector = a6filter.Filter(a6image.Image(bytearray(data),width))
+            vector.VECTORIZE = True
+            getattr(vector,name)(*args)
+            compare_images(vector.getCurrent(),loops.getCurrent(),
+                           name+' (vectorized)',name+' (loops)')
+
+
+def test_pipeline():
+    """
+    Tests that fused actions (chain and Pipeline) match the actions in turn in class Filter
+    """
+    print('Testing fused filter pipelines')
+    import random
+    geometry = ['transpose','reflectHori','reflectVert','rotateRight','rotateLeft']
+    colors   = [('invert',[]),('monochromify',[False]),('monochromify',[True])]
+    rand = random.Random(5)
+    for (width, height) in [(60,60),(73,41),(9,9),(1,7)]:
+        data = bytearray(rand.randbytes(3*width*height))
+        for trial in range(40):
+            actions = []
+            for pos in range(rand.randint(1,7)):
+                kind = rand.random()
+                if kind < 0.4:
+                    actions.append([rand.choice(geometry),[]])
+                elif kind < 0.85 or width != height:
+                    actions.append(list(rand.choice(colors)))
+                elif kind < 0.95:
+                    actions.append(['vignette',[]])  # only valid on squares
+                else:
+                    actions.append(['jail',[]])
+            steps = a6filter.Filter(a6image.Image(bytearray(data),width))
+            for (name, args) in actions:
+                getattr(steps,name)(*args)
+            fused = a6filter.Filter(a6image.Image(bytearray(data),width))
+            fused.chain(actions)
+            compare_images(fused.getCurrent(),steps.getCurrent(),
+                           'chain '+repr(actions),'each action in turn')
+    
+    # A pipeline is lazy, and applies as one recorded edit
+    width, height = 30, 30
+    data   = bytearray(rand.randbytes(3*width*height))
+    editor = a6filter.Filter(a6image.Image(bytearray(data),width))
+    pipeline = editor.pipeline().reflectHori().invert().monochromify(True)
+    introcs.assert_equals(pipeline,pipeline.rotateRight().vignette())
+    introcs.assert_equals(5,len(pipeline))
+    introcs.assert_equals(data,editor.getCurrent().getBytes())
+    actions = pipeline.getActions()
+    introcs.assert_equals([['reflectHori',[]],['invert',[]],['monochromify',[True]],
+                           ['rotateRight',[]],['vignette',[]]],actions)
+    pipeline.apply()
+    introcs.assert_equals(0,len(pipeline))
+    introcs.assert_equals(2,editor.getHistoryLength())
+    introcs.assert_equals([['chain',[actions]]],editor.getRecipe())
+    steps = a6filter.Filter(a6image.Image(bytearray(data),width))
+    for (name, args) in actions:
+        getattr(steps,name)(*args)
+    compare_images(editor.getCurrent(),steps.getCurrent(),'pipeline','each action in turn')
+    pipeline.apply()
+    introcs.assert_equals(2,editor.getHistoryLength())
+    editor.undo()
+    introcs.assert_equals(data,editor.getCurrent().getBytes())
+    
+    # Test enforcement
+    introcs.assert_error(editor.chain,'invert',
+                         message='chain does not enforce the precondition on actions')
+    introcs.assert_error(editor.chain,[['monochromify',['sepia']]],
+                         message='chain does not enforce the precondition on monochromify')
+    introcs.assert_error(pipeline.monochromify,1,
+                         message='monochromify does not enforce the precondition on sepia')
+    introcs.assert_error(a6filter.Pipeline,editor.getCurrent(),
+                         message='Pipeline does not enforce the precondition on editor')
+
+
+def test_lookup():
+    """
+    Tests the lookup tables (tone curves) in a6engine and class Filter
+    """
+    print('Testing lookup tables')
+    import random
+    rand = random.Random(19)
+    introcs.assert_true(a6engine.isTable(list(range(256))))
+    introcs.assert_false(a6engine.isTable(bytes(range(256))))
+    introcs.assert_false(a6engine.isTable(list(range(255))))
+    introcs.assert_false(a6engine.isTable([0]*255+[256]))
+    introcs.assert_false(a6engine.isTable([0.0]*256))
+    
+    # The tables match their formulas
+    identity = list(range(256))
+    introcs.assert_equals([255-v for v in range(256)],a6engine.INVERT)
+    introcs.assert_equals(identity,a6engine.gamma(1))
+    introcs.assert_equals(identity,a6engine.levels(0,255))
+    introcs.assert_equals(identity,a6engine.contrast(1))
+    introcs.assert_equals([128]*256,a6engine.contrast(0))
+    introcs.assert_equals([round(255*(v/255)**(1/2.2)) for v in range(256)],a6engine.gamma(2.2))
+    table = a6engine.levels(50,100)
+    introcs.assert_equals([0]*51,table[:51])
+    introcs.assert_equals([255]*156,table[100:])
+    introcs.assert_equals(round(255*25/50),table[75])
+    introcs.assert_equals([0]*128+[255]*128,a6engine.contrast(1000))
+    introcs.assert_equals([10]*256,a6engine.curve(lambda v: 10))
+    
+    # The brightness terms add up to exactly the brightness
+    terms = a6engine._BRIGHTNESS
+    for r in range(256):
+        for g in range(0,256,3):
+            b = (r*7+g) % 256
+            introcs.assert_equals(0.3*r+0.6*g+0.1*b,terms[0][r]+terms[1][g]+terms[2][b])
+    
+    # Tables applied to images match the formulas, with and without NumPy
+    width, height = 37, 23
+    data   = rand.randbytes(3*width*height)
+    pixels = list(zip(data[0::3],data[1::3],data[2::3]))
+    red, green, blue = [[rand.randrange(256) for v in range(256)] for ii in range(3)]
+    saved  = a6engine.numpy
+    try:
+        for numpy in (saved,None):
+            a6engine.numpy = numpy
+            result = a6engine.lookup(data,red,green,blue)
+            introcs.assert_equals([(red[r],green[g],blue[b]) for (r,g,b) in pixels],
+                                  list(zip(result[0::3],result[1::3],result[2::3])))
+            introcs.assert_equals(bytes(red[v] for v in data),a6engine.lookup(data,red))
+            introcs.assert_equals(bytes(255-v for v in data),a6engine.invert(data))
+            for sepia in (False,True):
+                result = a6engine.monochromify(data,sepia)
+                for pos in range(len(pixels)):
+                    (r,g,b) = pixels[pos]
+                    grey = 0.3*r+0.6*g+0.1*b
+                    expect = (int(grey),int(grey*0.6),int(grey*0.4)) if sepia else (int(grey),)*3
+                    introcs.assert_equals(expect,tuple(result[3*pos:3*pos+3]))
+    finally:
+        a6engine.numpy = saved
+    
+    # The actions match the pixel loops, and are recorded in the recipe
+    for (name, args) in [('tone',(red,)),('tone',(red,green,blue)),('curve',('invert',)),
+                         ('curve',('gamma',0.5)),('curve',('levels',20,200)),
+                         ('curve',('contrast',1.5))]:
+        loops  = a6filter.Filter(a6image.Image(list(pixels),width))
+        loops.VECTORIZE = False
+        getattr(loops,name)(*args)
+        vector = a6filter.Filter(a6image.Image(bytearray(data),width))
+        vector.perform(name,*args)
+        compare_images(vector.getCurrent(),loops.getCurrent(),name+' (vectorized)',name+' (loops)')
+        other = a6filter.Filter(a6image.Image(bytearray(data),width))
+        other.applyRecipe(vector.getRecipe())
+        introcs.assert_equals(vector.getCurrent().getBytes(),other.getCurrent().getBytes())
+    editor = a6filter.Filter(a6image.Image(bytearray(data),width))
+    editor.curve('invert')
+    introcs.assert_equals(a6engine.invert(data),editor.getCurrent().getBytes())
+    
+    # Test enforcement
+    introcs.assert_error(editor.tone,bytes(256),
+                         message='tone does not enforce the precondition on red')
+    introcs.assert_error(editor.tone,red,green,
+                         message='tone does not enforce the precondition on blue')
+    introcs.assert_error(editor.tone,red,green,[0]*256+[0],
+                         message='tone does not enforce the precondition on blue')
+    introcs.assert_error(editor.curve,'sharpen',
+                         message='curve does not enforce the precondition on name')
+    introcs.assert_error(a6engine.gamma,0,
+                         message='gamma does not enforce the precondition on value')
+    introcs.assert_error(a6engine.levels,100,100,
+                         message='levels does not enforce the precondition on high')
+    introcs.assert_error(a6engine.contrast,-1,
+                         message='contrast does not enforce the precondition on amount')
+
+
+def test_falloff():
+    """
+    Tests the cached vignette factors in a6engine
+    """
+    print('Testing cached vignette factors')
+    import math
+    import random
+    saved = a6engine.numpy
+    for (width, height) in [(9,9),(10,10),(1,1),(12,7),(7,12)]:
+        cc = height/2
+        cr = width/2
+        h  = math.sqrt((height-cr)**2 + (width-cc)**2)
+        for arrays in ([False,True] if saved else [False]):
+            factors, rows, cols = a6engine._falloff(width,height,arrays)
+            for row in range(height):
+                for col in range(width):
+                    d = math.sqrt((row-cr)**2 + (col-cc)**2)
+                    introcs.assert_equals(1-(d**2)/(h**2),factors[rows[row]][cols[col]])
+        if width == height:
+            # Only one quadrant is computed
+            introcs.assert_equals((width+2)//2,len(factors))
+            introcs.assert_equals((width+2)//2,len(factors[0]))
+        
+        # Both versions of vignette use the factors
+        data = random.Random(width).randbytes(3*width*height)
+        if width == height:
+            results = []
+            try:
+                for numpy in [saved,None]:
+                    a6engine.numpy = numpy
+                    results.append(a6engine.vignette(data,width,height))
+            finally:
+                a6engine.numpy = saved
+            introcs.assert_equals(results[0],results[1])
+    
+    # Repeated sizes reuse the factors, and the oldest sizes are evicted
+    a6engine._falloff.cache_clear()
+    for trial in range(3):
+        a6engine._falloff(64,64,False)
+    introcs.assert_equals(2,a6engine._falloff.cache_info().hits)
+    for size in range(1,a6engine.FALLOFF_CACHE+1):
+        a6engine._falloff(size,size,False)
+    introcs.assert_equals(a6engine.FALLOFF_CACHE,a6engine._falloff.cache_info().currsize)
+    a6engine._falloff(64,64,False)
+    introcs.assert_equals(2,a6engine._falloff.cache_info().hits)
+
+
+def test_summed_area():
+    """
+    Tests the summed-area tables in a6engine and the whole-image pixellate
+    """
+    print('Testing summed-area tables')
+    import random
+    rand  = random.Random(21)
+    saved = a6engine.numpy
+    width, height = 13, 9
+    data = rand.randbytes(3*width*height)
+    try:
+        for numpy in [saved,None]:
+            a6engine.numpy = numpy
+            for channel in range(3):
+                values = data[channel::3]
+                table  = a6engine.integral(data,width,height,channel)
+                for row in range(height+1):
+                    for col in range(width+1):
+                        total = sum(values[r*width+c] for r in range(row) for c in range(col))
+                        introcs.assert_equals(total,table[row][col])
+                sums = a6engine.boxsums(table,[0,2,8],[9,5,8],[1,0],[4,13])
+                for (i, (top, bottom)) in enumerate([(0,9),(2,5),(8,8)]):
+                    for (j, (left, right)) in enumerate([(1,4),(0,13)]):
+                        total = sum(values[r*width+c] for r in range(top,bottom) for c in range(left,right))
+                        introcs.assert_equals(total,sums[i][j])
+    finally:
+        a6engine.numpy = saved
+    
+    # Each block becomes its average (rounded down)
+    image  = a6image.Image([(0,0,0),(10,20,30),(255,255,255),(1,2,3),(5,5,5),(100,0,50)],3)
+    editor = a6filter.Filter(image)
+    editor.pixellate(2)
+    introcs.assert_equals([(4,6,9),(4,6,9),(177,127,152),(4,6,9),(4,6,9),(177,127,152)],
+                          list(editor.getCurrent()))
+    
+    # The whole-image pixellate matches the pixel loops
+    for (width, height) in [(20,20),(23,17),(1,9),(9,1)]:
+        data = bytearray(rand.randbytes(3*width*height))
+        for step in [1,2,3,7,20,50]:
+            loops = a6filter.Filter(a6image.Image(list(zip(data[0::3],data[1::3],data[2::3])),width))
+            loops.VECTORIZE = False
+            loops.pixellate(step)
+            for numpy in [saved,None]:
+                a6engine.numpy = numpy
+                try:
+                    vector = a6filter.Filter(a6image.Image(bytearray(data),width))
+                    vector.pixellate(step)
+                finally:
+                    a6engine.numpy = saved
+                compare_images(vector.getCurrent(),loops.getCurrent(),
+                               'pixellate '+str(step)+' (vectorized)','pixellate '+str(step)+' (loops)')
+    
+    # Test enforcement
+    introcs.assert_error(vector.pixellate,0,
+                         message='pixellate does not enforce the precondition on step')
+    introcs.assert_error(vector.pixellate,2.0,
+                         message='pixellate does not enforce the precondition on step')
+
+
+def test_convolution():
+    """
+    Tests the neighborhood filters (convolve, blur, gaussian, sharpen and edges) in class Filter
+    """
+    print('Testing convolution and blurs')
+    import random
+    rand = random.Random(22)
+    introcs.assert_true(a6engine.isKernel([[1]]))
+    introcs.assert_true(a6engine.isKernel([[1,2.5,1]]))
+    introcs.assert_true(a6engine.isKernel(a6engine.SHARPEN))
+    introcs.assert_false(a6engine.isKernel([[1,2]]))
+    introcs.assert_false(a6engine.isKernel([[1],[2]]))
+    introcs.assert_false(a6engine.isKernel([[1,2,1],[1,2]]))
+    introcs.assert_false(a6engine.isKernel([['1']]))
+    introcs.assert_false(a6engine.isKernel([]))
+    
+    # Separable kernels
+    introcs.assert_equals(([1.0,2.0,1.0],[1,2,1]),a6engine.separate([[1,2,1],[2,4,2],[1,2,1]]))
+    introcs.assert_equals(([1.0],[1,0,-1]),a6engine.separate([[1,0,-1]]))
+    introcs.assert_equals(None,a6engine.separate(a6engine.SHARPEN))
+    introcs.assert_equals(None,a6engine.separate([[0,0,0]]))
+    
+    # The boxes have about the variance of the Gaussian
+    for sigma in [0.5,1,2,3.7,10]:
+        radii = a6engine.radii(sigma)
+        introcs.assert_equals(3,len(radii))
+        variance = sum(((2*r+1)**2-1)/12 for r in radii)
+        introcs.assert_true(abs(variance-sigma*sigma) <= sigma+0.5)
+    
+    # The whole-image filters match the pixel loops, with and without NumPy
+    smooth = [[1/16,2/16,1/16],[2/16,4/16,2/16],[1/16,2/16,1/16]]
+    weights = [[rand.uniform(-1,1) for j in range(5)] for i in range(3)]
+    actions = [('convolve',([[0,0,0],[0,1,0],[0,0,0]],)),('convolve',(smooth,)),
+               ('convolve',([[1,0,-1]],)),('convolve',([[1],[3],[1]],)),
+               ('convolve',(weights,)),('sharpen',()),('edges',()),('blur',(0,)),
+               ('blur',(1,)),('blur',(2,)),('blur',(30,)),('gaussian',(1.5,))]
+    saved = a6engine.numpy
+    for (width, height) in [(13,9),(1,7),(7,1),(4,4)]:
+        data = bytearray(rand.randbytes(3*width*height))
+        for (name, args) in actions:
+            loops = a6filter.Filter(a6image.Image(list(zip(data[0::3],data[1::3],data[2::3])),width))
+            loops.VECTORIZE = False
+            getattr(loops,name)(*args)
+            for numpy in [saved,None]:
+                a6engine.numpy = numpy
+                try:
+                    vector = a6filter.Filter(a6image.Image(bytearray(data),width))
+                    getattr(vector,name)(*args)
+                finally:
+                    a6engine.numpy = saved
+                compare_images(vector.getCurrent(),loops.getCurrent(),name+' (vectorized)',name+' (loops)')
+    
+    # Known results
+    image  = a6image.Image([(0,0,0),(10,20,30),(255,255,255),(1,2,3),(5,5,5),(100,0,50)],3)
+    editor = a6filter.Filter(image.copy())
+    editor.blur(0)
+    introcs.assert_equals(list(image),list(editor.getCurrent()))
+    editor.blur(5)
+    introcs.assert_equals([(62,47,57)]*6,list(editor.getCurrent()))
+    editor = a6filter.Filter(a6image.Image(bytearray([100,100,100]*25),5))
+    editor.edges()
+    introcs.assert_equals(bytes(75),editor.getCurrent().getBytes())
+    
+    # The filters are edits, and are recorded in the recipe
+    data   = bytearray(rand.randbytes(3*20*10))
+    editor = a6filter.Filter(a6image.Image(bytearray(data),20))
+    editor.perform('gaussian',2)
+    editor.perform('convolve',smooth)
+    editor.perform('sharpen')
+    introcs.assert_equals(4,editor.getHistoryLength())
+    other = a6filter.Filter(a6image.Image(bytearray(data),20))
+    other.applyRecipe(editor.getRecipe())
+    introcs.assert_equals(editor.getCurrent().getBytes(),other.getCurrent().getBytes())
+    
+    # Test enforcement
+    introcs.assert_error(editor.convolve,[[1,1]],
+                         message='convolve does not enforce the precondition on kernel')
+    introcs.assert_error(editor.blur,-1,
+                         message='blur does not enforce the precondition on radius')
+    introcs.assert_error(editor.blur,1.0,
+                         message='blur does not enforce the precondition on radius')
+    introcs.assert_error(editor.gaussian,0,
+                         message='gaussian does not enforce the precondition on sigma')
+
+
+def test_parallel():
+    """
+    Tests the band-parallel filters in a6parallel
+    """
+    print('Testing parallel filters')
+    import random
+    rand = random.Random(23)
+    introcs.assert_equals([(0,25),(25,50),(50,75),(75,100)],a6parallel.split('invert',(),100,4))
+    introcs.assert_equals([(0,2),(2,5),(5,8)],a6parallel.split('blur',(2,),8,3))
+    introcs.assert_equals([(0,1)],a6parallel.split('invert',(),1,4))
+    introcs.assert_equals([(0,10),(10,30)],a6parallel.split('pixellate',(10,),30,2))
+    introcs.assert_equals([(0,7)],a6parallel.split('pixellate',(10,),7,4))
+    for count in range(1,8):
+        bands = a6parallel.split('pixellate',(3,),29,count)
+        introcs.assert_equals(0,bands[0][0])
+        introcs.assert_equals(29,bands[-1][1])
+        for pos in range(len(bands)):
+            introcs.assert_equals(0,bands[pos][0] % 3)
+            introcs.assert_true(bands[pos][0] < bands[pos][1])
+            if pos > 0:
+                introcs.assert_equals(bands[pos-1][1],bands[pos][0])
+    introcs.assert_equals(5,a6parallel.halo('blur',(5,)))
+    introcs.assert_equals(2,a6parallel.halo('convolve',([[1]*3]*5,)))
+    introcs.assert_equals(0,a6parallel.halo('vignette',()))
+    
+    # The bands (with their halos) stitch into the whole image
+    width, height = 16, 16
+    data  = rand.randbytes(3*width*height)
+    table = [rand.randrange(256) for v in range(256)]
+    filters = [('invert',()),('monochromify',(True,)),('tone',(table,None,None)),
+               ('vignette',()),('pixellate',(3,)),('blur',(2,)),('blur',(20,)),
+               ('convolve',(a6engine.SHARPEN,)),('convolve',([[1,2,3,2,1]],))]
+    saved = a6engine.numpy
+    try:
+        for numpy in [saved,None]:
+            a6engine.numpy = numpy
+            for (name, args) in filters:
+                whole = a6parallel.compute(name,data,width,height,0,args)
+                for count in [2,3,5]:
+                    result = b''
+                    for (top, bottom) in a6parallel.split(name,args,height,count):
+                        extra = a6parallel.halo(name,args)
+                        first = max(0,top-extra)
+                        last  = min(height,bottom+extra)
+                        band  = a6parallel.compute(name,data[3*width*first:3*width*last],
+                                                   width,height,first,args)
+                        result += band[3*width*(top-first):3*width*(bottom-first)]
+                    introcs.assert_equals(whole,result)
+    finally:
+        a6engine.numpy = saved
+    
+    # The workers compute the same filters
+    with a6parallel.Executor(3) as executor:
+        introcs.assert_equals(3,executor.getWorkers())
+        for (name, args) in filters:
+            introcs.assert_equals(a6parallel.compute(name,data,width,height,0,args),
+                                  executor.run(name,data,width,height,args))
+        serial = a6filter.Filter(a6image.Image(bytearray(data),width))
+        editor = a6filter.Filter(a6image.Image(bytearray(data),width))
+        editor.EXECUTOR = executor
+        for (name, args) in [('invert',()),('vignette',()),('blur',(1,)),('gaussian',(2,)),
+                             ('rotateLeft',()),('monochromify',(False,)),('pixellate',(4,))]:
+            serial.perform(name,*args)
+            editor.perform(name,*args)
+            introcs.assert_equals(serial.getCurrent().getBytes(),editor.getCurrent().getBytes())
+        executor.close()
+        introcs.assert_equals(a6engine.invert(data),executor.run('invert',data,width,height,()))
+    introcs.assert_true(a6parallel.Executor().getWorkers() >= 1)
+    introcs.assert_false(executor.isThreaded())
+    
+    # So do threads
+    with a6parallel.Executor(4,True) as executor:
+        introcs.assert_true(executor.isThreaded())
+        for (name, args) in filters:
+            introcs.assert_equals(a6parallel.compute(name,data,width,height,0,args),
+                                  executor.run(name,data,width,height,args))
+        serial = a6filter.Filter(a6image.Image(bytearray(data),width))
+        editor = a6filter.Filter(a6image.Image(bytearray(data),width))
+        editor.EXECUTOR = executor
+        for (name, args) in [('monochromify',(True,)),('transpose',()),('vignette',()),('sharpen',())]:
+            serial.perform(name,*args)
+            editor.perform(name,*args)
+            introcs.assert_equals(serial.getCurrent().getBytes(),editor.getCurrent().getBytes())
+    
+    # Test enforcement
+    introcs.assert_error(a6parallel.Executor,0,
+                         message='Executor does not enforce the precondition on workers')
+    introcs.assert_error(a6parallel.Executor,2,1,
+                         message='Executor does not enforce the precondition on threads')
+    introcs.assert_error(executor.run,'transpose',data,width,height,(),
+                         message='run does not enforce the precondition on name')
+
+
+def test_history():
+    """
+    Tests the edit history (increment, undo and clear) in class Editor
+    """
+    print('Testing the edit history')
+    import random
+    width, height = 137, 73     # Several tiles
+    data  = random.Random(0).randbytes(3*width*height)
+    image = a6image.Image(list(zip(data[0::3],data[1::3],data[2::3])),width)
+    for packed in (False,True):
+        editor = a6filter.Filter(image.copy(packed))
+        introcs.assert_equals(1,editor.getHistoryLength())
+        introcs.assert_false(editor.undo())
+        
+        # Whole image, partial and shape changing edits
+        states = [(editor.getCurrent().getWidth(),editor.getCurrent().getData())]
+        for action in ['invert','jail','transpose','jail','reflectVert','rotateLeft','jail']:
+            editor.increment()
+            getattr(editor,action)()
+            states.append((editor.getCurrent().getWidth(),editor.getCurrent().getData()))
+            introcs.assert_equals(len(states),editor.getHistoryLength())
+        
+        while len(states) > 1:
+            states.pop()
+            introcs.assert_true(editor.undo())
+            current = editor.getCurrent()
+            introcs.assert_equals(states[-1],(current.getWidth(),current.getData()))
+            introcs.assert_equals(packed,current.isPacked())
+        introcs.assert_false(editor.undo())
+        introcs.assert_equals(image.getData(),editor.getCurrent().getData())
+        
+        # The oldest edits are deleted
+        editor.MAX_HISTORY = 3
+        for _ in range(5):
+            editor.increment()
+            editor.invert()
+        introcs.assert_equals(3,editor.getHistoryLength())
+        introcs.assert_true(editor.undo())
+        introcs.assert_true(editor.undo())
+        introcs.assert_false(editor.undo())
+        introcs.assert_equals([tuple(255-v for v in p) for p in image],editor.getCurrent().getData())
+        
+        editor.increment()
+        editor.transpose()
+        editor.clear()
+        introcs.assert_equals(1,editor.getHistoryLength())
+        introcs.assert_equals(width,editor.getCurrent().getWidth())
+        introcs.assert_equals(image.getData(),editor.getCurrent().getData())
+        introcs.assert_false(editor.getCurrent() is editor.getOriginal())
+
+
+def test_history_budget():
+    """
+    Tests the edit history of class Editor with a memory budget
+    """
+    print('Testing the edit history with a budget')
+    width = 120     # A gradient, which compresses well
+    data  = bytes(v for pos in range(width*width) for v in (pos//width,pos % width,pos//97))
+    image = a6image.Image(bytearray(data),width)
+    size  = 3*len(image)
+    for method in ('zlib','lzma'):
+        editor = a6filter.Filter(image,2*size)
+        editor.COMPRESSION = method
+        introcs.assert_equals(2*size,editor.getBudget())
+        states = [editor.getCurrent().getBytes()]
+        for action in ['invert','jail','transpose','reflectVert','invert','rotateLeft','jail']:
+            editor.increment()
+            getattr(editor,action)()
+            states.append(editor.getCurrent().getBytes())
+            introcs.assert_true(editor.getMemoryUsage() <= 2*size)
+        
+        # Nothing is deleted until the budget is used up
+        introcs.assert_equals(len(states),editor.getHistoryLength())
+        introcs.assert_true(editor.getDiskUsage() >= 0)
+        while editor.undo():
+            states.pop()
+            introcs.assert_equals(states[-1],editor.getCurrent().getBytes())
+        introcs.assert_equals(1,len(states))
+        
+        # Older images move to disk when compressing is not enough
+        editor = a6filter.Filter(image,3*size//2)
+        for _ in range(4):
+            editor.increment()
+            editor.transpose()
+            editor.getCurrent().materialize()   # Move the pixels, changing every tile
+        introcs.assert_equals(5,editor.getHistoryLength())
+        introcs.assert_true(editor.getDiskUsage() > 0)
+        introcs.assert_true(editor.getMemoryUsage() <= 3*size//2)
+        editor.clear()
+        introcs.assert_equals(0,editor.getDiskUsage())
+        introcs.assert_equals(data,editor.getCurrent().getBytes())
+        
+        # The space of deleted images is freed and reused
+        states = [data]
+        for _ in range(6):
+            editor.increment()
+            editor.transpose()
+            editor.getCurrent().materialize()
+            editor.invert()
+            states.append(editor.getCurrent().getBytes())
+        peak = editor.getDiskUsage()
+        for _ in range(3):
+            editor.discard()
+            states.pop()
+            introcs.assert_equals(states[-1],editor.getCurrent().getBytes())
+        introcs.assert_true(editor.getDiskUsage() < peak)
+        for _ in range(3):
+            editor.increment()
+            editor.transpose()
+            editor.getCurrent().materialize()
+            editor.invert()
+            states.append(editor.getCurrent().getBytes())
+        introcs.assert_true(editor.getDiskUsage() <= peak)
+        while editor.undo():
+            states.pop()
+            introcs.assert_equals(states[-1],editor.getCurrent().getBytes())
+        editor.clear()
+        
+        # The oldest edits are deleted when nothing else fits
+        editor = a6filter.Filter(image,size//2)
+        for _ in range(3):
+            editor.increment()
+            editor.invert()
+        introcs.assert_equals(2,editor.getHistoryLength())
+    
+    # A spill file reuses freed extents, and compacts the rest
+    spill = a6editor.SpillFile()
+    offsets = [spill.write(bytes([ii])*(10+ii)) for ii in range(4)]
+    introcs.assert_equals([0,10,21,33],offsets)
+    introcs.assert_equals(46,spill.getSize())
+    spill.retain({0,21,33})
+    introcs.assert_equals((46,11),(spill.getSize(),spill.getFree()))
+    introcs.assert_equals(10,spill.write(b'new'))
+    introcs.assert_equals((46,8),(spill.getSize(),spill.getFree()))
+    spill.retain({0,10,21})
+    introcs.assert_equals((33,8),(spill.getSize(),spill.getFree()))
+    introcs.assert_equals({0:0,10:10,21:13},spill.compact())
+    introcs.assert_equals((25,0),(spill.getSize(),spill.getFree()))
+    introcs.assert_equals(b'new'+bytes([2])*12,spill.read(10,15))
+    spill.retain(set())
+    introcs.assert_equals(0,spill.getSize())
+    spill.close()
+    
+    # Test enforcement
+    introcs.assert_error(a6filter.Filter,image,0,
+                         message='Editor does not enforce the precondition on budget')
+    introcs.assert_error(a6filter.Filter,image,1.5,
+                         message='Editor does not enforce the precondition on budget')
+
+
+def test_history_tree():
+    """
+    Tests redo and the branches of the edit history in class Editor
+    """
+    print('Testing redo and branches')
+    import random
+    width, height = 91, 67
+    data   = random.Random(1).randbytes(3*width*height)
+    editor = a6filter.Filter(a6image.Image(bytearray(data),width))
+    base   = editor.getPosition()
+    
+    def state():
+        return (editor.getCurrent().getWidth(),editor.getCurrent().getBytes())
+    
+    # Undo and redo along one branch
+    states = [state()]
+    for action in ['invert','transpose','jail']:
+        editor.increment()
+        getattr(editor,action)()
+        states.append(state())
+    introcs.assert_false(editor.redo())
+    for pos in range(2,-1,-1):
+        introcs.assert_true(editor.undo())
+        introcs.assert_equals(states[pos],state())
+    introcs.assert_equals(1,editor.getBranchCount())
+    for pos in range(1,4):
+        introcs.assert_true(editor.redo())
+        introcs.assert_equals(states[pos],state())
+        introcs.assert_equals(pos+1,editor.getHistoryLength())
+    introcs.assert_false(editor.redo())
+    first = editor.getPosition()
+    
+    # An edit after an undo starts a new branch
+    editor.undo()
+    editor.undo()
+    editor.increment()
+    editor.reflectVert()
+    second = editor.getPosition()
+    other  = state()
+    introcs.assert_equals(3,editor.getHistoryLength())
+    introcs.assert_equals(5,editor.getTreeSize())
+    editor.undo()
+    introcs.assert_equals(2,editor.getBranchCount())
+    introcs.assert_true(editor.redo())          # The latest branch
+    introcs.assert_equals(other,state())
+    
+    # Switching branches
+    editor.goto(first)
+    introcs.assert_equals(states[3],state())
+    introcs.assert_equals(4,editor.getHistoryLength())
+    editor.goto(second)
+    introcs.assert_equals(other,state())
+    editor.goto(base)
+    introcs.assert_equals(states[0],state())
+    introcs.assert_true(editor.redo())          # Towards the last goto
+    introcs.assert_equals(states[1],state())
+    
+    # The oldest branch is deleted first
+    editor.goto(second)
+    editor.MAX_HISTORY = 4
+    editor.increment()
+    editor.invert()
+    introcs.assert_equals(4,editor.getTreeSize())
+    introcs.assert_equals(4,editor.getHistoryLength())
+    introcs.assert_error(editor.goto,first,
+                         message='goto does not reject deleted images')
+    editor.increment()
+    editor.invert()
+    introcs.assert_equals(4,editor.getTreeSize())
+    introcs.assert_error(editor.goto,base,
+                         message='goto does not reject deleted images')
+    
+    # A discarded edit cannot be redone
+    editor.MAX_HISTORY = 20
+    count = editor.getTreeSize()
+    editor.increment()
+    editor.transpose()
+    introcs.assert_true(editor.discard())
+    introcs.assert_equals(count,editor.getTreeSize())
+    introcs.assert_false(editor.redo())
+    
+    # Discarding under a budget (which deletes images in the move)
+    small = a6filter.Filter(a6image.Image(bytearray(data),width),int(0.8*len(data)))
+    for _ in range(3):
+        small.perform('invert')
+    before = (small.getCurrent().getWidth(),small.getCurrent().getBytes())
+    introcs.assert_error(small.perform,'pixellate',0,
+                         message='perform does not raise the error of the action')
+    introcs.assert_equals(before,(small.getCurrent().getWidth(),small.getCurrent().getBytes()))
+    introcs.assert_equals(len(small._nodes())-1,small.getTreeSize())
+    introcs.assert_false(small.redo())
+
+    editor.clear()
+    introcs.assert_equals(1,editor.getTreeSize())
+    introcs.assert_equals(states[0],state())
+    
+    # Test enforcement
+    introcs.assert_error(editor.goto,'node',
+                         message='goto does not enforce the precondition on node')
+    introcs.assert_error(editor.goto,second,
+                         message='goto does not reject images of another history')
+
+
+def test_history_replay():
+    """
+    Tests the recorded actions and recipes of class Editor
+    """
+    print('Testing replayed history')
+    import random, tempfile, os
+    width, height = 83, 59
+    data   = random.Random(2).randbytes(3*width*height)
+    editor = a6filter.Filter(a6image.Image(bytearray(data),width),checkpoint=3)
+    introcs.assert_equals(3,editor.getCheckpoint())
+    introcs.assert_equals([],editor.getRecipe())
+    
+    def state():
+        return (editor.getCurrent().getWidth(),editor.getCurrent().getBytes())
+    
+    # Only every third image is kept, but every image can be restored
+    actions = [('invert',),('transpose',),('monochromify',True),('reflectHori',),
+               ('jail',),('rotateLeft',),('monochromify',False)]
+    states = [state()]
+    for action in actions:
+        editor.perform(*action)
+        states.append(state())
+    kept = [node._tiles is None for node in editor._nodes()[1:]]
+    introcs.assert_equals([False,True,True,False,True,True,False,False],kept)
+    for pos in range(len(actions)-1,-1,-1):
+        editor.undo()
+        introcs.assert_equals(states[pos],state())
+    for pos in range(1,len(actions)+1):
+        editor.redo()
+        introcs.assert_equals(states[pos],state())
+    editor.goto(editor._nodes()[2])
+    introcs.assert_equals(states[1],state())
+    editor.goto(editor._nodes()[-1])
+    introcs.assert_equals(states[-1],state())
+    
+    # The recipe repeats the edits on another image
+    recipe = editor.getRecipe()
+    introcs.assert_equals([list(action[:1])+[list(action[1:])] for action in actions],recipe)
+    filename = os.path.join(tempfile.mkdtemp(),'recipe.json')
+    a6editor.writeRecipe(recipe,filename)
+    introcs.assert_equals(recipe,a6editor.readRecipe(filename))
+    other = a6filter.Filter(a6image.Image(bytearray(data),width))
+    other.applyRecipe(a6editor.readRecipe(filename))
+    os.remove(filename)
+    introcs.assert_equals(states[-1][1],other.getCurrent().getBytes())
+    introcs.assert_equals(len(actions)+1,other.getHistoryLength())
+    
+    # Deleting old images keeps the oldest one
+    editor.MAX_HISTORY = 4
+    editor.perform('invert')
+    introcs.assert_equals(4,editor.getHistoryLength())
+    editor.undo()
+    editor.undo()
+    editor.undo()
+    introcs.assert_equals(states[-3],state())
+    introcs.assert_equals([],editor.getRecipe())
+    editor.redo()
+    editor.redo()
+    editor.redo()
+    
+    # A failed action is not kept, and an unrecorded edit has no recipe
+    before = state()
+    introcs.assert_error(editor.perform,'invert',0,error=TypeError,
+                         message='perform does not raise the error of the action')
+    introcs.assert_equals(before,state())
+    introcs.assert_equals(['invert',[]],editor.getRecipe()[-1])
+    introcs.assert_false(editor.redo())
+    editor.increment()
+    editor.invert()
+    introcs.assert_equals(None,editor.getRecipe())
+    
+    # Under a budget, an undo can always be redone (older images go first)
+    small  = a6filter.Filter(a6image.Image(bytearray(data),width),int(0.8*len(data)),2)
+    states = [(small.getCurrent().getWidth(),small.getCurrent().getBytes())]
+    for action in [('invert',),('transpose',),('monochromify',True)]:
+        small.perform(*action)
+        states.append((small.getCurrent().getWidth(),small.getCurrent().getBytes()))
+    length = small.getHistoryLength()
+    for pos in range(length-1):
+        introcs.assert_true(small.undo())
+        introcs.assert_equals(states[-2-pos],(small.getCurrent().getWidth(),small.getCurrent().getBytes()))
+    for pos in range(length-1):
+        introcs.assert_true(small.redo())
+    introcs.assert_equals(states[-1],(small.getCurrent().getWidth(),small.getCurrent().getBytes()))
+    introcs.assert_false(small.redo())
+    
+    # Test enforcement
+    introcs.assert_error(a6filter.Filter,a6image.Image(bytearray(data),width),None,0,
+                         message='Editor does not enforce the precondition on checkpoint')
+    introcs.assert_error(editor.perform,'missing',
+                         message='perform does not enforce the precondition on name')
+    introcs.assert_error(editor.applyRecipe,'invert',
+                         message='applyRecipe does not enforce the precondition on recipe')
+
+
+def test_session():
+    """
+    Tests saving and loading an edit history in module a6session
+    """
+    print('Testing session files')
+    import os
+    import random
+    import tempfile
+    width, height = 77, 53
+    data   = random.Random(4).randbytes(3*width*height)
+    editor = a6filter.Filter(a6image.Image(bytearray(data),width))
+    folder = tempfile.mkdtemp()
+    
+    def state(editor):
+        return (editor.getCurrent().getWidth(),editor.getCurrent().getBytes())
+    
+    # Recorded and unrecorded edits, with checkpoints in between
+    states = [state(editor)]
+    for action in [('invert',),('transpose',),('monochromify',True),('reflectHori',),
+                   ('jail',),('rotateLeft',),('monochromify',False)]:
+        editor.perform(*action)
+        states.append(state(editor))
+    recipe = editor.getRecipe()
+    editor.increment()
+    editor.reflectVert()
+    states.append(state(editor))
+    filename = os.path.join(folder,'session.ims')
+    introcs.assert_true(a6session.is_session(filename))
+    a6session.save(editor,filename)
+    
+    other = a6session.load(filename,a6filter.Filter)
+    introcs.assert_equals(states[-1],state(other))
+    introcs.assert_equals(data,other.getOriginal().getBytes())
+    introcs.assert_equals(len(states),other.getHistoryLength())
+    for pos in range(len(states)-2,-1,-1):
+        introcs.assert_true(other.undo())
+        introcs.assert_equals(states[pos],state(other))
+    introcs.assert_false(other.undo())
+    for pos in range(1,len(states)):
+        introcs.assert_true(other.redo())
+        introcs.assert_equals(states[pos],state(other))
+    other.undo()
+    introcs.assert_equals(recipe,other.getRecipe())
+    
+    # A history whose oldest image is not the original
+    editor.MAX_HISTORY = 3
+    editor.perform('invert')
+    a6session.save(editor,filename)
+    other = a6session.load(filename,a6filter.Filter)
+    introcs.assert_equals(state(editor),state(other))
+    introcs.assert_equals(3,other.getHistoryLength())
+    other.undo()
+    other.undo()
+    introcs.assert_equals(states[-2],state(other))
+    other.clear()
+    introcs.assert_equals(data,other.getCurrent().getBytes())
+    
+    # Loading never changes the file
+    size = os.path.getsize(filename)
+    other = a6session.load(filename,a6filter.Filter)
+    other.perform('invert')
+    other = a6session.load(filename,a6filter.Filter)
+    introcs.assert_equals(state(editor),state(other))
+    introcs.assert_equals(size,os.path.getsize(filename))
+    
+    # Saving over a loaded session does not change the editor loaded from it
+    other = a6session.load(filename,a6filter.Filter)
+    introcs.assert_true(other.getMemoryUsage() < len(data))
+    a6session.save(a6filter.Filter(a6image.Image(bytearray(len(data)),width)),filename)
+    introcs.assert_equals(state(editor),state(other))
+    other.clear()
+    introcs.assert_equals(data,other.getCurrent().getBytes())
+    introcs.assert_equals(bytes(len(data)),a6session.load(filename).getCurrent().getBytes())
+    introcs.assert_false(os.path.exists(filename+'.part'))
+    
+    # The editor of a session adopts its images, and reads its tiles from the file
+    original = a6image.Image(bytearray(data),width)
+    current  = original.copy()
+    base     = a6image.split_tiles(data)
+    entry    = {'action' : None, 'width' : width, 'orient' : list(a6engine.IDENTITY)}
+    adopted  = a6filter.Filter.fromSession(original,base,current,[(entry,base)])
+    introcs.assert_true(adopted.getCurrent() is current)
+    introcs.assert_true(adopted.getOriginal() is original)
+    introcs.assert_true(adopted.getMemoryUsage() < len(data))
+    adopted.perform('invert')
+    introcs.assert_true(adopted.getCurrent() is current)
+    introcs.assert_true(adopted.undo())
+    introcs.assert_equals(data,current.getBytes())
+    adopted.perform('transpose')
+    adopted.clear()
+    introcs.assert_equals(state(a6filter.Filter(original)),state(adopted))
+    introcs.assert_error(a6filter.Filter.fromSession,original,base,original,[(entry,base)],
+                         message='fromSession does not enforce the precondition on current')
+    introcs.assert_error(a6filter.Filter.fromSession,original,base,current,[(entry,None)],
+                         message='fromSession does not enforce the precondition on path')
+    introcs.assert_error(list,editor.toSession(0),
+                         message='toSession does not enforce the precondition on interval')
+    
+    # Test enforcement
+    bad = os.path.join(folder,'bad.ims')
+    with open(bad,'wb') as file:
+        file.write(b'not a session file')
+    introcs.assert_error(a6session.load,bad,error=ValueError,
+                         message='load does not reject files that are not sessions')
+    images = '"images": [[%d, %d, %d]]' % (a6session.HEADER.size,width,height)
+    for index in ('[]', '{"budget": null}', '{"budget": 0, "checkpoint": null, '+images+', "path": []}',
+                  '{"budget": null, "checkpoint": null, '+images+', "path": [{"image": 0}]}',
+                  '{"budget": null, "checkpoint": null, '+images+', "path": [{"action": null, '+
+                  '"image": 0, "width": %d, "orient": [false, false, false]}]}' % width):
+        index = index.encode('utf-8')
+        with open(bad,'wb') as file:
+            file.write(a6session.HEADER.pack(a6session.SIGNATURE,a6session.HEADER.size+len(data),len(index)))
+            file.write(data+index)
+        introcs.assert_error(a6session.load,bad,error=ValueError,
+                             message='load does not reject the index '+repr(index))
+    introcs.assert_error(a6session.save,'editor',filename,
+                         message='save does not enforce the precondition on editor')
+    introcs.assert_error(a6session.load,filename,a6image.Image,
+                         message='load does not enforce the precondition on kind')
+    del other
+    os.remove(filename)
+    os.remove(bad)
+    os.rmdir(folder)
+
+
+
 def test_encode():
     """
     Tests the method encode in class Encoder
@@ -586,6 +2022,120 @@ def test_decode():
     introcs.assert_equals(None,result)
 
 
+def test_batch():
+    """
+    Tests the headless batch processing in module a6batch
+    """
+    print('Testing batch processing')
+    import contextlib
+    import io
+    import os
+    import random
+    import tempfile
+    
+    # Parsing actions
+    introcs.assert_equals([['monochromify',[True]],['vignette',[]]],
+                          a6batch.parse('monochromify:sepia, vignette'))
+    introcs.assert_equals([['pixellate',[8]],['curve',['gamma',2.2]],['monochromify',[False]]],
+                          a6batch.parse('pixellate:8,curve:gamma:2.2,monochromify:grey'))
+    introcs.assert_equals([['encode',['hello: world']]],a6batch.parse('encode:hello: world'))
+    introcs.assert_equals([['curve',['levels',16,240]]],a6batch.parse('curve:levels:16:240'))
+    
+    # A scratch editor edits its image in place
+    image  = a6image.Image(bytearray(range(30)),5)
+    editor = a6filter.Filter(image.copy())
+    editor.chain([['invert',[]],['transpose',[]]])
+    scratch = a6filter.Filter.scratch(image)
+    scratch.chain([['invert',[]],['transpose',[]]])
+    introcs.assert_true(scratch.getCurrent() is image)
+    introcs.assert_equals((2,5),(image.getWidth(),image.getHeight()))
+    introcs.assert_equals(editor.getCurrent().getBytes(),image.getBytes())
+    
+    # Every file is processed like a chain of the actions
+    width, height = 41, 41
+    folder = tempfile.mkdtemp()
+    output = os.path.join(folder,'out')
+    os.mkdir(output)
+    files  = []
+    for seed in range(3):
+        files.append(os.path.join(folder,'image'+str(seed)+a6raw.EXTENSION))
+        a6raw.save(a6image.Image(bytearray(random.Random(seed).randbytes(3*width*height)),width),files[-1])
+    actions = a6batch.parse('monochromify:sepia,vignette,rotateLeft,pixellate:4,encode:hello')
+    expected = {}
+    for source in files:
+        editor = a6encode.Encoder(a6raw.load(source))
+        editor.chain(actions[:-1])
+        editor.encode('hello')
+        expected[source] = editor.getCurrent().getBytes()
+    
+    for workers in (1, 2):
+        results = list(a6batch.run(files,actions,output,workers))
+        introcs.assert_equals(sorted(files),sorted(result[0] for result in results))
+        for (source, target, pixels, seconds, error) in results:
+            introcs.assert_equals(None,error)
+            introcs.assert_equals(width*height,pixels)
+            introcs.assert_equals(os.path.join(output,os.path.basename(source)),target)
+            introcs.assert_equals(expected[source],a6raw.load(target).getBytes())
+            introcs.assert_equals('hello',a6encode.Encoder(a6raw.load(target)).decode())
+    
+    # Failures are reported without stopping the batch
+    bad = os.path.join(folder,'bad'+a6raw.EXTENSION)
+    with open(bad,'wb') as file:
+        file.write(b'not an image file')
+    results = list(a6batch.run([bad]+files[:1],actions,output,1))
+    introcs.assert_true(not results[0][4] is None)
+    introcs.assert_equals(None,results[1][4])
+    introcs.assert_true(not list(a6batch.run(files[:1],actions,folder,1))[0][4] is None)
+    introcs.assert_true(not list(a6batch.run(files[:1],[['encode',['x'*9999]]],output,1))[0][4] is None)
+    introcs.assert_true(not list(a6batch.run(files[:1],[['pixellate',[0]]],output,1))[0][4] is None)
+    introcs.assert_true(not list(a6batch.run(files[:1],[['pixellate',[]]],output,1))[0][4] is None)
+    introcs.assert_true(not list(a6batch.run(files[:1],[['pixellate',[]]],output,2))[0][4] is None)
+    
+    # A missing argument is a usage error, before any file is processed
+    for ops in ('pixellate','monochromify','curve:gamma','curve:levels:16','pixellate:2.5','invert:1'):
+        introcs.assert_error(a6batch.parse,ops,error=ValueError,
+                             message='parse does not reject '+repr(ops))
+    try:
+        with contextlib.redirect_stderr(io.StringIO()):
+            a6batch.main(['--ops','pixellate','-o',output]+files)
+        introcs.assert_true(False)
+    except SystemExit as e:
+        introcs.assert_equals(2,e.code)
+    introcs.assert_equals(random.Random(0).randbytes(3*width*height),a6raw.load(files[0]).getBytes())
+    
+    # Two files with the same name would have the same output
+    other = os.path.join(folder,'other')
+    os.mkdir(other)
+    copy  = os.path.join(other,os.path.basename(files[0]))
+    a6raw.save(a6raw.load(files[1]),copy)
+    introcs.assert_equals(a6batch.target(files[0],output),a6batch.target(copy,output))
+    for names in ([files[0],copy], [files[0],files[0]]):
+        empty = tempfile.mkdtemp()
+        try:
+            with contextlib.redirect_stderr(io.StringIO()):
+                a6batch.main(['--ops','invert','-o',empty]+names)
+            introcs.assert_true(False)
+        except SystemExit as e:
+            introcs.assert_equals(2,e.code)
+        introcs.assert_equals([],os.listdir(empty))
+        os.rmdir(empty)
+    os.remove(copy)
+    os.rmdir(other)
+    
+    # Test enforcement
+    introcs.assert_error(a6batch.parse,'blur:2,explode',error=ValueError,
+                         message='parse does not reject unknown actions')
+    introcs.assert_error(a6batch.parse,['invert'],message='parse does not enforce the precondition on ops')
+    introcs.assert_error(list,a6batch.run(files,actions,output,0),
+                         message='run does not enforce the precondition on workers')
+    for name in os.listdir(output):
+        os.remove(os.path.join(output,name))
+    os.rmdir(output)
+    for name in os.listdir(folder):
+        os.remove(os.path.join(folder,name))
+    os.rmdir(folder)
+
+
 def test_all():
     """
     Execute all of the test cases.
@@ -602,21 +2152,47 @@ def test_all():
     test_image_access()
     test_image_str()
     test_image_other()
+    test_image_packed()
+    test_image_rows()
+    test_image_release()
+    test_image_bytes()
+    test_image_region()
+    test_image_array()
+    test_image_tiles()
+    test_image_orientation()
+    test_raw()
     print('Class Image passed all tests.')
     print()
     
+    print('Testing class Editor')
+    test_history()
+    test_history_budget()
+    test_history_tree()
+    test_history_replay()
+    test_session()
+    print('Class Editor passed all tests.')
+    print()
+    
     print('Testing class Filter')
     test_reflect_vert()
     test_monochromify()
     test_jail()
     test_vignette()
+    test_vectorize()
+    test_pipeline()
+    test_lookup()
+    test_falloff()
+    test_summed_area()
+    test_convolution()
+    test_parallel()
     
     
-    #test_pixellate()         # Optional method
+    test_pixellate()
     print('Class Filter passed all tests.')
     print()
     
     print('Testing class Encoder')
     test_encode()
     test_decode()
+    test_batch()
     print('Class Encoder passed all tests.')
\ No newline at end of file
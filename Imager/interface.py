@@ -84,9 +84,9 @@ class InterfacePanel(BoxLayout):
         # For working with pop-ups (Hidden since not .kv aware)
         self._popup = None
         self.place_image('',self.source)
-        self.imagedrop = ImageDropDown(choices=['load','save','undo','reset'], 
+        self.imagedrop = ImageDropDown(choices=['load','save','undo','redo','reset'], 
                                        save=[self.save_image], load=[self.load_image],
-                                       undo=[self.undo], reset=[self.clear])
+                                       undo=[self.undo], redo=[self.redo], reset=[self.clear])
         self.textdrop  = TextDropDown( choices=['show','hide','code','load','save'],
                                        show=[self.show_text], hide=[self.hide_text],
                                        code=[self.encode], load=[self.load_text], 
@@ -227,26 +227,30 @@ class InterfacePanel(BoxLayout):
         Precondition: file is a string
         """
         import a6image
+        import a6raw
         from PIL import Image as CoreImage
         
+        # Raw images are mapped, not decoded
+        if a6raw.is_raw(file):
+            try:
+                return a6raw.load(file)
+            except:
+                traceback.print_exc()
+                self.error('Could not load the image file')
+                return None
+        
         try:
-            image = CoreImage.open(file)
-            image = image.convert("RGB")
-            buffer = list(image.getdata())
-            size  = image.size[0]*image.size[1]
-            width = image.size[0]
+            image = CoreImage.open(file).convert("RGB")
         except:
             traceback.print_exc()
             self.error('Could not load the image file')
-            buffer = None
+            return None
         
-        result = None
-        if not buffer is None:
-            try:
-                result = a6image.Image(buffer,width)
-            except:
-                traceback.print_exc()
-                result = None
+        try:
+            result = a6image.Image.fromPIL(image)
+        except:
+            traceback.print_exc()
+            result = None
         return result
     
     def check_save_png(self, path, filename):
@@ -256,6 +260,9 @@ class InterfacePanel(BoxLayout):
         If user uses another extension, or no extension at all, this method 
         forces the file to be a .png
         
+        The exception is a session file (.ims), which saves the edit history
+        as well as the current image (see a6session).
+        
         Parameter path: The base path to the file
         Precondition: path is a string
         
@@ -270,7 +277,8 @@ class InterfacePanel(BoxLayout):
         else:
             file = os.path.join(path,filename)
         
-        if file.lower().endswith('.png'):
+        import a6session
+        if file.lower().endswith('.png') or a6session.is_session(file):
             self.save_png(file)
         else:
             file = os.path.splitext(file)[0]+'.png'
@@ -287,7 +295,8 @@ class InterfacePanel(BoxLayout):
         Precondition: filename is a string
         """
         import os.path
-        assert filename.lower().endswith('.png')
+        import a6session
+        assert filename.lower().endswith('.png') or a6session.is_session(filename)
         self.dismiss_popup()
         if os.path.isfile(filename):
             msg = 'File {} exists.\nOverwrite?'
@@ -304,17 +313,16 @@ class InterfacePanel(BoxLayout):
         """
         import os.path
         import traceback
+        import a6session
         self.dismiss_popup()
         
-        # prepare image for saving
-        from PIL import Image as CoreImage
-
-        # This worked (Unlike Kivy)!  But is slow.
         current = self.workspace.getCurrent()
         try:
-            im = CoreImage.new('RGBA',(current.getWidth(),current.getHeight()))
-            im.putdata(tuple(current.getData()))
-            im.save(filename,'PNG')
+            # A session file saves the edit history as well
+            if a6session.is_session(filename):
+                a6session.save(self.workspace,filename)
+            else:
+                current.toPIL().save(filename,'PNG')
         except:
             traceback.print_exc()
             self.error('Cannot save image file ' + os.path.split(filename)[1])
@@ -342,9 +350,32 @@ class InterfacePanel(BoxLayout):
             file = os.path.join(path,filename)
         
         import a6encode
+        import a6raw
+        import a6session
+        # The history budget in MB (see the --budget option)
+        budget = os.environ.get('IMAGER_BUDGET')
+        budget = None if budget is None else int(float(budget)*1e6)
+        if a6session.is_session(file) or a6raw.is_raw(file):
+            try:
+                if a6session.is_session(file):
+                    self.workspace = a6session.load(file,a6encode.Encoder)
+                else:
+                    # The editor maps the file instead of copying it
+                    self.workspace = a6raw.edit(file,a6encode.Encoder,budget)
+            except:
+                traceback.print_exc()
+                self.error('Could not load the '+('session' if a6session.is_session(file) else 'image')+' file')
+                return
+            self.picture = self.workspace.getOriginal()
+            self.workimage.setImage(self.workspace.getCurrent())
+            self.origimage.setImage(self.picture)
+            self.decode()
+            self.canvas.ask_update()
+            return
+        
         self.picture = self.read_image(file)
         try:
-            self.workspace = a6encode.Encoder(self.picture)
+            self.workspace = a6encode.Encoder(self.picture,budget)
             self.workimage.setImage(self.workspace.getCurrent())
             self.origimage.setImage(self.workspace.getOriginal())
         except:
@@ -492,6 +523,21 @@ class InterfacePanel(BoxLayout):
         except:
             traceback.print_exc()
             self.error('An error occurred when trying to undo')
+    
+    def redo(self):
+        """
+        Redos the last undone edit to the image.
+        
+        This method will redo the last edit that was undone.
+        """
+        try:
+            self.workspace.redo()
+            self.workimage.update(self.workspace.getCurrent())
+            self.decode()
+            self.canvas.ask_update()
+        except:
+            traceback.print_exc()
+            self.error('An error occurred when trying to redo')
         
     def clear(self):
         """
@@ -560,8 +606,7 @@ class InterfacePanel(BoxLayout):
         Precondition: The first element of action is callable
         """
         try:
-            self.workspace.increment()
-            getattr(self.workspace,action[0])(*action[1:])
+            self.workspace.perform(*action)
             self.decode()
         except:
             traceback.print_exc()
@@ -612,10 +657,9 @@ class InterfacePanel(BoxLayout):
         """
         try:
             self.textpanel.active = True
-            self.workspace.increment()
-            if not self.workspace.encode(self.textpanel.hidden.text):
+            if not self.workspace.perform('encode',self.textpanel.hidden.text):
                 self.error('The message could not be encoded')
-                self.workspace.undo()
+                self.workspace.discard()
                 self.textpanel.active = False
                 self.textpanel.hidden.text = ''
             else:
@@ -182,6 +182,8 @@ class ImageDropDown(MenuDropDown):
     savechoice = ObjectProperty(None)
     # Undo one edit step
     undochoice  = ObjectProperty(None)
+    # Redo one undone edit step
+    redochoice  = ObjectProperty(None)
     # Undo all edits
     clearchoice = ObjectProperty(None)
 
@@ -326,11 +328,8 @@ class ImagePanel(Widget):
         return os.path.join(dir,filename)
     
     def blit(self,picture):
-        for pos in range(len(picture)):
-            pixel = picture[pos]
-            self._blitter[pos*3  ] = pixel[0]
-            self._blitter[pos*3+1] = pixel[1]
-            self._blitter[pos*3+2] = pixel[2]
+        # getBytes applies the orientation of the picture in one pass
+        self._blitter[:] = array('B',picture.getBytes())
         return self._blitter
     
     def setImage(self,picture):